@@ -0,0 +1,124 @@
+"""
+Disk-backed cache of agent Runner.run results.
+
+Entries are keyed on the agent name, its model, a hash of its instructions, its
+output schema and the exact input, so editing an agent's instructions or output
+type makes its old entries unreachable. The validated structured output is stored
+as JSON in the shared SQLite file with a TTL; when the cache grows past its byte
+budget the least recently used entries are evicted.
+"""
+
+import hashlib
+import json
+import os
+import time
+from types import SimpleNamespace
+
+from pydantic import BaseModel
+
+from shared_state import shared_store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS agent_cache (
+    key TEXT PRIMARY KEY,
+    agent TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS agent_cache_last_access ON agent_cache (last_access);
+"""
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _output_schema(output_type):
+    if isinstance(output_type, type) and issubclass(output_type, BaseModel):
+        return json.dumps(output_type.model_json_schema(), sort_keys=True)
+    return getattr(output_type, "__name__", str(output_type))
+
+
+class AgentRunCache:
+    def __init__(self, store, ttl=7 * 24 * 3600, max_bytes=64 * 1024 * 1024, enabled=True):
+        self.store = store
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._schema_ready = set()
+
+    def _conn(self):
+        conn = self.store.connection()
+        if id(conn) not in self._schema_ready:
+            conn.executescript(SCHEMA)
+            self._schema_ready.add(id(conn))
+        return conn
+
+    def key_for(self, agent, input):
+        return _sha256(json.dumps({
+            "agent": agent.name,
+            "model": str(agent.model or "default"),
+            "instructions": _sha256(str(agent.instructions)),
+            "output_schema": _sha256(_output_schema(agent.output_type)),
+            "input": input if isinstance(input, str) else json.dumps(input, sort_keys=True, default=str),
+        }, sort_keys=True))
+
+    def get(self, agent, input):
+        """A RunResult-like object with the cached final_output, or None"""
+        if not self.enabled:
+            return None
+        key = self.key_for(agent, input)
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM agent_cache WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE agent_cache SET last_access = ? WHERE key = ?", (now, key))
+        output_type = agent.output_type
+        if isinstance(output_type, type) and issubclass(output_type, BaseModel):
+            output = output_type.model_validate_json(row[0])
+        else:
+            output = json.loads(row[0])
+        return SimpleNamespace(final_output=output, cached=True)
+
+    def put(self, agent, input, output):
+        if not self.enabled or output is None:
+            return
+        value = output.model_dump_json() if isinstance(output, BaseModel) else json.dumps(output)
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO agent_cache (key, agent, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+            (self.key_for(agent, input), agent.name, value, len(value), now + self.ttl, now)
+        )
+        self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM agent_cache WHERE expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM agent_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk entries from least recently used, dropping them until the budget is met
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM agent_cache ORDER BY last_access"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM agent_cache WHERE key = ?", doomed)
+
+    def stats(self):
+        conn = self._conn()
+        rows = conn.execute("SELECT agent, COUNT(*), COALESCE(SUM(size), 0) FROM agent_cache GROUP BY agent").fetchall()
+        return {agent: {"entries": count, "bytes": size} for agent, count, size in rows}
+
+
+agent_cache = AgentRunCache(
+    shared_store,
+    ttl=int(os.getenv("AGENT_CACHE_TTL", str(7 * 24 * 3600))),
+    max_bytes=int(float(os.getenv("AGENT_CACHE_MAX_MB", "64")) * 1024 * 1024),
+    enabled=os.getenv("AGENT_CACHE_ENABLED", "1") == "1",
+)
@@ -0,0 +1,107 @@
+"""
+Page parsing throughput: on the scrape threads versus in the parse process pool.
+
+Parses the fixture pages (enlarged by repeating their paragraphs, since real
+articles are much longer) from several threads at once, the way concurrent
+requests do, first inline under the GIL and then through ParsePool with 1, 2,
+... workers. Reports pages per second and how long a 1 ms sleeper thread was
+held up at worst, which is what the event loop of the same worker feels.
+Runs offline.
+
+    python bench_parsing.py [--pages 200] [--threads 8] [--scale 20] [--workers 1,2,4]
+"""
+
+import argparse
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from page_parser import ParsePool
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(BACKEND_DIR, "fixtures", "pages")
+
+
+def load_pages(scale):
+    """The fixture pages as (url, bytes), each paragraph repeated `scale` times"""
+    pages = []
+    for name in sorted(os.listdir(PAGES_DIR)):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(PAGES_DIR, name), encoding="utf-8") as f:
+            html = f.read()
+        html = re.sub(r"<p>.*?</p>", lambda m: m.group(0) * scale, html, flags=re.S)
+        pages.append((f"https://fixtures.example/{name}", html.encode()))
+    return pages
+
+
+class StallProbe:
+    """A thread sleeping 1 ms in a loop, recording the worst overshoot"""
+
+    def __init__(self):
+        self.worst = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            time.sleep(0.001)
+            self.worst = max(self.worst, time.perf_counter() - start - 0.001)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run(pool, pages, total, threads):
+    jobs = [pages[i % len(pages)] for i in range(total)]
+    with StallProbe() as probe:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(lambda page: pool.parse(page[0], page[1], "utf-8"), jobs))
+        elapsed = time.perf_counter() - start
+    failed = sum(1 for _, failure, _ in results if failure is not None)
+    return total / elapsed, probe.worst, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200, help="pages parsed per configuration")
+    parser.add_argument("--threads", type=int, default=8, help="scrape threads submitting pages at once")
+    parser.add_argument("--scale", type=int, default=20, help="times each fixture paragraph is repeated")
+    parser.add_argument("--workers", default=None,
+                        help="comma-separated pool sizes to try (default 1, 2, 4, ... up to the CPU count)")
+    args = parser.parse_args(argv)
+
+    cpus = os.cpu_count() or 1
+    if args.workers:
+        sizes = [int(n) for n in args.workers.split(",")]
+    else:
+        sizes = sorted({1, 2, cpus} | {n for n in (4, 8, 16) if n <= cpus})
+    pages = load_pages(args.scale)
+    mean_kb = sum(len(html) for _, html in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages of {mean_kb:.0f} KB on average, {args.pages} parses from {args.threads} threads, {cpus} CPUs")
+
+    inline = ParsePool(workers=0)
+    run(inline, pages, len(pages), 1)  # imports
+    rate, stall, failed = run(inline, pages, args.pages, args.threads)
+    print(f"  {'inline (GIL)':<16} {rate:8.1f} pages/s  worst stall {stall * 1000:7.1f} ms  failed {failed}")
+    for size in sizes:
+        pool = ParsePool(workers=size)
+        pool.start()
+        try:
+            rate, stall, failed = run(pool, pages, args.pages, args.threads)
+        finally:
+            pool.shutdown()
+        print(f"  {f'{size} worker(s)':<16} {rate:8.1f} pages/s  worst stall {stall * 1000:7.1f} ms  failed {failed}")
+
+
+if __name__ == "__main__":
+    main()
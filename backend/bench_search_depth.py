@@ -0,0 +1,107 @@
+"""
+Search rounds per scrape with fixed versus adaptive search depth.
+
+Runs scrape_topic_content in-process against a simulated web: topics whose
+result pages yield content at different rates (a well covered topic, a patchy
+one and a thin one), broadened queries that find partly new pages and further
+result pages of the same query. Search
+and page fetches are simulated with a seeded random generator, so the run is
+offline, repeatable and fast; time is modelled as the search and fetch latency of
+each sequential round. Each configuration starts with an empty shared store and
+learns as the scrapes go.
+
+    python bench_search_depth.py [--scrapes 60] [--search-latency 0.3] [--fetch-latency 0.8]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+from search_results import SearchResult
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Share of a topic's result pages that have usable content
+TOPIC_YIELD = {"photosynthesis": 0.9, "ancient mesopotamia": 0.5, "tessellations": 0.25}
+PAGE_TEXT = (
+    "This page explains the topic for students with examples, diagrams and short questions to check "
+    "understanding. Each section builds on the one before it and ends with a summary of the key ideas. "
+) * 4
+
+
+class SimulatedWeb:
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.searches = 0
+        self.fetches = 0
+
+    def search(self, query, api_key, cse_id, num_results=10, start=1):
+        self.searches += 1
+        topic = next(t for t in TOPIC_YIELD if t in query)
+        # A broadened query shares most of its results with the plain one, shifted by a few places
+        first = query.count("educational resources") * 3 + start - 1
+        return [SearchResult(f"https://site{i % 40}.example/{topic.replace(' ', '-')}/{i}")
+                for i in range(first, first + min(num_results, 10))]
+
+    def fetch(self, url, timeout=None):
+        self.fetches += 1
+        topic = next(t for t in TOPIC_YIELD if t.replace(" ", "-") in url)
+        # Whether a page is usable varies between visits (paywalls, outages, thin revisions)
+        return PAGE_TEXT if self.random.random() < TOPIC_YIELD[topic] else ""
+
+
+def _short(main):
+    return sum(count for (_, outcome), count in main.SCRAPES.values().items() if outcome == "short")
+
+
+def run(main, adaptive, scrapes, search_latency, fetch_latency):
+    main.depth_planner.enabled = adaptive
+    main.depth_planner.random.seed(0)
+    web = SimulatedWeb()
+    main.search_google_cse, main.extract_text_from_url = web.search, web.fetch
+    results = {topic: {"rounds": 0, "short": 0, "seconds": 0.0} for topic in TOPIC_YIELD}
+    topics = list(TOPIC_YIELD)
+    for i in range(scrapes):
+        topic = topics[i % len(topics)]
+        rounds_before = sum(main.SEARCH_ROUNDS.values().values())
+        short_before = _short(main)
+        main.scrape_topic_content([f"{topic} lesson plan"], "offline", "offline")
+        used = sum(main.SEARCH_ROUNDS.values().values()) - rounds_before
+        results[topic]["rounds"] += used
+        results[topic]["short"] += _short(main) - short_before
+        # Rounds are sequential; within a round the searches, and then the fetches, run in parallel
+        results[topic]["seconds"] += used * (search_latency + fetch_latency)
+    return results, web.searches, web.fetches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scrapes", type=int, default=60, help="scrapes per configuration, cycling through the topics")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="modelled seconds per Custom Search round")
+    parser.add_argument("--fetch-latency", type=float, default=0.8, help="modelled seconds per round of page fetches")
+    args = parser.parse_args(argv)
+
+    os.environ.update({"LOG_LEVEL": "WARNING", "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-bench")})
+    sys.path.insert(0, BACKEND_DIR)
+    for adaptive in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["SHARED_STATE_PATH"] = os.path.join(tmp, "state.sqlite3")
+            import shared_state
+            store = shared_state.SharedStore(os.environ["SHARED_STATE_PATH"])
+            import main as app_module
+            app_module.depth_planner.store = store
+            results, searches, fetches = run(app_module, adaptive, args.scrapes, args.search_latency, args.fetch_latency)
+            store.close()
+        per_topic = args.scrapes / len(TOPIC_YIELD)
+        label = "adaptive" if adaptive else "fixed"
+        rounds = sum(r["rounds"] for r in results.values())
+        print(f"{label}: {rounds / args.scrapes:.2f} rounds per scrape, {searches} searches, {fetches} page fetches")
+        for topic, r in results.items():
+            print(f"  {topic:<22} yield {TOPIC_YIELD[topic]:.2f}  {r['rounds'] / per_topic:4.2f} rounds  "
+                  f"{r['seconds'] / per_topic:5.2f} s modelled  {r['short']:3d} short")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Serialization cost and payload size of a LessonPlanResponse.
+
+Compares the stock FastAPI path (jsonable_encoder + stdlib json, as JSONResponse
+renders it) with model_dump + orjson (what FastJSONResponse and the lesson-plan
+endpoints use) and pydantic's own model_dump_json, then the size and cost of
+gzip and brotli on the result. Runs offline on sample_output.json.
+
+    python bench_serialization.py [--repeat 2000]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from http_responses import brotli
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def sample_response():
+    # Imported here so --help stays fast
+    from main import LessonPlan, LessonPlanResponse, RequestTimings
+    with open(os.path.join(BACKEND_DIR, "sample_output.json")) as f:
+        plan = LessonPlan(**json.load(f)["lesson_plan"])
+    return LessonPlanResponse(
+        success=True,
+        lesson_plan=plan,
+        message=f"Successfully created lesson plan for '{plan.topic}'",
+        plan_id="3f9c2a0e8b7d4c1e9a6f5b2d8c0e7a41",
+        timings=RequestTimings(
+            total_ms=41250.3,
+            stages={"validation": 812.4, "scraper": 27950.1, "cse_search": 1423.0, "extract": 9120.7, "planner": 12480.9},
+            sources={url: 2310.4 for url in plan.urls},
+        ),
+    )
+
+
+def per_call_us(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000, help="iterations per measurement")
+    args = parser.parse_args(argv)
+
+    response = sample_response()
+    serializers = {
+        "jsonable_encoder + json": lambda: json.dumps(
+            jsonable_encoder(response), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode(),
+        "model_dump + orjson": lambda: orjson.dumps(response.model_dump(mode="json")),
+        "model_dump_json": lambda: response.model_dump_json().encode(),
+    }
+    print(f"Serialization ({args.repeat} runs each)")
+    baseline = None
+    for name, fn in serializers.items():
+        us = per_call_us(fn, args.repeat)
+        baseline = baseline or us
+        print(f"  {name:<26} {us:8.1f} us  {baseline / us:5.1f}x  {len(fn())} bytes")
+
+    body = serializers["model_dump + orjson"]()
+    encoders = {
+        "identity": lambda: body,
+        "gzip level 6": lambda: gzip.compress(body, compresslevel=6, mtime=0),
+        "gzip level 9": lambda: gzip.compress(body, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        encoders["brotli quality 5"] = lambda: brotli.compress(body, quality=5)
+        encoders["brotli quality 11"] = lambda: brotli.compress(body, quality=11)
+    print(f"Compression of the {len(body)} byte body")
+    for name, fn in encoders.items():
+        us = per_call_us(fn, max(1, args.repeat // 10))
+        size = len(fn())
+        print(f"  {name:<26} {us:8.1f} us  {size:6d} bytes  {size / len(body) * 100:5.1f}%")
+    if brotli is None:
+        print("  (brotli not installed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Cold-start cost of the backend: import time per module and time to first byte.
+
+Imports main in a fresh interpreter under `python -X importtime` and lists the
+modules it pulls in directly, slowest first, with the modules left to the
+background warm-up (agents SDK, page parsers) timed on their own. Then starts
+the app under uvicorn several times and reports how long after process start
+/health sent its first byte, and how long until the warm-up had finished.
+Runs offline: no requests reach Google or OpenAI.
+
+    python bench_startup.py [--runs 3] [--top 15]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFERRED_MODULES = ("agents", "newspaper", "bs4")
+
+
+def import_times(module):
+    """Milliseconds to import `module` in a fresh interpreter, and {child: ms} for the modules it imports
+    directly (cumulative, so each includes everything below it)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=bench_env(), capture_output=True, text=True, check=True,
+    )
+    # Children are printed before their parent, one level of indentation deeper
+    children = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or not line.split("|")[1].strip().isdigit():
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == module:
+                return int(cumulative) / 1000, children
+            children = {}
+        elif depth == 1:
+            children[name.strip()] = int(cumulative) / 1000
+    return 0.0, {}
+
+
+def bench_env():
+    env = dict(os.environ)
+    env.setdefault("SHARED_STATE_PATH", os.path.join(tempfile.gettempdir(), "bench_startup_state.sqlite3"))
+    env.setdefault("OPENAI_API_KEY", "sk-bench")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env["PYTHONUNBUFFERED"] = "1"
+    return env
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_health(port):
+    """(seconds to the first byte of /health, parsed body) or None while the server is not up"""
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("GET", "/health")
+        response = conn.getresponse()
+        first_byte = time.perf_counter() - start
+        body = response.read()
+    except OSError:
+        return None
+    finally:
+        conn.close()
+    return first_byte, json.loads(body)
+
+
+def cold_start(timeout=60):
+    """Seconds from process start to /health's first byte, that request's TTFB, and to warmed_up"""
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=bench_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        first = warm = None
+        while time.perf_counter() - start < timeout:
+            health = get_health(port)
+            if health is not None:
+                ttfb, body = health
+                if first is None:
+                    first = (time.perf_counter() - start, ttfb)
+                if body.get("warmed_up", True):  # servers without a warm-up are ready once they answer
+                    warm = time.perf_counter() - start
+                    break
+            time.sleep(0.01)
+        return first, warm
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold starts to measure")
+    parser.add_argument("--top", type=int, default=15, help="modules to list")
+    args = parser.parse_args(argv)
+
+    total, children = import_times("main")
+    print(f"import main: {total:.0f} ms; slowest direct imports (cumulative)")
+    for name, ms in sorted(children.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<40} {ms:8.1f} ms")
+    print("Deferred to the warm-up (each in a fresh interpreter)")
+    for module in DEFERRED_MODULES:
+        print(f"  {module:<40} {import_times(module)[0]:8.1f} ms")
+
+    print(f"Cold starts under uvicorn ({args.runs} runs)")
+    for run in range(args.runs):
+        first, warm = cold_start()
+        if first is None:
+            print(f"  run {run + 1}: /health never answered")
+            continue
+        up, ttfb = first
+        warm_text = f"{warm:.2f} s" if warm is not None else "not reached"
+        print(f"  run {run + 1}: first /health byte after {up:.2f} s (TTFB {ttfb * 1000:.1f} ms), warmed up after {warm_text}")
+
+
+if __name__ == "__main__":
+    main()
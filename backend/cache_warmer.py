@@ -0,0 +1,134 @@
+"""
+Off-peak warming of the most requested lesson plans.
+
+During the configured off-peak hours the warmer reads the request log, picks the
+top-N (topic, grade) pairs of the lookback window and regenerates those whose
+cached plan is missing or past half its TTL. A regenerated plan lands in the plan
+cache, and a fresh fetch of every source page lands in the page cache.
+
+Each warm-up runs the normal pipeline in its own RequestContext, so its exact
+Custom Search queries and LLM tokens are known. Daily budgets for both are kept
+in the shared store, and one worker per cycle holds the warming lease, so
+several workers never warm the same topics or overspend together.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from metrics import PLANS_WARMED
+from plan_store import plan_store
+from request_log import request_log
+from shared_state import shared_store
+
+logger = logging.getLogger("lesson_planner.cache_warmer")
+
+
+def parse_hours(spec):
+    """Off-peak hours from '1-5' (01:00 up to 05:00) or '22-4' (wrapping midnight); '0-0' is all day, '' never"""
+    if not spec:
+        return frozenset()
+    start, end = (int(part) % 24 for part in spec.split("-", 1))
+    hours = set()
+    hour = start
+    while hour != end:
+        hours.add(hour)
+        hour = (hour + 1) % 24
+    return frozenset(hours or range(24))
+
+
+class CacheWarmer:
+    def __init__(self, request_log, plan_store, store, warm_plan=None, hours=frozenset(), top_n=50,
+                 lookback_days=14, min_requests=3, cse_budget=30, token_budget=200_000, interval=600):
+        self.request_log = request_log
+        self.plan_store = plan_store
+        self.store = store
+        # async (topic, grade_level) -> (success, usage dict); set by main.py, which owns the pipeline
+        self.warm_plan = warm_plan
+        self.hours = hours
+        self.top_n = top_n
+        self.lookback_days = lookback_days
+        self.min_requests = min_requests
+        self.cse_budget = cse_budget
+        self.token_budget = token_budget
+        self.interval = interval
+
+    def off_peak(self, now=None):
+        return time.localtime(now).tm_hour in self.hours
+
+    def _budget_key(self, name):
+        return f"warmer:{name}:{time.strftime('%Y%m%d')}"
+
+    def budget_used(self):
+        return {
+            "cse_queries": self.store.counter(self._budget_key("cse_queries")),
+            "llm_tokens": self.store.counter(self._budget_key("llm_tokens")),
+        }
+
+    def budget_left(self):
+        used = self.budget_used()
+        return used["cse_queries"] < self.cse_budget and used["llm_tokens"] < self.token_budget
+
+    def candidates(self):
+        """Top (topic, grade, count) whose cached plan is missing or due for a refresh"""
+        if self.plan_store.cache_ttl <= 0:
+            return []  # without a plan cache there is nothing to keep warm
+        since = time.time() - self.lookback_days * 24 * 3600
+        refresh_before = time.time() - self.plan_store.cache_ttl / 2
+        due = []
+        for topic, grade, count in self.request_log.top_topics(self.top_n, since, self.min_requests):
+            cached = self.plan_store.cached_plan(topic, grade)
+            if cached is None or cached["cached_at"] < refresh_before:
+                due.append((topic, grade, count))
+        return due
+
+    async def run_once(self):
+        """Warm due topics until done or out of budget; returns the number of plans warmed"""
+        # Whoever increments the lease counter first owns this cycle
+        slot = int(time.time() // self.interval)
+        if await asyncio.to_thread(self.store.incr, f"warmer:lease:{slot}", 1, self.interval * 2) != 1:
+            return 0
+        warmed = 0
+        for topic, grade, count in await asyncio.to_thread(self.candidates):
+            if not self.off_peak() or not await asyncio.to_thread(self.budget_left):
+                break
+            logger.info("Warming lesson plan", extra={"topic": topic, "grade": grade, "requests": count})
+            success, usage = await self.warm_plan(topic, grade or None)
+            await asyncio.to_thread(self.store.incr, self._budget_key("cse_queries"), usage.get("cse_queries", 0), 2 * 24 * 3600)
+            await asyncio.to_thread(self.store.incr, self._budget_key("llm_tokens"), usage.get("llm_tokens", 0), 2 * 24 * 3600)
+            PLANS_WARMED.inc(result="ok" if success else "failed")
+            warmed += success
+        if warmed:
+            logger.info("Cache warming cycle done", extra={"warmed": warmed, "budget_used": self.budget_used()})
+        return warmed
+
+    async def run_forever(self):
+        while True:
+            if self.off_peak():
+                try:
+                    await self.run_once()
+                except Exception:
+                    logger.exception("Cache warming cycle failed")
+            await asyncio.sleep(self.interval)
+
+    def snapshot(self):
+        return {
+            "off_peak_hours": sorted(self.hours),
+            "off_peak_now": self.off_peak(),
+            "budget": {"cse_queries": self.cse_budget, "llm_tokens": self.token_budget},
+            "budget_used_today": self.budget_used(),
+            "due": [{"topic": topic, "grade": grade, "requests": count} for topic, grade, count in self.candidates()],
+        }
+
+
+cache_warmer = CacheWarmer(
+    request_log, plan_store, shared_store,
+    hours=parse_hours(os.getenv("WARM_HOURS", "1-5")),
+    top_n=int(os.getenv("WARM_TOP_N", "50")),
+    lookback_days=int(os.getenv("WARM_LOOKBACK_DAYS", "14")),
+    min_requests=int(os.getenv("WARM_MIN_REQUESTS", "3")),
+    cse_budget=int(os.getenv("WARM_CSE_BUDGET", "30")),
+    token_budget=int(os.getenv("WARM_TOKEN_BUDGET", "200000")),
+    interval=int(os.getenv("WARM_INTERVAL", "600")),
+)
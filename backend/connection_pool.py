@@ -0,0 +1,240 @@
+"""
+Pooled HTTP connections, a DNS cache and the startup pre-warming of both.
+
+Searches and page fetches share one requests.Session, so connections (and
+their TLS sessions) are kept alive per host instead of being opened for every
+request. DnsCache keeps getaddrinfo answers for a TTL, and that session's
+adapter resolves new connections through it, so repeated fetches from the same
+site skip the resolver; failed lookups are cached briefly too. Only this session
+uses the cache: socket.getaddrinfo, and so every other client in the process
+(the OpenAI client included), is left alone.
+
+At startup the Prewarmer resolves and connects to the configured hosts (the
+Custom Search endpoint plus PREWARM_HOSTS), and resolves the hosts most often
+found in the page cache. The first request after a deploy then finds DNS
+answers cached and the connections to googleapis.com open. The app reports
+itself ready (see /ready in main.py) once this phase is over.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict, Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.timeout import _DEFAULT_TIMEOUT
+
+from host_health import host_of
+
+logger = logging.getLogger("lesson_planner.connection_pool")
+
+
+class DnsCache:
+    """getaddrinfo results kept for `ttl` seconds (failures for `negative_ttl`), LRU-bounded"""
+
+    def __init__(self, ttl=300, negative_ttl=30, max_entries=1024, resolver=socket.getaddrinfo):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.resolver = resolver
+        self._entries = OrderedDict()  # key -> (expires_at, result or exception)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                result = entry[1]
+                if isinstance(result, Exception):
+                    raise socket.gaierror(*result.args)
+                return list(result)
+            self.misses += 1
+        try:
+            result = self.resolver(host, port, family, type, proto, flags)
+        except socket.gaierror as e:
+            self._store(key, now + self.negative_ttl, e)
+            raise
+        self._store(key, now + self.ttl, result)
+        return list(result)
+
+    def _store(self, key, expires_at, result):
+        with self._lock:
+            self._entries[key] = (expires_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "ttl_s": self.ttl}
+
+
+def create_connection(dns_cache, address, timeout=_DEFAULT_TIMEOUT, source_address=None, socket_options=None):
+    """urllib3's create_connection, with the address resolved through dns_cache"""
+    host, port = address
+    err = None
+    for family, socktype, proto, _, sockaddr in dns_cache.getaddrinfo(host.strip("[]"), port, allowed_gai_family(), socket.SOCK_STREAM):
+        sock = None
+        try:
+            sock = socket.socket(family, socktype, proto)
+            for option in socket_options or ():
+                sock.setsockopt(*option)
+            if timeout is not _DEFAULT_TIMEOUT:
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(sockaddr)
+            return sock
+        except OSError as e:
+            err = e
+            if sock is not None:
+                sock.close()
+    raise err if err is not None else OSError("getaddrinfo returned an empty list")
+
+
+def _cached_dns_pool(pool_cls, connection_cls, dns_cache):
+    """A subclass of pool_cls whose connections resolve their host through dns_cache"""
+
+    class Connection(connection_cls):
+        def _new_conn(self):
+            # As urllib3's own _new_conn, resolving through the cache
+            try:
+                return create_connection(dns_cache, (self._dns_host, self.port), self.timeout,
+                                         source_address=self.source_address, socket_options=self.socket_options)
+            except socket.gaierror as e:
+                raise NameResolutionError(self.host, self, e) from e
+            except socket.timeout as e:
+                raise ConnectTimeoutError(self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})") from e
+            except OSError as e:
+                raise NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+
+    return type(pool_cls.__name__, (pool_cls,), {"ConnectionCls": Connection})
+
+
+class CachedDnsAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections resolve their host through a DnsCache (TTL 0: the plain resolver)"""
+
+    def __init__(self, dns_cache, **kwargs):
+        self.dns_cache = dns_cache  # set first: HTTPAdapter.__init__ builds the pool manager
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        if self.dns_cache is not None and self.dns_cache.ttl > 0:
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": _cached_dns_pool(HTTPConnectionPool, HTTPConnection, self.dns_cache),
+                "https": _cached_dns_pool(HTTPSConnectionPool, HTTPSConnection, self.dns_cache),
+            }
+
+
+def make_session(pool_hosts=64, pool_per_host=8, dns_cache=None):
+    """A Session for fetches from many threads: per-host keep-alive pools, DNS answers from dns_cache and
+    no cookie jar, so one site's cookies never travel with another request"""
+    session = requests.Session()
+    adapter = CachedDnsAdapter(dns_cache, pool_connections=pool_hosts, pool_maxsize=pool_per_host)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def top_cached_hosts(store, limit=20):
+    """Hosts with the most pages in the page cache, most first"""
+    counts = Counter(host_of(key.removeprefix("page:")) for key in store.keys("page:"))
+    counts.pop("", None)
+    return [host for host, _ in counts.most_common(limit)]
+
+
+class Prewarmer:
+    """Resolves and connects to hosts before the first request needs them, and tracks readiness"""
+
+    def __init__(self, session, dns_cache, connect_urls=(), timeout=5.0, top_hosts=20):
+        self.session = session
+        self.dns_cache = dns_cache
+        self.connect_urls = list(connect_urls)
+        self.timeout = timeout
+        self.top_hosts = top_hosts
+        self.results = {}
+        self.finished = threading.Event()
+
+    def _resolve(self, host):
+        start = time.perf_counter()
+        try:
+            self.dns_cache.getaddrinfo(host, 443, 0, socket.SOCK_STREAM)
+        except OSError as e:
+            return {"resolved": False, "error": str(e)}
+        return {"resolved": True, "dns_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    def _connect(self, url):
+        parts = urlsplit(url)
+        result = self._resolve(parts.hostname or "")
+        if not result["resolved"]:
+            return result
+        start = time.perf_counter()
+        try:
+            # Any answer will do: the point is the pooled, kept-alive connection (and TLS session)
+            self.session.head(f"{parts.scheme}://{parts.netloc}/", timeout=self.timeout, allow_redirects=False)
+        except requests.exceptions.RequestException as e:
+            return {**result, "connected": False, "error": str(e)}
+        return {**result, "connected": True, "connect_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    def run(self, extra_urls=(), resolve_hosts=()):
+        """Connect to connect_urls plus extra_urls and resolve resolve_hosts, in parallel; never raises"""
+        start = time.perf_counter()
+        connect_urls = list(dict.fromkeys([*extra_urls, *self.connect_urls]))
+        connect_hosts = {host_of(url) for url in connect_urls}
+        resolve_only = [host for host in dict.fromkeys(resolve_hosts) if host not in connect_hosts]
+        jobs = [(host_of(url), self._connect, url) for url in connect_urls]
+        jobs += [(host, self._resolve, host) for host in resolve_only]
+        try:
+            if jobs:
+                with ThreadPoolExecutor(max_workers=min(16, len(jobs)), thread_name_prefix="prewarm") as pool:
+                    futures = {host: pool.submit(fn, arg) for host, fn, arg in jobs}
+                    for host, future in futures.items():
+                        try:
+                            self.results[host] = future.result()
+                        except Exception as e:
+                            self.results[host] = {"error": repr(e)}
+        finally:
+            self.finished.set()
+        logger.info("Connection pre-warming finished", extra={
+            "seconds": round(time.perf_counter() - start, 2),
+            "connected": sum(1 for r in self.results.values() if r.get("connected")),
+            "resolved": sum(1 for r in self.results.values() if r.get("resolved")),
+            "hosts": len(self.results),
+        })
+        return self.results
+
+    def snapshot(self):
+        return {"finished": self.finished.is_set(), "hosts": dict(self.results), "dns_cache": self.dns_cache.stats()}
+
+
+def _urls(spec):
+    """PREWARM_HOSTS entries as URLs: bare hosts get https://"""
+    return [item if "://" in item else f"https://{item}" for item in (part.strip() for part in spec.split(",")) if item]
+
+
+dns_cache = DnsCache(ttl=float(os.getenv("DNS_CACHE_TTL", "300")))
+http_session = make_session(pool_per_host=int(os.getenv("FETCH_MAX_IN_FLIGHT", "8")), dns_cache=dns_cache)
+prewarmer = Prewarmer(
+    http_session, dns_cache,
+    connect_urls=_urls(os.getenv("PREWARM_HOSTS", "")),
+    timeout=float(os.getenv("PREWARM_TIMEOUT", "5")),
+    top_hosts=int(os.getenv("PREWARM_TOP_HOSTS", "20")),
+)
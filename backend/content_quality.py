@@ -0,0 +1,249 @@
+"""
+Local quality gate for extracted page text, run before anything reaches the LLM.
+
+The page HTML is split into blocks (paragraphs, list items, headings, cells)
+and each block is classified in the manner of jusText/boilerpipe:
+
+- boilerplate: inside nav/footer/aside/form, or a container whose class or id
+  names a cookie banner, comment thread, share bar, newsletter box and the like,
+  or a short block built around phrases such as "subscribe to read" or
+  "all rights reserved"
+- links: more than half of the block's text is link text (menus, tag clouds)
+- short: too few words to carry content; headings survive when good text follows
+- good: everything else
+
+The extracted article text is then trimmed to the paragraphs that are good (or
+headings of good paragraphs). The result is also checked for its language, by
+stopword profile, and scored for readability (Flesch reading ease and the
+Flesch-Kincaid grade). assess() reports how much of the page's visible text was
+discarded and why.
+"""
+
+import os
+import re
+from collections import Counter
+
+import lxml.etree
+import lxml.html
+
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "head", "button", "select"}
+BLOCK_TAGS = {
+    "p", "li", "h1", "h2", "h3", "h4", "h5", "h6", "td", "th", "blockquote", "pre", "dd", "dt", "div",
+    "section", "article", "main", "header", "footer", "nav", "aside", "ul", "ol", "table", "tr", "form",
+    "figcaption", "caption", "body",
+}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+BOILERPLATE_TAGS = {"nav", "footer", "aside", "form"}
+# Leading parts of class/id tokens that mark page furniture
+BOILERPLATE_CLASSES = (
+    "cookie", "consent", "gdpr", "banner", "comment", "share", "social", "subscribe", "newsletter", "sidebar",
+    "menu", "breadcrumb", "footer", "nav", "related", "promo", "advert", "popup", "modal", "signup", "login", "paywall",
+)
+BOILERPLATE_PHRASES = re.compile(
+    r"\b(cookies?|accept all|subscribe|subscribers only|subscription|sign in|log in|sign up|newsletter|"
+    r"all rights reserved|privacy policy|terms of (use|service)|share this|follow us|advertisement|"
+    r"continue reading|read more|leave a (comment|reply)|comments?)\b",
+    re.I,
+)
+# A block with fewer words is "short", and one where a phrase above appears is boilerplate below this many
+MIN_BLOCK_WORDS = 8
+PHRASE_BLOCK_WORDS = 40
+MAX_LINK_DENSITY = 0.5
+
+STOPWORDS = {
+    "en": "the of and to in is that it for was on are as with by be this from or at which an have not but they were its their can has",
+    "es": "de la que el en los del se las por un para con una su al es lo como más pero sus le ya o este entre cuando muy sin sobre",
+    "fr": "de la le et les des en un du une que est pour qui dans par plus pas sur au avec ce il sont se ne sa ses mais ou",
+    "de": "der die und in den von zu das mit sich des auf für ist im dem nicht ein eine als auch es an werden aus er hat dass sie",
+    "it": "di che il la e per in un una del non sono della si le da con ma gli nel alla anche come più ha questo al dei",
+    "pt": "de que e o da do em um para com não uma os no se na por mais as dos como mas ao ele das à seu sua ou",
+    "nl": "de en van het een in is dat op te zijn voor met die niet aan er ook als bij door maar om dan of uit",
+}
+STOPWORDS = {lang: frozenset(words.split()) for lang, words in STOPWORDS.items()}
+
+# Pages in other languages are dropped; empty means any language is accepted
+ALLOWED_LANGUAGES = frozenset(filter(None, os.getenv("CONTENT_LANGUAGES", "en").split(",")))
+
+WORD_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+SENTENCE_RE = re.compile(r"[.!?]+(?:\s|$)")
+
+
+def _normalize(text):
+    return " ".join(text.split())
+
+
+def _boilerplate_attrs(el):
+    tokens = re.split(r"[\s_\-]+", f"{el.get('class', '')} {el.get('id', '')}".lower())
+    return any(token.startswith(BOILERPLATE_CLASSES) or token in ("ad", "ads") for token in tokens if token)
+
+
+class Block:
+    __slots__ = ("text", "words", "link_chars", "boilerplate_context", "heading", "label")
+
+    def __init__(self, text, link_chars, boilerplate_context, heading):
+        self.text = text
+        self.words = len(WORD_RE.findall(text))
+        self.link_chars = link_chars
+        self.boilerplate_context = boilerplate_context
+        self.heading = heading
+        self.label = None
+
+    @property
+    def link_density(self):
+        return self.link_chars / len(self.text) if self.text else 0.0
+
+
+def html_blocks(html):
+    """The page's visible text as Blocks in document order"""
+    try:
+        root = lxml.html.fromstring(html)
+    except (ValueError, lxml.etree.ParserError):
+        return []
+    blocks = []
+    parts = []  # (text, in_link, boilerplate_context, heading) since the last block boundary
+
+    def flush():
+        text = _normalize(" ".join(part[0] for part in parts))
+        if text:
+            link_chars = sum(len(_normalize(part[0])) for part in parts if part[1])
+            boiler_chars = sum(len(part[0]) for part in parts if part[2])
+            total_chars = sum(len(part[0]) for part in parts)
+            blocks.append(Block(text, min(link_chars, len(text)), boiler_chars * 2 > total_chars,
+                                any(part[3] for part in parts)))
+        parts.clear()
+
+    def walk(el, in_link, boilerplate, heading):
+        tag = el.tag.lower() if isinstance(el.tag, str) else None
+        if tag is None or tag in SKIP_TAGS:
+            return
+        block = tag in BLOCK_TAGS
+        if block:
+            flush()
+        in_link = in_link or tag == "a"
+        boilerplate = boilerplate or tag in BOILERPLATE_TAGS or _boilerplate_attrs(el)
+        heading = heading or tag in HEADING_TAGS
+        if el.text:
+            parts.append((el.text, in_link, boilerplate, heading))
+        for child in el:
+            walk(child, in_link, boilerplate, heading)
+            if child.tail:
+                parts.append((child.tail, in_link, boilerplate, heading))
+        if block:
+            flush()
+
+    walk(root, False, False, False)
+    flush()
+    for block in blocks:
+        block.label = classify(block)
+    return blocks
+
+
+def classify(block):
+    if block.boilerplate_context:
+        return "boilerplate"
+    if block.link_density > MAX_LINK_DENSITY:
+        return "links"
+    if block.words < PHRASE_BLOCK_WORDS and BOILERPLATE_PHRASES.search(block.text):
+        return "boilerplate"
+    if block.words < MIN_BLOCK_WORDS:
+        return "short"
+    return "good"
+
+
+def _label_paragraph(paragraph, known):
+    """Label of an extracted paragraph: that of the identical page block, else judged on its text alone"""
+    label = known.get(paragraph)
+    if label is not None:
+        return label
+    return classify(Block(paragraph, 0, False, False))
+
+
+def filter_paragraphs(text, blocks):
+    """(kept text, {label: discarded chars}) keeping good paragraphs and the short ones heading good text"""
+    known = {block.text: block.label for block in blocks}
+    paragraphs = [p for p in (_normalize(line) for line in text.split("\n")) if p]
+    labels = [_label_paragraph(p, known) for p in paragraphs]
+    kept, discarded = [], Counter()
+    for i, (paragraph, label) in enumerate(zip(paragraphs, labels)):
+        heading_of_good = label == "short" and i + 1 < len(labels) and labels[i + 1] == "good"
+        if label == "good" or heading_of_good:
+            kept.append(paragraph)
+        else:
+            discarded[label] += len(paragraph)
+    return "\n\n".join(kept), dict(discarded)
+
+
+def good_blocks_text(blocks):
+    """(text, {label: discarded chars}) from the good blocks and the headings right before them, for pages
+    the article extractor could not parse"""
+    kept, discarded = [], Counter()
+    for i, block in enumerate(blocks):
+        if block.label == "good" or (block.heading and i + 1 < len(blocks) and blocks[i + 1].label == "good"):
+            kept.append(block.text)
+        else:
+            discarded[block.label] += len(block.text)
+    return "\n\n".join(kept), dict(discarded)
+
+
+def detect_language(text):
+    """(language code, share of words that are its stopwords), or (None, 0.0) when no profile fits"""
+    words = [word.lower() for word in WORD_RE.findall(text[:20000])]
+    if not words:
+        return None, 0.0
+    scores = {lang: sum(1 for word in words if word in stopwords) / len(words) for lang, stopwords in STOPWORDS.items()}
+    lang = max(scores, key=scores.get)
+    # Running text in any of these languages is a quarter to a half stopwords
+    return (lang, round(scores[lang], 3)) if scores[lang] >= 0.08 else (None, round(scores[lang], 3))
+
+
+def _syllables(word):
+    word = word.lower()
+    count = len(re.findall(r"[aeiouy]+", word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+def readability(text):
+    """(Flesch reading ease, Flesch-Kincaid grade) of English-like text, or (None, None) without words"""
+    words = WORD_RE.findall(text)
+    if not words:
+        return None, None
+    sentences = max(1, len(SENTENCE_RE.findall(text)))
+    syllables = sum(_syllables(word) for word in words)
+    words_per_sentence = len(words) / sentences
+    syllables_per_word = syllables / len(words)
+    ease = 206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word
+    grade = 0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59
+    return round(ease, 1), round(grade, 1)
+
+
+def assess(html, text=None):
+    """Trim extracted text to its substantive paragraphs; without any text, take the page's own good blocks.
+
+    Returns (text, report) where report holds the page's visible text size, the kept size, the
+    discarded characters per label, the language and the readability scores."""
+    blocks = html_blocks(html)
+    input_chars = len("\n\n".join(block.text for block in blocks))
+    if not text:
+        kept, discarded = good_blocks_text(blocks)
+    else:
+        kept, discarded = filter_paragraphs(text, blocks)
+        input_chars = max(input_chars, len(text))
+    language, language_score = detect_language(kept)
+    ease, grade = readability(kept) if language in (None, "en") else (None, None)
+    report = {
+        "input_chars": input_chars,
+        "kept_chars": len(kept),
+        "discarded_chars": discarded,
+        "discarded_fraction": round(1 - len(kept) / input_chars, 3) if input_chars else 0.0,
+        "language": language,
+        "language_score": language_score,
+        "reading_ease": ease,
+        "grade": grade,
+    }
+    return kept, report
+
+
+def language_allowed(language):
+    return not ALLOWED_LANGUAGES or language is None or language in ALLOWED_LANGUAGES
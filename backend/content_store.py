@@ -0,0 +1,151 @@
+"""
+Content-addressed, compressed storage for scraped page text.
+
+Extracted text is stored once per distinct content (keyed by its SHA-256), zlib
+compressed, and requests pass around SourceRecords instead: a __slots__ object
+holding the URL, the digest and the length, with the text decompressed only when
+something reads `.text`. The same article served under several URLs (mirrors,
+tracking parameters, AMP pages) therefore costs one copy, and a request's memory
+no longer grows with the text of every page it touched.
+
+Stored text lives while any SourceRecord refers to it. Unreferenced text is kept
+in an LRU for later requests, up to CONTENT_STORE_MAX_MB compressed bytes.
+SourceRecords release their reference from __del__, which the garbage collector
+may run on a thread already inside the store, so releases are queued without
+locking and applied by the next store operation.
+"""
+
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict, deque
+
+
+class ContentStore:
+    def __init__(self, max_idle_bytes=32 * 1024 * 1024, level=6):
+        self.max_idle_bytes = max_idle_bytes
+        self.level = level
+        self._blobs = {}  # digest -> [compressed bytes, length, references]
+        self._idle = OrderedDict()  # unreferenced digests, least recently used first
+        self._idle_bytes = 0
+        self._dedupe_hits = 0
+        self._released = deque()  # digests whose references were dropped, not yet applied
+        self._lock = threading.Lock()
+
+    def put(self, text):
+        """Store text (once per distinct content) and return (digest, length); the caller holds a reference"""
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        with self._lock:
+            self._apply_releases()
+            blob = self._blobs.get(digest)
+            if blob is not None:
+                self._dedupe_hits += 1
+                self._unidle(digest, blob)
+                blob[2] += 1
+                return digest, blob[1]
+        compressed = zlib.compress(text.encode(), self.level)
+        with self._lock:
+            self._apply_releases()
+            blob = self._blobs.get(digest)
+            if blob is None:
+                blob = self._blobs[digest] = [compressed, len(text), 0]
+            else:
+                self._unidle(digest, blob)  # another thread stored it meanwhile
+            blob[2] += 1
+            return digest, blob[1]
+
+    def acquire(self, digest):
+        with self._lock:
+            self._apply_releases()
+            blob = self._blobs[digest]
+            self._unidle(digest, blob)
+            blob[2] += 1
+
+    def release(self, digest):
+        """Drop a reference. Safe to call from a finalizer: it never waits for the lock, and when the lock is
+        taken (possibly by this very thread) the release is applied by the next store operation."""
+        self._released.append(digest)
+        if self._lock.acquire(blocking=False):
+            try:
+                self._apply_releases()
+            finally:
+                self._lock.release()
+
+    def _apply_releases(self):
+        """Apply queued releases; called with the lock held"""
+        while self._released:
+            digest = self._released.popleft()
+            blob = self._blobs.get(digest)
+            if blob is None:
+                continue
+            blob[2] -= 1
+            if blob[2] <= 0:
+                self._idle[digest] = None
+                self._idle_bytes += len(blob[0])
+                while self._idle_bytes > self.max_idle_bytes and self._idle:
+                    evicted, _ = self._idle.popitem(last=False)
+                    self._idle_bytes -= len(self._blobs.pop(evicted)[0])
+
+    def _unidle(self, digest, blob):
+        if digest in self._idle:
+            del self._idle[digest]
+            self._idle_bytes -= len(blob[0])
+
+    def text(self, digest):
+        with self._lock:
+            blob = self._blobs.get(digest)
+            compressed = blob[0] if blob is not None else None
+        if compressed is None:
+            raise KeyError(f"content {digest[:12]} is not in the store")
+        return zlib.decompress(compressed).decode()
+
+    def record(self, url, text):
+        """A SourceRecord for text fetched from url"""
+        digest, length = self.put(text)
+        return SourceRecord(url, digest, length, self, acquired=True)
+
+    def stats(self):
+        with self._lock:
+            self._apply_releases()
+            return {
+                "entries": len(self._blobs),
+                "idle_entries": len(self._idle),
+                "compressed_bytes": sum(len(blob[0]) for blob in self._blobs.values()),
+                "text_chars": sum(blob[1] for blob in self._blobs.values()),
+                "dedupe_hits": self._dedupe_hits,
+            }
+
+
+class SourceRecord:
+    """A fetched source: URL plus a reference to its text in a ContentStore, loaded on access"""
+
+    __slots__ = ("url", "digest", "length", "_store")
+
+    def __init__(self, url, digest, length, store, acquired=False):
+        self.url = url
+        self.digest = digest
+        self.length = length
+        self._store = store
+        if not acquired:
+            store.acquire(digest)
+
+    @property
+    def text(self):
+        return self._store.text(self.digest)
+
+    def excerpt(self, limit):
+        """The text cut to `limit` characters, marked when truncated"""
+        text = self.text
+        return text[:limit] + "... [content truncated]" if len(text) > limit else text
+
+    def __del__(self):
+        store = getattr(self, "_store", None)
+        if store is not None:
+            store.release(self.digest)
+
+    def __repr__(self):
+        return f"SourceRecord({self.url!r}, {self.digest[:12]}, {self.length} chars)"
+
+
+content_store = ContentStore(max_idle_bytes=int(float(os.getenv("CONTENT_STORE_MAX_MB", "32")) * 1024 * 1024))
@@ -0,0 +1,191 @@
+"""
+Record-and-replay archive of raw HTTP responses (search results and fetched pages).
+
+The archive is two files:
+
+- `<path>.warc.gz`: a WARC-like record stream. Each record is its own gzip member
+  holding a WARC header block, the HTTP status line and headers, and the body,
+  so a single record can be read by seeking to its offset.
+- `<path>.idx`: one JSON line per record, `{"key", "offset", "length"}`, keyed by URL.
+
+In record mode every live response is appended, with the final URL and the
+redirects that led to it; in replay mode responses are served from the archive
+(optionally sleeping for the originally observed latency) and a missing URL raises
+ArchiveMiss, a connection error that says nothing about the host. API keys never
+reach the archive.
+
+    python fetch_archive.py list archive/fetches
+"""
+
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from email.utils import formatdate
+from urllib.parse import urlencode
+
+import requests
+
+from connection_pool import http_session
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+
+# Request parameters that are credentials rather than part of the resource identity
+SECRET_PARAMS = {"key", "api_key", "apikey"}
+# The archived body is already decoded, so these headers no longer describe it
+DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+
+def archive_key(url, params=None):
+    """Stable archive key for a request: the URL plus its sorted, credential-free query parameters"""
+    if not params:
+        return url
+    kept = sorted((name, str(value)) for name, value in params.items() if name.lower() not in SECRET_PARAMS)
+    return f"{url}{'&' if '?' in url else '?'}{urlencode(kept)}"
+
+
+class ArchiveMiss(requests.exceptions.ConnectionError):
+    """A replayed request with no archived response"""
+
+
+class ArchivedResponse:
+    """The subset of requests.Response the scraping code uses, rebuilt from an archive record"""
+
+    def __init__(self, url, status_code, headers, content, elapsed, history=()):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.elapsed = elapsed
+        # The redirect responses followed on the way to url, like requests.Response.history
+        self.history = list(history)
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        encoding = requests.utils.get_encoding_from_headers(self.headers) or "utf-8"
+        return self.content.decode(encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url} (archived)", response=self)
+
+
+class FetchArchive:
+    def __init__(self, path, mode=OFF, simulate_timing=False, session=None):
+        self.path = path
+        self.mode = mode
+        self.simulate_timing = simulate_timing
+        # Live requests go through this Session (connection pooling), or plain requests.get without one
+        self.session = session
+        self.data_path = f"{path}.warc.gz"
+        self.index_path = f"{path}.idx"
+        self._lock = threading.Lock()
+        self._index = {}
+        if mode != OFF:
+            self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._index[entry["key"]] = (entry["offset"], entry["length"])
+
+    def __len__(self):
+        return len(self._index)
+
+    def keys(self):
+        return list(self._index)
+
+    def record(self, key, status_code, reason, headers, content, elapsed, final_url=None, history=()):
+        """Append a response; history holds the (url, status code) of each redirect followed before final_url"""
+        header_lines = "".join(
+            f"{name}: {value}\r\n" for name, value in headers.items() if name.lower() not in DROPPED_HEADERS
+        )
+        http_block = f"HTTP/1.1 {status_code} {reason or ''}\r\n{header_lines}\r\n".encode("latin-1", errors="replace") + content
+        warc_header = (
+            "WARC/1.0\r\n"
+            "WARC-Type: response\r\n"
+            f"WARC-Target-URI: {key}\r\n"
+            f"WARC-Date: {formatdate(usegmt=True)}\r\n"
+            f"X-Elapsed-Seconds: {elapsed:.6f}\r\n"
+            f"X-Final-URI: {final_url or key}\r\n"
+            f"X-Redirects: {json.dumps([[url, status] for url, status in history])}\r\n"
+            "Content-Type: application/http; msgtype=response\r\n"
+            f"Content-Length: {len(http_block)}\r\n\r\n"
+        ).encode()
+        member = gzip.compress(warc_header + http_block + b"\r\n\r\n")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock:
+            with open(self.data_path, "ab") as data:
+                offset = data.tell()
+                data.write(member)
+            with open(self.index_path, "a") as index:
+                index.write(json.dumps({"key": key, "offset": offset, "length": len(member)}) + "\n")
+            self._index[key] = (offset, len(member))
+
+    def lookup(self, key):
+        location = self._index.get(key)
+        if location is None:
+            return None
+        offset, length = location
+        with open(self.data_path, "rb") as data:
+            data.seek(offset)
+            raw = gzip.decompress(data.read(length))
+        warc_header, _, rest = raw.partition(b"\r\n\r\n")
+        warc_fields = dict(line.split(": ", 1) for line in warc_header.decode().split("\r\n")[1:])
+        http_block = rest[:int(warc_fields["Content-Length"])]
+        http_header, _, content = http_block.partition(b"\r\n\r\n")
+        status_line, *header_lines = http_header.decode("latin-1").split("\r\n")
+        headers = dict(line.split(": ", 1) for line in header_lines if ": " in line)
+        # Records written before redirects were kept lack the fields: the key was the final URL as far as they know
+        history = [ArchivedResponse(url, status, {}, b"", 0.0) for url, status in json.loads(warc_fields.get("X-Redirects", "[]"))]
+        return ArchivedResponse(warc_fields.get("X-Final-URI", key), int(status_line.split(" ")[1]), headers, content,
+                                float(warc_fields["X-Elapsed-Seconds"]), history)
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        """requests.get routed through the archive according to the mode"""
+        key = archive_key(url, params)
+        if self.mode == REPLAY:
+            archived = self.lookup(key)
+            if archived is None:
+                raise ArchiveMiss(f"Not in fetch archive: {key}")
+            if self.simulate_timing:
+                time.sleep(archived.elapsed)
+            return archived
+        response = (self.session or requests).get(url, params=params, headers=headers, timeout=timeout)
+        if self.mode == RECORD:
+            self.record(key, response.status_code, response.reason, response.headers, response.content,
+                        response.elapsed.total_seconds(), response.url,
+                        [(redirect.url, redirect.status_code) for redirect in response.history])
+        return response
+
+
+fetch_archive = FetchArchive(
+    os.getenv("FETCH_ARCHIVE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive", "fetches")),
+    mode=os.getenv("FETCH_ARCHIVE_MODE", OFF),
+    simulate_timing=os.getenv("FETCH_ARCHIVE_SIMULATE_TIMING", "1") == "1",
+    session=http_session,
+)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "list":
+        sys.exit("usage: python fetch_archive.py list <archive path without extension>")
+    archive = FetchArchive(sys.argv[2], mode=REPLAY)
+    for key in archive.keys():
+        response = archive.lookup(key)
+        print(f"{response.status_code}  {len(response.content):>8} B  {response.elapsed * 1000:>7.0f} ms  {key}")
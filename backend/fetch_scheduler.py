@@ -0,0 +1,132 @@
+"""
+Process-wide scheduler for outbound page fetches.
+
+Replaces the fixed sleep after every fetch with politeness where it matters:
+each host gets a token bucket (in memory with a single worker process, in the
+SharedStore when several workers must share it), each process has a cap on
+fetches in flight,
+and free slots are handed out round-robin across the lesson-plan requests
+waiting for them, so one large request cannot starve the others.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from shared_state import shared_store
+
+# Identifies the lesson-plan request a fetch belongs to, for fair queuing
+fetch_requester = ContextVar("fetch_requester", default=None)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Consume a token if available; otherwise return the seconds until one is"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FetchScheduler:
+    """Per-host token buckets plus a global in-flight cap with round-robin fairness across requesters"""
+
+    def __init__(self, per_host_rate=2.0, per_host_burst=2, max_in_flight=8, store=None):
+        self.per_host_rate = per_host_rate
+        self.per_host_burst = per_host_burst
+        self.max_in_flight = max_in_flight
+        self.store = store
+        self._buckets = {}
+        self._bucket_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        # requester -> FIFO of waiting tickets; order of keys is the round-robin order
+        self._waiting = OrderedDict()
+
+    def _take_host_token(self, host):
+        if self.store is not None:
+            return self.store.take_token(f"fetch:{host}", self.per_host_rate, self.per_host_burst)
+        with self._bucket_lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.per_host_rate, self.per_host_burst)
+            return bucket.take()
+
+    def _wait_for_host(self, host):
+        while True:
+            delay = self._take_host_token(host)
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def _is_next(self, ticket):
+        if self._in_flight >= self.max_in_flight:
+            return False
+        first_queue = next(iter(self._waiting.values()))
+        return first_queue[0] is ticket
+
+    def _acquire_slot(self, requester):
+        ticket = object()
+        with self._cond:
+            self._waiting.setdefault(requester, deque()).append(ticket)
+            while not self._is_next(ticket):
+                self._cond.wait()
+            queue = self._waiting[requester]
+            queue.popleft()
+            if queue:
+                # Let other requesters go before this one gets another slot
+                self._waiting.move_to_end(requester)
+            else:
+                del self._waiting[requester]
+            self._in_flight += 1
+            self._cond.notify_all()
+
+    def _release_slot(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, host, requester=None):
+        """Block until `host` may be fetched politely and a global slot is free"""
+        if requester is None:
+            requester = fetch_requester.get()
+        self._wait_for_host(host)
+        self._acquire_slot(requester)
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "waiting_requests": len(self._waiting),
+                "waiting_fetches": sum(len(q) for q in self._waiting.values()),
+            }
+
+
+# A single worker keeps its host buckets in memory; several share them through the SQLite store, which
+# costs a write transaction per fetch
+fetch_scheduler = FetchScheduler(
+    per_host_rate=float(os.getenv("FETCH_HOST_RATE", "2")),
+    per_host_burst=int(os.getenv("FETCH_HOST_BURST", "2")),
+    max_in_flight=int(os.getenv("FETCH_MAX_IN_FLIGHT", "8")),
+    store=shared_store if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else None,
+)
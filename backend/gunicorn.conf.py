@@ -0,0 +1,37 @@
+"""
+Gunicorn settings for the production server (used by `python run_server.py --prod`).
+
+    gunicorn -c gunicorn.conf.py main:app
+"""
+
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+# The app reads it too: with several workers, per-host fetch rate limits are shared through SQLite
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import main (FastAPI app, pydantic models) once in the master and fork the workers from it; when_ready
+# below adds the modules main defers, so the forked workers share them too
+preload_app = True
+
+# Seconds in-flight requests get to finish after SIGTERM before workers are killed
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# Lesson plans can take a minute; keep the worker watchdog above that
+timeout = 120
+keepalive = 5
+
+
+def when_ready(server):
+    """In the master, after the app is preloaded and before the workers fork: import the agents SDK and page
+    parsers that main leaves to the warm-up, so each worker's warm-up finds them imported. Only modules: no
+    clients, pools or threads are created before the fork."""
+    if not server.cfg.preload_app:
+        return
+    import time
+    start = time.perf_counter()
+    import agents  # noqa: F401
+    import bs4  # noqa: F401
+    import newspaper  # noqa: F401
+    server.log.info("Imported the agents SDK and page parsers for the workers in %.1fs", time.perf_counter() - start)
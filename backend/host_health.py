@@ -0,0 +1,168 @@
+"""
+Per-host latency tracking and circuit breakers for page fetches.
+
+Every fetch reports its latency and outcome here. Timeouts are derived from
+the observed latency percentiles of each host, and hosts that keep failing
+are short-circuited for a cooldown period instead of eating the request budget.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from urllib.parse import urlparse
+
+logger = logging.getLogger("lesson_planner.host_health")
+
+# Upper bounds (seconds) of the latency histogram buckets shown on the admin endpoint
+LATENCY_BUCKETS = [0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, float("inf")]
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def host_of(url):
+    """Return the lower-cased host of a URL (empty string if it has none)"""
+    return (urlparse(url).hostname or "").lower()
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class HostStats:
+    """Latency window, histogram and breaker state for one host"""
+
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.trial_started = 0.0
+
+    def observe(self, latency):
+        self.latencies.append(latency)
+        self.bucket_counts[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+
+class HostHealth:
+    """Thread-safe registry of HostStats with adaptive timeouts and circuit breaking"""
+
+    def __init__(self, default_timeout=15.0, min_timeout=3.0, max_timeout=15.0, timeout_percentile=95,
+                 timeout_multiplier=2.0, min_samples=5, window=50, failure_threshold=3, cooldown=60.0, trial_timeout=None,
+                 clock=time.monotonic):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.min_samples = min_samples
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        # A half-open trial that has not reported after this long is given up, so another may be let through
+        self.trial_timeout = trial_timeout if trial_timeout is not None else 2 * max_timeout
+        # Seconds on a monotonic clock; tests pass a fake one
+        self.clock = clock
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, host):
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = HostStats(self.window)
+        return stats
+
+    def allow(self, host):
+        """Return False while the host's breaker is open; lets a single trial through after the cooldown.
+
+        The caller must report the trial with record_success or record_failure."""
+        with self._lock:
+            stats = self._stats(host)
+            if stats.state == CLOSED:
+                return True
+            now = self.clock()
+            if stats.state == OPEN and now - stats.opened_at >= self.cooldown:
+                stats.state = HALF_OPEN
+                stats.trial_in_flight = False
+            if stats.state == HALF_OPEN and stats.trial_in_flight and now - stats.trial_started >= self.trial_timeout:
+                logger.warning("Trial fetch for %s never reported, allowing another", host)
+                stats.trial_in_flight = False
+            if stats.state == HALF_OPEN and not stats.trial_in_flight:
+                stats.trial_in_flight = True
+                stats.trial_started = now
+                return True
+            return False
+
+    def timeout_for(self, host):
+        """Timeout derived from the host's latency percentile, clamped to [min_timeout, max_timeout]"""
+        with self._lock:
+            stats = self._hosts.get(host)
+            if stats is None or len(stats.latencies) < self.min_samples:
+                return self.default_timeout
+            observed = _percentile(sorted(stats.latencies), self.timeout_percentile)
+        return max(self.min_timeout, min(self.max_timeout, observed * self.timeout_multiplier))
+
+    def record_success(self, host, latency):
+        with self._lock:
+            stats = self._stats(host)
+            stats.observe(latency)
+            stats.successes += 1
+            stats.consecutive_failures = 0
+            stats.state = CLOSED
+            stats.trial_in_flight = False
+
+    def record_failure(self, host, latency=None):
+        with self._lock:
+            stats = self._stats(host)
+            if latency is not None:
+                stats.observe(latency)
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if stats.state == HALF_OPEN or stats.consecutive_failures >= self.failure_threshold:
+                if stats.state != OPEN:
+                    logger.warning("Circuit opened for %s after %d consecutive failures", host, stats.consecutive_failures)
+                stats.state = OPEN
+                stats.opened_at = self.clock()
+                stats.trial_in_flight = False
+
+    def release(self, host):
+        """End a fetch that says nothing about the host's health (a half-open trial may be granted again)"""
+        with self._lock:
+            self._stats(host).trial_in_flight = False
+
+    def snapshot(self):
+        """Breaker state and latency histogram for every host seen so far"""
+        now = self.clock()
+        hosts = {}
+        with self._lock:
+            items = [(host, stats, sorted(stats.latencies)) for host, stats in self._hosts.items()]
+        for host, stats, latencies in items:
+            hosts[host] = {
+                "state": stats.state,
+                "successes": stats.successes,
+                "failures": stats.failures,
+                "consecutive_failures": stats.consecutive_failures,
+                "cooldown_remaining_s": round(max(0.0, self.cooldown - (now - stats.opened_at)), 1) if stats.state == OPEN else 0.0,
+                "p50_s": _percentile(latencies, 50),
+                "p95_s": _percentile(latencies, 95),
+                "timeout_s": round(self.timeout_for(host), 2),
+                "histogram": {
+                    ("+Inf" if bound == float("inf") else str(bound)): count
+                    for bound, count in zip(LATENCY_BUCKETS, stats.bucket_counts)
+                },
+            }
+        return hosts
+
+
+host_health = HostHealth()
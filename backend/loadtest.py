@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end load test for /create-lesson-plan.
+
+Everything the pipeline talks to is replaced by a local stand-in, so no Google or
+OpenAI keys are needed:
+
+- a fake Custom Search server returning results that point at the fixture sites
+- a fixture web server serving fixtures/pages/*.html from several loopback hosts
+  (127.0.0.1, 127.0.0.2, ...) with configurable latency and failure rate
+- a stub Runner for the three agents that returns canned LessonPlans
+  (the scraper agent still runs the real scraping code against the fixture sites),
+  or with --model-server the real agents talking to a stub OpenAI-compatible
+  chat completions server, which exercises model routing and fallback
+
+The app runs in-process under uvicorn and is driven over HTTP at the requested
+concurrency. Throughput, p50/p95/p99 latency, error rate and mean stage timings
+are reported at the end.
+
+    python loadtest.py --requests 100 --concurrency 10 --site-latency 0.2 --site-failure-rate 0.1
+    python loadtest.py --model-server --model-latency gpt-4o-mini=3,gpt-4o=0.5 --model-timeout 2
+"""
+
+import argparse
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import random
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(BACKEND_DIR, "fixtures", "pages")
+
+TOPICS = ["Photosynthesis", "Simple Machines", "The Water Cycle", "Fractions", "The Solar System", "Volcanoes"]
+GRADES = [None, "grade 4", "grade 6", "grade 8"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FixtureSite:
+    """Serves the HTML fixtures with simulated latency and failures on every loopback host"""
+
+    def __init__(self, hosts=5, latency=0.2, jitter=0.1, failure_rate=0.0, seed=0):
+        self.pages = {
+            name[:-len(".html")]: open(os.path.join(PAGES_DIR, name), "rb").read()
+            for name in sorted(os.listdir(PAGES_DIR)) if name.endswith(".html")
+        }
+        self.hosts = hosts
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.port = free_port()
+        self.fetches = 0
+        site = self
+
+        class Handler(QuietHandler):
+            def do_GET(self):
+                site.fetches += 1
+                time.sleep(max(0.0, site.latency + site.random.uniform(-site.jitter, site.jitter)))
+                if site.random.random() < site.failure_rate:
+                    if site.random.random() < 0.5:
+                        self.send_body(503, b"Service Unavailable", "text/plain")
+                    else:
+                        # Drop the connection without a response
+                        self.close_connection = True
+                    return
+                page = self.pages_get(urlparse(self.path).path.strip("/").removesuffix(".html"))
+                if page is None:
+                    self.send_body(404, b"Not Found", "text/plain")
+                else:
+                    self.send_body(200, page, "text/html; charset=utf-8")
+
+            def pages_get(self, name):
+                return site.pages.get(name)
+
+        # Bound to all interfaces so 127.0.0.2, 127.0.0.3, ... act as distinct hosts
+        self.server = ThreadingHTTPServer(("", self.port), Handler)
+        self.server.daemon_threads = True
+
+    def url_for(self, page):
+        host_index = int(hashlib.md5(page.encode()).hexdigest(), 16) % self.hosts + 1
+        return f"http://127.0.0.{host_index}:{self.port}/{page}.html"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def parse_fields(spec):
+    """Partial-response selector 'a(b,c),d/e' as a tree {'a': {'b': {}, 'c': {}}, 'd': {'e': {}}}"""
+    tokens = re.findall(r"[^,()/\s]+|[,()/]", spec)
+    position = 0
+
+    def selection():
+        nonlocal position
+        tree = {}
+        while position < len(tokens) and tokens[position] != ")":
+            node = tree.setdefault(tokens[position], {})
+            position += 1
+            while position < len(tokens) and tokens[position] == "/":
+                node = node.setdefault(tokens[position + 1], {})
+                position += 2
+            if position < len(tokens) and tokens[position] == "(":
+                position += 1
+                node.update(selection())
+                position += 1  # ")"
+            if position < len(tokens) and tokens[position] == ",":
+                position += 1
+        return tree
+
+    return selection()
+
+
+def select_fields(value, tree):
+    """The parts of a JSON value named by a parse_fields tree (lists are filtered item by item)"""
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [select_fields(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {name: select_fields(value[name], sub) for name, sub in tree.items() if name in value}
+    return value
+
+
+class FakeCustomSearch:
+    """Custom Search JSON API look-alike whose results point at the fixture site"""
+
+    def __init__(self, site, latency=0.1, url_variants=False):
+        self.site = site
+        self.latency = latency
+        self.url_variants = url_variants
+        self.port = free_port()
+        self.queries = 0
+        self.response_bytes = 0
+        fake = self
+
+        class Handler(QuietHandler):
+            def do_GET(self):
+                time.sleep(fake.latency)
+                params = parse_qs(urlparse(self.path).query)
+                fake.queries += 1
+                results = fake.results(
+                    params.get("q", [""])[0],
+                    int(params.get("num", ["10"])[0]),
+                    int(params.get("start", ["1"])[0]),
+                )
+                if "fields" in params:
+                    results = select_fields(results, parse_fields(params["fields"][0]))
+                body = json.dumps(results).encode()
+                fake.response_bytes += len(body)
+                self.send_body(200, body, "application/json")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.port}/customsearch/v1"
+
+    def results(self, query, num, start):
+        words = set(query.lower().replace("-", " ").split())
+        # Pages sharing words with the query rank first, like a real search would
+        ranked = sorted(self.site.pages, key=lambda page: (-len(words & set(page.split("-"))), page))
+        links = [(page, self.site.url_for(page)) for page in ranked]
+        if self.url_variants:
+            # Each page is listed again in another spelling, as real results often are
+            links = [entry for page, link in links for entry in ((page, link), (page, f"{link}/?utm_source=cse#top"))]
+        page_slice = links[start - 1:start - 1 + num]
+        items = []
+        for page, link in page_slice:
+            text = self.site.pages[page].decode()
+            title = text.split("<title>", 1)[1].split("</title>", 1)[0]
+            description = text.split('name="description" content="', 1)[1].split('"', 1)[0] if 'name="description"' in text else ""
+            items.append({
+                "title": title,
+                "link": link,
+                "snippet": description[:160],
+                "pagemap": {"metatags": [{"og:description": description}]},
+            })
+        response = {"searchInformation": {"totalResults": str(len(links))}, "items": items}
+        if start - 1 + num < len(links):
+            response["queries"] = {"nextPage": [{"startIndex": start + num}]}
+        return response
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def make_stub_runner(main, llm_latency=0.0):
+    """Runner stand-in: instant validation, real scraping, canned lesson plan after `llm_latency` seconds"""
+    with open(os.path.join(BACKEND_DIR, "sample_output.json")) as f:
+        canned_plan = json.load(f)["lesson_plan"]
+
+    class StubRunner:
+        planner_prompt_chars = []
+
+        @staticmethod
+        async def run(agent, input, **kwargs):
+            await asyncio.sleep(llm_latency)
+            if agent.name == main.validation_agent.name:
+                return SimpleNamespace(final_output=f"VALID: {input}")
+            if agent.name == main.scraper_agent.name:
+                output = await main.scrape_topic_content_async([input], main.google_search_api_key, main.cse_id)
+                return SimpleNamespace(final_output=output)
+            StubRunner.planner_prompt_chars.append(len(str(input)))
+            plan = copy.deepcopy(canned_plan)
+            plan["topic"] = str(input).splitlines()[0].removeprefix("Create a lesson plan for: ")
+            return SimpleNamespace(final_output=agent.output_type(**plan) if isinstance(agent.output_type, type) else plan)
+
+    return StubRunner
+
+
+class StubModelServer:
+    """OpenAI-compatible /v1/chat/completions stand-in with per-model latency and failure rate.
+
+    Structured outputs are recognised by their JSON schema: lesson plans (or some of their
+    sections) come from the canned plan, scrape outputs are built from the tool result, plain-text output validates
+    the query. Agents with tools get one tool call for the user query first."""
+
+    def __init__(self, latencies=None, default_latency=0.5, failure_rate=0.0, slow_rate=0.0, seed=0):
+        with open(os.path.join(BACKEND_DIR, "sample_output.json")) as f:
+            self.canned_plan = json.load(f)["lesson_plan"]
+        self.latencies = latencies or {}
+        self.default_latency = default_latency
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.random = random.Random(seed)
+        self.port = free_port()
+        self.calls = {}
+        self.planner_prompt_chars = []
+        stub = self
+
+        class Handler(QuietHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                model = body.get("model", "")
+                stub.calls[model] = stub.calls.get(model, 0) + 1
+                latency = stub.latencies.get(model, stub.default_latency)
+                # Slow calls model a long latency tail, the case hedging is for
+                time.sleep(latency * 10 if stub.random.random() < stub.slow_rate else latency)
+                if stub.random.random() < stub.failure_rate:
+                    self.send_body(500, b'{"error": {"message": "stub failure"}}', "application/json")
+                    return
+                try:
+                    self.send_body(200, json.dumps(stub.completion(body)).encode(), "application/json")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the router gave up on this call and moved to another tier
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def completion(self, body):
+        messages = body.get("messages", [])
+        user_text = next((m["content"] for m in reversed(messages) if m.get("role") == "user" and isinstance(m.get("content"), str)), "")
+        tool_results = [m.get("content") for m in messages if m.get("role") == "tool"]
+        message = {"role": "assistant", "content": None}
+        finish_reason = "stop"
+        tools = [t["function"]["name"] for t in body.get("tools", []) if t.get("type") == "function"]
+        if "scrape_tool" in tools and not tool_results:
+            message["tool_calls"] = [{
+                "id": f"call_{self.random.randrange(1 << 30)}",
+                "type": "function",
+                "function": {"name": "scrape_tool", "arguments": json.dumps({"queries": [user_text]})},
+            }]
+            finish_reason = "tool_calls"
+        else:
+            schema = (body.get("response_format") or {}).get("json_schema", {}).get("schema", {})
+            properties = schema.get("properties", {})
+            if properties and set(properties) <= set(self.canned_plan):
+                # A full lesson plan, or just the sections being regenerated
+                if set(properties) == set(self.canned_plan):
+                    self.planner_prompt_chars.append(len(user_text))
+                plan = copy.deepcopy(self.canned_plan)
+                plan["topic"] = user_text.splitlines()[0].removeprefix("Create a lesson plan for: ")
+                message["content"] = json.dumps({name: plan[name] for name in properties})
+            elif "sources" in properties:
+                message["content"] = self._scrape_output(user_text, tool_results)
+            else:
+                message["content"] = f"VALID: {user_text}"
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+        completion_tokens = len(message["content"] or "") // 4 + 10
+        return {
+            "id": f"chatcmpl-stub-{self.random.randrange(1 << 30)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", ""),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def _scrape_output(self, topic, tool_results):
+        for result in reversed(tool_results):
+            try:
+                output = json.loads(result)
+            except (TypeError, ValueError):
+                continue
+            if isinstance(output, dict) and "sources" in output:
+                return json.dumps(output)
+        return json.dumps({"topic": topic, "summary": "No tool output.", "sources": []})
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def parse_model_latencies(spec):
+    """'gpt-4o-mini=3,gpt-4o=0.5' -> {'gpt-4o-mini': 3.0, 'gpt-4o': 0.5}"""
+    if not spec:
+        return {}
+    return {name: float(value) for name, value in (item.split("=", 1) for item in spec.split(","))}
+
+
+class AppServer:
+    """Runs main.app under uvicorn in a background thread"""
+
+    def __init__(self, app):
+        import uvicorn
+        self.port = free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        threading.Thread(target=self.server.run, daemon=True).start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+
+
+def drive(base_url, total, concurrency, seed=0, snippet_only=False):
+    import requests
+
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(total):
+        payload = {"topic": rng.choice(TOPICS)}
+        grade = rng.choice(GRADES)
+        if grade:
+            payload["grade_level"] = grade
+        if snippet_only:
+            payload["snippet_only"] = True
+        payloads.append(payload)
+    local = threading.local()
+
+    def one(payload):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}/create-lesson-plan", json=payload, timeout=300)
+            body = response.json()
+            ok = response.status_code == 200 and body.get("success", False)
+            return time.perf_counter() - start, ok, body.get("timings")
+        except Exception:
+            return time.perf_counter() - start, False, None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, payloads))
+    return time.perf_counter() - start, results
+
+
+def report(wall_time, results, cse_queries, page_fetches, planner_prompt_chars=()):
+    latencies = sorted(latency for latency, _, _ in results)
+    errors = sum(1 for _, ok, _ in results if not ok)
+    stage_totals = {}
+    for _, _, timings in results:
+        for stage, ms in ((timings or {}).get("stages") or {}).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + ms
+    return {
+        "requests": len(results),
+        "wall_time_s": round(wall_time, 2),
+        "throughput_rps": round(len(results) / wall_time, 2) if wall_time else 0.0,
+        "latency_s": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "cse_queries": cse_queries,
+        "page_fetches": page_fetches,
+        "mean_planner_prompt_chars": round(sum(planner_prompt_chars) / len(planner_prompt_chars)) if planner_prompt_chars else None,
+        "mean_stage_ms": {stage: round(total / len(results), 1) for stage, total in sorted(stage_totals.items())},
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for the Lesson Planner API")
+    parser.add_argument("--requests", type=int, default=50, help="total requests to send")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight at once")
+    parser.add_argument("--hosts", type=int, default=5, help="distinct loopback hosts serving fixtures")
+    parser.add_argument("--site-latency", type=float, default=0.2, help="mean page latency in seconds")
+    parser.add_argument("--site-jitter", type=float, default=0.1, help="+/- uniform jitter on page latency")
+    parser.add_argument("--site-failure-rate", type=float, default=0.0, help="fraction of page fetches that fail")
+    parser.add_argument("--cse-latency", type=float, default=0.1, help="fake Custom Search latency in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub latency of each agent call in seconds")
+    parser.add_argument("--model-server", action="store_true",
+                        help="run the real agents against a stub chat completions server instead of the stub Runner")
+    parser.add_argument("--model-latency", default="", help="per-model stub latency, e.g. gpt-4o-mini=3,gpt-4o=0.5")
+    parser.add_argument("--model-failure-rate", type=float, default=0.0, help="fraction of stub model calls that fail")
+    parser.add_argument("--model-slow-rate", type=float, default=0.0, help="fraction of stub model calls that take 10x their latency")
+    parser.add_argument("--model-timeout", type=float, default=30.0, help="per-tier timeout used with --model-server")
+    parser.add_argument("--warm-cache", action="store_true", help="keep the shared state (page cache) between runs")
+    parser.add_argument("--plan-cache", action="store_true",
+                        help="serve repeated topics from the plan cache (off by default, so every request runs the pipeline)")
+    parser.add_argument("--url-variants", action="store_true", help="list every search result twice, the second time with a trailing slash, utm_source and a fragment")
+    parser.add_argument("--snippet-only", action="store_true", help="ask for plans built from search snippets, without page fetches")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON only")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    site = FixtureSite(args.hosts, args.site_latency, args.site_jitter, args.site_failure_rate, args.seed).start()
+    search = FakeCustomSearch(site, args.cse_latency, args.url_variants).start()
+    model_server = None
+    if args.model_server:
+        model_server = StubModelServer(parse_model_latencies(args.model_latency), args.llm_latency,
+                                       args.model_failure_rate, args.model_slow_rate, args.seed).start()
+        os.environ.update({
+            "MODEL_TIERS": json.dumps([
+                {"name": "mini", "model": "gpt-4o-mini", "base_url": model_server.base_url, "timeout": args.model_timeout},
+                {"name": "standard", "model": "gpt-4o", "base_url": model_server.base_url, "timeout": args.model_timeout},
+            ]),
+            "OPENAI_AGENTS_DISABLE_TRACING": "1",
+            "AGENT_CACHE_ENABLED": "0",
+        })
+
+    # Configure the app before importing it: it reads these at import time
+    state_path = os.path.join(tempfile.gettempdir(), "lesson_planner_loadtest.sqlite3")
+    log_path = os.path.join(tempfile.gettempdir(), "lesson_planner_loadtest_requests.jsonl")
+    if not args.warm_cache:
+        for path in (state_path, state_path + "-wal", state_path + "-shm", log_path, log_path + ".1"):
+            if os.path.exists(path):
+                os.remove(path)
+    os.environ.update({
+        "CSE_ENDPOINT": search.endpoint,
+        "GOOGLE_SEARCH_API_KEY": "offline",
+        "CSE_ID": "offline",
+        "SHARED_STATE_PATH": state_path,
+        "REQUEST_LOG_PATH": log_path,
+        "PLAN_CACHE_TTL": os.getenv("PLAN_CACHE_TTL", "86400") if args.plan_cache else "0",
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    })
+    sys.path.insert(0, BACKEND_DIR)
+    import main as app_module
+    if model_server is None:
+        app_module.Runner = make_stub_runner(app_module, args.llm_latency)
+
+    server = AppServer(app_module.app).start()
+    # Measure the steady state: let the background warm-up (agents SDK, parsers) finish first
+    app_module.warmed_up.wait(60)
+    try:
+        wall_time, results = drive(server.base_url, args.requests, args.concurrency, args.seed, args.snippet_only)
+    finally:
+        server.stop()
+        search.stop()
+        site.stop()
+        if model_server is not None:
+            model_server.stop()
+
+    prompt_chars = (model_server or app_module.Runner).planner_prompt_chars
+    summary = report(wall_time, results, search.queries, site.fetches, prompt_chars)
+    summary["cse_response_bytes"] = search.response_bytes
+    scrapes = sum(app_module.SCRAPES.values().values())
+    summary["search_rounds_per_scrape"] = round(sum(app_module.SEARCH_ROUNDS.values().values()) / scrapes, 2) if scrapes else None
+    summary["snippet_sources"] = sum(app_module.SNIPPET_FALLBACKS.values().values())
+    summary["scrapes_short"] = sum(count for (_, outcome), count in app_module.SCRAPES.values().items() if outcome == "short")
+    if model_server is not None:
+        summary["model_calls"] = dict(model_server.calls)
+        summary["model_tiers"] = app_module.model_router.snapshot()["tiers"]
+        hedges = {}
+        for (_, _, winner), count in app_module.LLM_HEDGES.values().items():
+            hedges[winner] = hedges.get(winner, 0) + count
+        summary["hedges"] = hedges
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return summary
+    print(f"Requests:    {summary['requests']} at concurrency {args.concurrency}")
+    print(f"Throughput:  {summary['throughput_rps']} req/s over {summary['wall_time_s']} s")
+    print(f"Latency:     p50 {summary['latency_s']['p50']} s, p95 {summary['latency_s']['p95']} s, p99 {summary['latency_s']['p99']} s")
+    print(f"Error rate:  {summary['error_rate'] * 100:.1f}%")
+    print(f"CSE queries: {summary['cse_queries']} ({summary['cse_response_bytes']} response bytes)")
+    print(f"Page fetches: {summary['page_fetches']} ({summary['snippet_sources']} sources from search snippets)")
+    print(f"Planner prompt: {summary['mean_planner_prompt_chars']} chars on average")
+    print(f"Search rounds: {summary['search_rounds_per_scrape']} per scrape, {summary['scrapes_short']} scrapes ended short of content")
+    if model_server is not None:
+        print("Model calls: " + ", ".join(f"{model} {count}" for model, count in sorted(summary["model_calls"].items())))
+        for tier in summary["model_tiers"]:
+            print(f"  tier {tier['name']}: {tier['calls']} calls, p90 {tier['p90_s']} s, error rate {tier['error_rate']}, degraded {tier['degraded']}")
+        print(f"Hedges:      {sum(summary['hedges'].values())} ("
+              + ", ".join(f"{winner} won {count}" for winner, count in sorted(summary["hedges"].items())) + ")")
+    print("Mean stage timings (ms): " + ", ".join(f"{stage} {ms}" for stage, ms in summary["mean_stage_ms"].items()))
+    return summary
+
+
+if __name__ == "__main__":
+    main()
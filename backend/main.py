@@ -1,29 +1,163 @@
-from typing import override, List, Optional
-from pydantic import BaseModel, Field
+from typing import override, Dict, List, Optional
+from pydantic import BaseModel, Field, create_model
 import requests
 from dotenv import load_dotenv
 import os
+import json
+import orjson
 import asyncio
 import time
 import logging
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from urllib.parse import urljoin, urlparse
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
+from fastapi.responses import PlainTextResponse, Response
+from contextlib import asynccontextmanager
 load_dotenv(override = "True")
 google_search_api_key = os.getenv("GOOGLE_SEARCH_API_KEY")
 cse_id = os.getenv("CSE_ID")
+# Overridable so the offline load-test harness can point searches at a local fake
+cse_endpoint = os.getenv("CSE_ENDPOINT", "https://www.googleapis.com/customsearch/v1")
+# Optional daily cap on Custom Search queries, counted across all worker processes
+cse_daily_quota = int(os.getenv("CSE_DAILY_QUOTA", "0")) or None
+page_cache_ttl = int(os.getenv("PAGE_CACHE_TTL", str(24 * 3600)))
+# Seconds a round waits for its page fetches before using search snippets for the rest (0: wait for all)
+fetch_round_timeout = float(os.getenv("FETCH_ROUND_TIMEOUT", "0")) or None
+# Build every plan from search snippets, without fetching pages
+snippet_only_default = os.getenv("SNIPPET_ONLY", "0") == "1"
+
+# Local modules read their tuning from the environment, so import them after load_dotenv
+from shared_state import shared_store, purge_interval as state_purge_interval
+from host_health import host_health, host_of
+from fetch_scheduler import fetch_scheduler, fetch_requester
+from request_context import RequestContext, current_request, ensure_request_context, timed, count_usage, logger, configure_logging
+
+configure_logging()
+from connection_pool import prewarmer, top_cached_hosts
+from fetch_archive import fetch_archive, ArchiveMiss, OFF as ARCHIVE_OFF, REPLAY as ARCHIVE_REPLAY
+from agent_cache import agent_cache
+from model_router import model_router
+from plan_store import plan_store
+from content_store import content_store
+from page_parser import parse_pool, known_encoding
+from summarizer import summarize
+from search_depth import depth_planner, broaden, PAGE
+from search_results import SearchResult, CSE_FIELDS, CSE_MAX_NUM, CSE_MAX_START
+from url_canonical import canonicalize_url, dedupe_links, redirect_map
+from request_log import request_log, HIT as CACHE_HIT, PARTIAL as CACHE_PARTIAL, MISS as CACHE_MISS
+from cache_warmer import cache_warmer
+from http_responses import FastJSONResponse, CompressionMiddleware, weak_etag, etag_matches
+from metrics import registry, CACHE_REQUESTS, EXTRACTION_FAILURES, LINKS_DEDUPED, SNIPPET_FALLBACKS, SEARCH_ROUNDS, CSE_RESPONSE_BYTES, SCRAPES, PAGE_CHARS, CHARS_DISCARDED, CSE_QUERIES, CSE_QUOTA_USED, LLM_TOKENS, LLM_CALLS, LLM_HEDGES, CONTENT_STORE
+
+# Upper bound on one agent call, across tier fallbacks and hedges
+llm_call_deadline = float(os.getenv("LLM_CALL_DEADLINE", "90"))
+
+warmer_enabled = os.getenv("WARMER_ENABLED", "0") == "1"
+
+warmed_up = threading.Event()
+
+def warm_up():
+    """Import the page parsers and the agents SDK, which main leaves out of startup so /health answers
+    at once; the first lesson plan request would otherwise pay for them"""
+    start = time.perf_counter()
+    import newspaper  # noqa: F401
+    import bs4  # noqa: F401
+    parse_pool.start()
+    build_agents()
+    warmed_up.set()
+    logger.info("Warm-up finished", extra={"seconds": round(time.perf_counter() - start, 2)})
+
+ready = threading.Event()
+# The agents' default OpenAI client; created by build_agents when OPENAI_API_KEY is set
+openai_client = None
+
+def prewarm_connections():
+    """Resolve and connect to the search endpoint and PREWARM_HOSTS, and resolve the most cached source hosts"""
+    if fetch_archive.mode == ARCHIVE_REPLAY:
+        prewarmer.finished.set()  # replays never touch the network
+        return
+    prewarmer.run(extra_urls=[cse_endpoint], resolve_hosts=top_cached_hosts(shared_store, prewarmer.top_hosts))
+
+def model_clients():
+    """{base_url: AsyncOpenAI} of every client agent calls go through"""
+    clients = {}
+    if openai_client is not None:
+        clients[str(openai_client.base_url)] = openai_client
+    clients.update(model_router.clients())
+    return clients
+
+async def prewarm_model_clients():
+    """Open a pooled connection on each model API client (on the serving event loop, which owns them)"""
+    import openai
+
+    async def connect(base_url, client):
+        start = time.perf_counter()
+        result = {"connected": True}
+        try:
+            await client.with_options(max_retries=0, timeout=prewarmer.timeout).models.list()
+        except openai.APIStatusError:
+            pass  # an HTTP error still means the connection is up
+        except Exception as e:
+            result = {"connected": False, "error": repr(e)}
+        result["connect_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        prewarmer.results[host_of(base_url)] = result
+
+    await asyncio.gather(*(connect(base_url, client) for base_url, client in model_clients().items()))
+
+async def start_up():
+    """Warm-up, then the model API connections; pages and search pre-warm alongside. Sets `ready`."""
+    await asyncio.gather(asyncio.to_thread(warm_up), asyncio.to_thread(prewarm_connections))
+    if fetch_archive.mode != ARCHIVE_REPLAY:
+        await prewarm_model_clients()
+    ready.set()
+    logger.info("Ready")
+
+@asynccontextmanager
+async def lifespan(app):
+    startup_task = asyncio.create_task(start_up())
+    warmer_task = asyncio.create_task(cache_warmer.run_forever()) if warmer_enabled else None
+    purge_task = asyncio.create_task(shared_store.purge_forever(state_purge_interval)) if state_purge_interval else None
+    yield
+    for task in (warmer_task, purge_task):
+        if task is not None:
+            task.cancel()
+    await asyncio.gather(startup_task, return_exceptions=True)
+    # Graceful shutdown: in-flight requests have drained by now, let queued scrape work finish
+    scrape_executor.shutdown(wait=True)
+    fetch_executor.shutdown(wait=True)
+    parse_pool.shutdown()
+    shared_store.close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Lesson Planner Bot API",
     description="An AI-powered lesson planning assistant that scrapes educational content and creates comprehensive lesson plans",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+@app.middleware("http")
+async def request_context_middleware(request: Request, call_next):
+    """Give each request a RequestContext; honours an incoming X-Request-ID and echoes it back"""
+    ctx = RequestContext(request.headers.get("x-request-id", "")[:64] or None)
+    token = current_request.set(ctx)
+    try:
+        response = await call_next(request)
+    finally:
+        current_request.reset(token)
+    response.headers["X-Request-ID"] = ctx.request_id
+    return response
+
+# gzip or brotli, whichever the client prefers, for JSON bodies above the threshold
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESS_MIN_BYTES", "1024")))
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -31,32 +165,60 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Request-ID"],
 )
 
-def search_google_cse(query, api_key, cse_id, num_results=15):
-    """Search Google Custom Search with better error handling"""
-    url = f"https://www.googleapis.com/customsearch/v1"
+def cse_quota_key():
+    """Shared-store counter name for today's (UTC) Custom Search queries"""
+    return f"cse_queries:{time.strftime('%Y-%m-%d', time.gmtime())}"
+
+def search_google_cse(query, api_key, cse_id, num_results=CSE_MAX_NUM, start=1):
+    """SearchResults start..start+num_results-1 (at most 10) of a Custom Search query"""
+    url = cse_endpoint
     params = {
         "key": api_key,
         "cx": cse_id,
         "q": query,
-        "num": num_results
+        "num": min(num_results, CSE_MAX_NUM),
+        "start": start,
+        "fields": CSE_FIELDS,
     }
     
+    # Claim a query from the shared daily count first: the increment is atomic across workers, so its
+    # result decides, and a claim past the quota is handed back
+    quota_key = cse_quota_key()
+    used = shared_store.incr(quota_key, ttl=2 * 24 * 3600)
+    if cse_daily_quota and used > cse_daily_quota:
+        shared_store.incr(quota_key, -1)
+        logger.warning("Daily Custom Search quota used up, skipping search", extra={"quota": cse_daily_quota})
+        return []
+
     try:
-        response = requests.get(url, params=params, timeout=10)
+        CSE_QUERIES.inc()
+        count_usage("cse_queries")
+        with timed("cse_search"):
+            response = fetch_archive.get(url, params=params, timeout=10)
         response.raise_for_status()
-        results = response.json().get("items", [])
-        links = [item["link"] for item in results]
-        print(f"Found {len(links)} search results")
-        return links
+        CSE_RESPONSE_BYTES.inc(len(response.content))
+        results = [SearchResult.from_item(item) for item in response.json().get("items", []) if item.get("link")]
+        logger.debug("Found %d search results for %r from %d", len(results), query, start)
+        return results
     except requests.exceptions.RequestException as e:
-        print(f"Error in Google search: {e}")
+        logger.warning("Error in Google search: %s", e)
         return []
     except Exception as e:
-        print(f"Unexpected error in search: {e}")
+        logger.exception("Unexpected error in search")
         return []
 
+def next_start(start, num_results, results):
+    """Start index of the query's next result page, or None when this page was its last"""
+    following = start + min(num_results, CSE_MAX_NUM)
+    return following if len(results) >= min(num_results, CSE_MAX_NUM) and following <= CSE_MAX_START else None
+
+def cse_quota_left():
+    """Custom Search queries left today for all workers, or None without CSE_DAILY_QUOTA"""
+    return max(0, cse_daily_quota - shared_store.counter(cse_quota_key())) if cse_daily_quota else None
+
 def filter_links(links):
     """Filter out unwanted domains and invalid URLs"""
     blacklist = ["youtube", "udemy", "coursera", "pinterest", "linkedin", "facebook", "twitter", "instagram"]
@@ -82,82 +244,163 @@ def filter_links(links):
         except Exception:
             continue
             
-    print(f"Filtered to {len(filtered)} valid links")
+    logger.debug("Filtered to %d valid links", len(filtered))
     return filtered
 
 
-from newspaper import Article
-
 # Define data models
 class SourceInfo(BaseModel):
     url: str = Field(description="The URL of the source website.")
     content_fetched: bool = Field(description="Whether content was successfully fetched from this source.")
-    content: str = Field(description="The extracted content from the source, if available.")
+    content: str = Field(description="The extracted content from the source, if available. In the scraper agent's final output, a short excerpt (the server keeps the full text).")
 
 class ScrapeOutput(BaseModel):
     topic: str = Field(description="The topic that was scraped.")
     summary: str = Field(description="A summary of the scraped content.")
     sources: List[SourceInfo] = Field(description="A list of source information objects for each website scraped.")
 
-def extract_text_from_url(url, timeout=15):
-    """Extract text with better error handling and retry logic"""
+def extract_text_from_url(url, timeout=None):
+    """Extract text with a single download, per-host adaptive timeout and circuit breaking"""
+    # While recording or replaying the archive, every page must go through it
+    use_cache = fetch_archive.mode == ARCHIVE_OFF
+    ctx = current_request.get()
+    refresh = ctx is not None and ctx.refresh_pages
+    cache_key = f"page:{canonicalize_url(url)}"
+    cached = shared_store.get(cache_key) if use_cache and not refresh else None
+    if cached is not None:
+        CACHE_REQUESTS.inc(cache="page", result="hit")
+        count_usage("page_cache_hits")
+        logger.debug("Using cached content for %s: %d chars", url, len(cached))
+        return cached
+    CACHE_REQUESTS.inc(cache="page", result="miss")
+
+    with timed("extract", source=url):
+        text, failure = _download_and_extract(url, timeout)
+    # A page the quality filter rejected is cached empty, so it is not downloaded again only to be rejected
+    if use_cache and (text or failure in QUALITY_FAILURES):
+        shared_store.set(cache_key, text, ttl=page_cache_ttl)
+        # A page reached through a redirect is cached under its final URL as well
+        final_key = f"page:{canonicalize_url(redirect_map.resolve(url))}"
+        if final_key != cache_key:
+            shared_store.set(final_key, text, ttl=page_cache_ttl)
+    return text
+
+
+# Failures that depend on the page itself, not on the fetch
+QUALITY_FAILURES = frozenset({"too_short", "low_quality", "wrong_language"})
+
+
+def response_charset(response):
+    """The charset the response's Content-Type declares, or None to let the page's <meta> or detection decide.
+
+    requests assumes ISO-8859-1 for text/* responses without one; that default is not a declaration, and
+    taking it turns UTF-8 pages into mojibake."""
+    if "charset=" not in response.headers.get("content-type", "").lower():
+        return None
+    # A charset Python has no codec for (e.g. "charset=none") is no declaration either
+    return known_encoding(requests.utils.get_encoding_from_headers(response.headers))
+
+
+def _download_and_extract(url, timeout=None):
+    """(text, failure reason or None) for the page at url"""
+    host = host_of(url)
+    if not host_health.allow(host):
+        EXTRACTION_FAILURES.inc(reason="circuit_open")
+        logger.info("Circuit open for %s, skipping %s", host, url)
+        return "", "circuit_open"
+    if timeout is None:
+        timeout = host_health.timeout_for(host)
+
+    # Set user agent to avoid blocking
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+
+    # Download once; both extractors below parse the same response
     try:
-        # Set user agent to avoid blocking
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        # Create article with proper configuration
-        article = Article(url)
-        article.config.request_timeout = timeout
-        article.config.browser_user_agent = headers['User-Agent']
-        article.config.fetch_images = False
-        article.config.memoize_articles = False
-        
-        # Download and parse
-        article.download()
-        article.parse()
-        
-        # Additional validation
-        if len(article.text.strip()) < 100:
-            print(f"Content too short from {url}: {len(article.text)} chars")
-            return ""
-            
-        print(f"Successfully extracted {len(article.text)} characters from {url}")
-        return article.text.strip()
-        
-    except Exception as e:
-        print(f"Error extracting from {url}: {e}")
-        # Fallback: try basic requests + BeautifulSoup
-        try:
-            response = requests.get(url, headers=headers, timeout=timeout)
-            response.raise_for_status()
-            
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Get text content
-            text = soup.get_text()
-            
-            # Clean up text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
-            
-            if len(text.strip()) < 100:
-                print(f"Fallback content too short from {url}: {len(text)} chars")
-                return ""
-                
-            print(f"Fallback extraction successful: {len(text)} characters from {url}")
-            return text.strip()
-            
-        except Exception as fallback_error:
-            print(f"Fallback extraction also failed for {url}: {fallback_error}")
-            return ""
+        with fetch_scheduler.slot(host):
+            start = time.monotonic()
+            try:
+                response = fetch_archive.get(url, headers=headers, timeout=timeout)
+            except ArchiveMiss as e:
+                # Replay has no copy of this page: not the host's fault
+                host_health.release(host)
+                EXTRACTION_FAILURES.inc(reason="archive_miss")
+                logger.info("%s", e)
+                return "", "archive_miss"
+            except requests.exceptions.RequestException as e:
+                host_health.record_failure(host, time.monotonic() - start)
+                EXTRACTION_FAILURES.inc(reason="timeout" if isinstance(e, requests.exceptions.Timeout) else "connection_error")
+                logger.info("Error downloading %s (timeout %.1fs): %s", url, timeout, e)
+                return "", "fetch_error"
+            elapsed = time.monotonic() - start
+    except BaseException:
+        # Every allow() must end in a record_*, or a half-open host would wait on a trial that never reports
+        host_health.record_failure(host)
+        raise
+    # Throttling and server errors count against the host; other client errors are page-specific
+    if response.status_code == 429 or response.status_code >= 500:
+        host_health.record_failure(host, elapsed)
+    else:
+        host_health.record_success(host, elapsed)
+    if response.url and response.url != url:
+        redirect_map.record(url, response.url)
+    if not response.ok:
+        EXTRACTION_FAILURES.inc(reason=f"http_{response.status_code}")
+        logger.info("Error downloading %s: HTTP %d", url, response.status_code)
+        return "", f"http_{response.status_code}"
+
+    # Parsing is CPU-bound: with PARSE_WORKERS it runs in the parse pool's processes
+    try:
+        text, failure, quality = parse_pool.parse(url, response.content, response_charset(response))
+    except Exception:
+        # One unparseable page must not take the rest of the round down with it
+        EXTRACTION_FAILURES.inc(reason="parse_error")
+        logger.warning("Error parsing %s", url, exc_info=True)
+        return "", "parse_error"
+    if quality is not None:
+        PAGE_CHARS.inc(quality["input_chars"], kind="input")
+        PAGE_CHARS.inc(len(text), kind="kept")
+        for label, chars in quality["discarded_chars"].items():
+            CHARS_DISCARDED.inc(chars, label=label)
+        count_usage("page_chars", quality["input_chars"])
+        count_usage("page_chars_discarded", quality["input_chars"] - len(text))
+        logger.debug("Quality filter on %s", url, extra={"quality": quality})
+    if failure is not None:
+        EXTRACTION_FAILURES.inc(reason=failure)
+        logger.debug("No usable content from %s: %s", url, failure)
+        return "", failure
+    logger.debug("Extracted %d characters from %s", len(text), url)
+    return text, None
+
+
+# Threads for page fetches, shared by every request. fetch_scheduler lets FETCH_MAX_IN_FLIGHT of them hold
+# a connection at once; the others wait their turn in its fair queue (or for a host's token), so a few times
+# as many keep every slot busy without a thread per link of every round.
+fetch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FETCH_WORKERS", str(4 * fetch_scheduler.max_in_flight))), thread_name_prefix="fetch"
+)
+
+
+def page_text(future):
+    """A finished fetch's text; a fetch that raised (e.g. the shared state store was locked) counts as empty"""
+    try:
+        return future.result()
+    except Exception:
+        logger.warning("Page fetch failed", exc_info=True)
+        return ""
+
+
+def fetch_pages(links, timeout=None):
+    """Extracted text of each link, fetched in parallel; None for fetches still running after `timeout`
+    seconds (they finish in the background and still fill the page cache)"""
+    if not links:
+        return []
+    # Politeness is enforced per host by fetch_scheduler, so different hosts are fetched concurrently.
+    # Copy the context here, in the submitting thread, so request id and timings follow each fetch
+    futures = [fetch_executor.submit(contextvars.copy_context().run, extract_text_from_url, link) for link in links]
+    done, _ = wait(futures, timeout=timeout)
+    return [page_text(future) if future in done else None for future in futures]
 
 
 def scrape_topic_content(queries, api_key, cse_id, min_content_length=200, max_sources=5, max_content_per_source=2000, min_successful_sources=2, min_total_content=1000, max_rounds=3):
@@ -165,67 +408,122 @@ def scrape_topic_content(queries, api_key, cse_id, min_content_length=200, max_s
     if isinstance(queries, str):
         queries = [queries]
     all_links = []
+    seen_links = {}  # canonical URL -> link to fetch
     all_sources = []
     successful_extractions = 0
     total_content_length = 0
     round_num = 0
     used_queries = set()
-    while round_num < max_rounds:
-        print(f"🔍 [Round {round_num+1}] Searching content for queries: {queries}")
-        round_links = []
-        for query in queries:
-            if query in used_queries:
-                continue
-            search_queries = [query]
-            for q in search_queries:
-                links = search_google_cse(q, api_key, cse_id, num_results=5)
-                round_links.extend(links)
+    fetched_links = set()
+    round_successes = []
+    satisfied = False
+    results_by_link = {}  # link as fetched -> SearchResult, for snippets standing in for pages
+    snippet_sources = 0
+    ctx = current_request.get()
+    snippet_only = ctx.snippet_only if ctx is not None else snippet_only_default
+    # How many results, links and rounds this kind of query needed before
+    plan = depth_planner.plan(queries, max_rounds, min_successful_sources, min_total_content, max_sources)
+    logger.info("Search depth", extra={"plan": plan.as_log()})
+    # A topic that usually falls short in round 1 gets its broadened queries in round 1 as well
+    search_queries = queries + broaden(queries) if plan.broaden else queries
+    round_searches = [(query, 1) for query in dict.fromkeys(search_queries)]
+    next_starts = {}  # query -> start index of its next result page
+    followups = []  # (strategy, queries sent, new links, sources gained) of the rounds after the first
+    # Snippet-only scrapes are a single round: their point is to skip the waiting
+    rounds_allowed = 1 if snippet_only else plan.max_rounds
+    while round_num < rounds_allowed:
+        logger.info("Searching content", extra={"round": round_num + 1, "searches": round_searches})
+        round_results = []
+        for query, start in round_searches:
+            results = search_google_cse(query, api_key, cse_id, num_results=plan.num_results, start=start)
+            round_results.extend(results)
             used_queries.add(query)
-        # Remove duplicates while preserving order
-        unique_links = list(dict.fromkeys(all_links + round_links))
+            next_starts[query] = next_start(start, plan.num_results, results)
+        # Drop other spellings of, and known redirects to, pages already listed (order preserved)
+        new_links, dropped = dedupe_links([result.link for result in round_results], seen_links, redirect_map)
+        # seen_links maps each result to the link actually fetched for it, redirect targets included
+        for result in round_results:
+            results_by_link.setdefault(seen_links[canonicalize_url(result.link)], result)
+        for reason, count in dropped.items():
+            if count:
+                LINKS_DEDUPED.inc(count, reason=reason)
+        unique_links = all_links + new_links
         filtered_links = filter_links(unique_links)
-        print(f"Processing {len(filtered_links)} unique links...")
         sources = []
         round_successful = 0
         round_content_length = 0
-        for i, link in enumerate(filtered_links[:max_sources]):
-            print(f"Processing {i+1}/{min(len(filtered_links), max_sources)}: {link}")
-            content = extract_text_from_url(link)
-            if len(content) > max_content_per_source:
-                content = content[:max_content_per_source] + "... [content truncated]"
-                print(f"Content truncated to {max_content_per_source} characters")
-            content_fetched = len(content) >= min_content_length
-            source_info = SourceInfo(
-                url=link,
-                content_fetched=content_fetched,
-                content=content if content_fetched else ""
-            )
-            sources.append(source_info)
+        # Later rounds fetch the links not tried yet, rather than the first ones again
+        to_fetch = [link for link in filtered_links if link not in fetched_links][:plan.fetch]
+        fetched_links.update(to_fetch)
+        if snippet_only:
+            contents = [None] * len(to_fetch)
+        else:
+            logger.debug("Fetching %d of %d unique links in parallel", len(to_fetch), len(filtered_links))
+            contents = fetch_pages(to_fetch, fetch_round_timeout)
+        records = []
+        for link, content in zip(to_fetch, contents):
+            content_fetched = content is not None and len(content) >= min_content_length
+            excerpt = ""
+            if content_fetched:
+                # The full text goes to the content store once; the request keeps a SourceRecord
+                record = content_store.record(link, content)
+                records.append(record)
+                excerpt = record.excerpt(max_content_per_source)
+            else:
+                # The search result's title, description and snippet stand in for the page
+                result = results_by_link.get(link)
+                fallback = result.text() if result is not None else ""
+                if fallback:
+                    reason = "snippet_only" if snippet_only else "slow" if content is None else "failed"
+                    SNIPPET_FALLBACKS.inc(reason=reason)
+                    records.append(content_store.record(link, fallback))
+                    excerpt = f"Search snippet ({reason}): {fallback[:max_content_per_source]}"
+                    snippet_sources += 1
+            sources.append(SourceInfo(url=link, content_fetched=content_fetched, content=excerpt))
             if content_fetched:
                 round_successful += 1
-                round_content_length += len(content)
-            time.sleep(0.5)
+                round_content_length += len(excerpt)
+        if ctx is not None:
+            ctx.add_sources(records)
         all_links = unique_links
         all_sources.extend(sources)
         successful_extractions += round_successful
         total_content_length += round_content_length
-        print(f"✅ [Round {round_num+1}] Extracted from {round_successful}/{len(sources)} sources, {round_content_length} chars")
+        logger.info("Round finished", extra={"round": round_num + 1, "successful_sources": round_successful, "sources": len(sources), "chars": round_content_length})
+        round_successes.append(round_successful)
+        if round_num > 0 and round_searches:
+            followups.append((strategy, len(round_searches), len(new_links), round_successful))
         # Check if we have enough good content
-        if successful_extractions >= min_successful_sources and total_content_length >= min_total_content:
+        satisfied = successful_extractions >= min_successful_sources and total_content_length >= min_total_content
+        if satisfied:
             break
-        # Otherwise, ask the agent to generate new queries (broader/narrower/reworded)
         round_num += 1
-        if round_num < max_rounds:
-            print(f"⚠️ Not enough content, should try new queries in next round.")
-            # Instruct the agent to generate new queries in the next round (handled by agent instructions)
-            # For now, just try some generic fallbacks if agent doesn't provide new queries
-            queries = [q + " educational resources" for q in queries]
-    print(f"📊 Total successful sources: {successful_extractions}, total content: {total_content_length} characters")
+        if round_num < rounds_allowed:
+            # Otherwise search again: the next result page of the same queries, or reworded ones
+            pageable = [(query, next_starts[query]) for query in search_queries if next_starts.get(query)]
+            # Reworded queries are the original queries broadened once; those already sent are not repeated
+            requeries = [query for query in broaden(queries) if query not in used_queries]
+            strategy, limit = depth_planner.followup(plan, bool(pageable), cse_quota_left(), cse_daily_quota)
+            if strategy == PAGE or not requeries:
+                strategy, round_searches = PAGE, pageable
+            else:
+                search_queries = list(dict.fromkeys(search_queries + requeries))
+                round_searches = [(query, 1) for query in requeries]
+            round_searches = round_searches[:limit]
+            logger.info("Not enough content, searching again", extra={"strategy": strategy, "searches": len(round_searches)})
+    if not snippet_only:
+        depth_planner.record(plan, len(fetched_links), round_successes, total_content_length, satisfied, followups)
+    SEARCH_ROUNDS.inc(len(round_successes), plan=plan.source)
+    SCRAPES.inc(plan=plan.source, outcome="snippet_only" if snippet_only else "enough" if satisfied else "short")
+    count_usage("search_rounds", len(round_successes))
+    count_usage("snippet_sources", snippet_sources)
+    logger.info("Scraping finished", extra={"successful_sources": successful_extractions, "chars": total_content_length,
+                                            "snippet_sources": snippet_sources})
     if successful_extractions > 0:
         max_total_content = 8000
         all_content_parts = [s.content for s in all_sources if s.content_fetched]
         if total_content_length > max_total_content:
-            print(f"⚠️ Total content too long ({total_content_length} chars), truncating to {max_total_content}")
+            logger.debug("Total content too long (%d chars), truncating to %d", total_content_length, max_total_content)
             truncated_content = ""
             for content_part in all_content_parts:
                 if len(truncated_content) + len(content_part) < max_total_content:
@@ -236,6 +534,8 @@ def scrape_topic_content(queries, api_key, cse_id, min_content_length=200, max_s
         else:
             all_content = "\n\n".join(all_content_parts)
         summary = f"Successfully gathered content from {successful_extractions} sources. Total content length: {len(all_content)} characters."
+    elif snippet_sources > 0:
+        summary = f"No page content fetched; the search snippets of {snippet_sources} sources are included with them."
     else:
         all_content = ""
         summary = "Could not extract sufficient content from the available sources. This might be due to website restrictions or content format issues."
@@ -246,7 +546,32 @@ def scrape_topic_content(queries, api_key, cse_id, min_content_length=200, max_s
     )
 
 
-from agents import Agent, Runner, trace, function_tool, handoff
+def summarize_sources(records, query):
+    """Extractive summary of the scraped pages for the lesson planner's prompt.
+
+    Built once per request over the pages of every scrape tool call, so a second call adds to the summary
+    instead of replacing it."""
+    # Rank the sentences of every page fetched, not just the excerpts, into one summary within the token budget
+    with timed("summarize"):
+        summary, stats = summarize([record.text for record in records], query=query)
+    count_usage("summary_tokens", stats["tokens"])
+    logger.info("Summarized sources", extra={"summary": stats})
+    return summary
+
+
+# Scraping (search, downloads, parsing) is blocking, so it runs on this sized pool instead of the event loop.
+# Requests beyond SCRAPE_WORKERS queue here rather than stalling /health and every other request on the worker.
+scrape_executor = ThreadPoolExecutor(max_workers=int(os.getenv("SCRAPE_WORKERS", "8")), thread_name_prefix="scrape")
+
+async def scrape_topic_content_async(queries, api_key, cse_id, **kwargs):
+    """Run scrape_topic_content on scrape_executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        scrape_executor,
+        functools.partial(ctx.run, scrape_topic_content, queries, api_key, cse_id, **kwargs)
+    )
+
 
 class LessonTopic(BaseModel):
     title: str = Field(description="Sub-topic title")
@@ -264,9 +589,7 @@ class LessonPlan(BaseModel):
     assessment: List[str]
     urls: List[str]
 
-lesson_planner_agent = Agent(
-    name="Lesson Planner",
-    instructions="""
+lesson_planner_instructions = """
 You are an expert education assistant. You will be given a topic summary and multiple pieces of scraped content from different websites.
 
 Your job is to create a complete lesson plan using that content. Follow this exact structure:
@@ -289,10 +612,7 @@ CRITICAL: You MUST include ALL the source URLs that are provided to you in the u
 Use only the given summary and source content to generate your answer. Keep output clean and structured.
 
 Ensure your output strictly matches the expected fields.
-""",
-    model="gpt-4o-mini",
-    output_type=LessonPlan,
-)
+"""
 
 # Step 1: Update the scraper agent's instructions for dynamic search depth
 instructions_for_scrapper = """
@@ -314,25 +634,54 @@ You are an expert at finding educational content for lesson planning.
    - sources: a list of websites searched, indicating whether content was fetched or not. For each source, include:
        - url
        - content_fetched (true/false)
-       - content (actual extracted text, or a short explanation why not)
+       - content (a one or two sentence excerpt of the extracted text, or a short explanation why not; the full text is kept by the server)
 """
 
 # Step 2: Update the scraping logic to allow for multiple rounds
 
-# Update the scrape_tool to accept a list of queries
-@function_tool
-def scrape_tool(queries: list[str]) -> ScrapeOutput:
+class ToolTime:
+    """Wall-clock seconds during which at least one of a run's tool calls was running.
+
+    The model may call tools in parallel; their overlapping time is counted once, so it never exceeds the
+    run's own duration. Only touched from the event loop, so it needs no lock."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._running = 0
+        self._since = 0.0
+
+    def enter(self):
+        if self._running == 0:
+            self._since = time.perf_counter()
+        self._running += 1
+
+    def exit(self):
+        self._running -= 1
+        if self._running == 0:
+            self.seconds += time.perf_counter() - self._since
+
+    def total(self):
+        """Seconds so far, including calls still running"""
+        if self._running:
+            return self.seconds + time.perf_counter() - self._since
+        return self.seconds
+
+
+# The ToolTime of the current agent run (set by run_routed), so the model router is told the model's
+# latency rather than the scrape's
+tool_time = contextvars.ContextVar("tool_time", default=None)
+
+# The scrape tool accepts a list of queries; build_agents wraps it with function_tool
+async def scrape_tool(queries: list[str]) -> ScrapeOutput:
     """Enhanced scraping tool that returns structured output for a list of queries"""
-    return scrape_topic_content(queries, google_search_api_key, cse_id)
-
-# Update scraper_agent to use new instructions (already done above)
-scraper_agent = Agent(
-    name="Content Fetcher",
-    instructions=instructions_for_scrapper,
-    tools=[scrape_tool],
-    handoffs=[lesson_planner_agent],
-    output_type=ScrapeOutput,  # This enables validation + parsing
-)
+    spent = tool_time.get()
+    if spent is not None:
+        spent.enter()
+    try:
+        return await scrape_topic_content_async(queries, google_search_api_key, cse_id)
+    finally:
+        if spent is not None:
+            spent.exit()
 
 # 1. Define the Validation Agent
 validation_agent_instructions = """
@@ -347,27 +696,261 @@ Your job is to determine if a user query is a valid educational topic or questio
 Only allow queries that are suitable for generating lesson plans for students or teachers.
 """
 
-validation_agent = Agent(
-    name="Validation Agent",
-    instructions=validation_agent_instructions,
-    model="gpt-4o-mini",
-    output_type=str,
-)
+
+# Sections of a LessonPlan that can be regenerated on their own; topic, grade level and urls stay fixed
+REGENERABLE_SECTIONS = ("duration_minutes", "learning_objectives", "materials_needed", "lesson_overview", "exercises", "assessment")
+
+section_editor_instructions = """
+You are an expert education assistant revising part of an existing lesson plan.
+
+You will be given the lesson plan, the names of the sections to rewrite, their current versions,
+optional notes from the teacher and short excerpts from the plan's sources.
+
+Write new versions of ONLY the requested sections. They must be clearly different from the current
+versions, follow the teacher's notes if any, fit the grade level and stay consistent with the rest
+of the plan. Use the same format as the original: exercises and assessment have 2–4 items,
+learning_objectives 3–5 items, lesson_overview items have title, duration_minutes and description.
+"""
+
+# The agents SDK takes seconds to import, so it is loaded on first use (or by the warm-up in lifespan)
+# and /health answers meanwhile. Module attributes below resolve through __getattr__ until then.
+AGENT_NAMES = ("Agent", "Runner", "trace", "function_tool", "handoff", "UsageHooks",
+               "lesson_planner_agent", "scraper_agent", "validation_agent", "section_editor_agent")
+_agents_lock = threading.Lock()
+
+def build_agents():
+    """Import the agents SDK and define the agents, once per process. Names already set on the module
+    (e.g. a stub Runner installed by a test) are kept."""
+    with _agents_lock:
+        if "section_editor_agent" in globals():
+            return
+        from agents import Agent, Runner, RunHooks, Usage, trace, function_tool, handoff, set_default_openai_client
+
+        class UsageHooks(RunHooks):
+            """Token usage of a run's model responses as they arrive, so a run cancelled midway (a losing
+            hedge) still reports what it used"""
+
+            def __init__(self):
+                self.usage = Usage()
+
+            async def on_llm_end(self, context, agent, response):
+                self.usage.add(response.usage)
+
+        # Our own default client, so its connection pool can be pre-warmed (prewarm_model_clients)
+        global openai_client
+        if os.getenv("OPENAI_API_KEY") and openai_client is None:
+            from openai import AsyncOpenAI
+            openai_client = AsyncOpenAI()
+            set_default_openai_client(openai_client)
+
+        lesson_planner_agent = Agent(
+            name="Lesson Planner",
+            instructions=lesson_planner_instructions,
+            model="gpt-4o-mini",
+            output_type=LessonPlan,
+        )
+        scraper_agent = Agent(
+            name="Content Fetcher",
+            instructions=instructions_for_scrapper,
+            tools=[function_tool(scrape_tool)],
+            handoffs=[lesson_planner_agent],
+            output_type=ScrapeOutput,  # This enables validation + parsing
+        )
+        validation_agent = Agent(
+            name="Validation Agent",
+            instructions=validation_agent_instructions,
+            model="gpt-4o-mini",
+            output_type=str,
+        )
+        section_editor_agent = Agent(
+            name="Section Editor",
+            instructions=section_editor_instructions,
+            model="gpt-4o-mini",
+            output_type=LessonPlan,  # replaced per call by a model holding only the requested sections
+        )
+        built = locals()
+        for name in AGENT_NAMES:
+            globals().setdefault(name, built[name])
+
+async def ensure_agents():
+    """build_agents off the event loop, unless already done"""
+    if "section_editor_agent" not in globals():
+        await asyncio.to_thread(build_agents)
+
+def __getattr__(name):
+    # Lazy module attributes: main.Runner, main.validation_agent, ... (PEP 562)
+    if name in AGENT_NAMES:
+        build_agents()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@functools.lru_cache(maxsize=64)
+def sections_model(sections):
+    """Output type holding just the given LessonPlan sections (a sorted tuple of field names)"""
+    return create_model(
+        "LessonPlanSections",
+        **{name: (LessonPlan.model_fields[name].annotation, ...) for name in sections}
+    )
+
+def build_regeneration_prompt(record, sections, notes=None):
+    """A short prompt for rewriting some sections of a stored plan: the plan, the sections and a few source excerpts"""
+    plan = record["plan"]
+    kept = {name: value for name, value in plan.items() if name not in sections}
+    prompt = f"""Rewrite these sections of the lesson plan: {', '.join(sections)}
+
+Lesson plan (sections that stay as they are):
+{json.dumps(kept, ensure_ascii=False)}
+
+Current versions of the sections to rewrite:
+{json.dumps({name: plan.get(name) for name in sections}, ensure_ascii=False)}
+"""
+    if notes:
+        prompt += f"\nTeacher's notes: {notes}\n"
+    if record.get("summary"):
+        prompt += f"\nTopic summary: {record['summary']}\n"
+    for i, source in enumerate(record.get("sources", [])[:2]):
+        prompt += f"\nSource {i+1}: {source['content'][:600]}\n"
+    return prompt
 
 # with trace("scrape_tool"):
 #     content = Runner.run_sync(scraper_agent, "Simple Machines for grade 6 science")
 #     print(content)
 
+def record_llm_usage(agent, run_result):
+    """Add the token usage reported for a Runner.run call to the LLM token counters"""
+    usage = getattr(getattr(run_result, "context_wrapper", None), "usage", None)
+    if usage is not None:
+        record_tokens(agent, usage)
+
+def record_tokens(agent, usage):
+    LLM_TOKENS.inc(usage.input_tokens, agent=agent.name, kind="input")
+    LLM_TOKENS.inc(usage.output_tokens, agent=agent.name, kind="output")
+    count_usage("llm_tokens", usage.input_tokens + usage.output_tokens)
+
+async def run_on_tier(agent, input, tier, timeout, hedge):
+    """Runner.run on one tier within `timeout` seconds. With `hedge`, a duplicate call is fired if the
+    first has not returned by this agent's p90 on the tier (and the hedge budget allows); the first success wins
+    and the other call is cancelled. The tokens of every call but the winner's (which run_agent records from
+    its result) are recorded here, as they are billed all the same."""
+    tier_agent = agent.clone(model=model_router.model_for(tier))
+    model_router.hedge_budget.on_call()
+    hooks = []
+    tasks = []
+
+    def start():
+        hooks.append(UsageHooks())
+        tasks.append(asyncio.create_task(Runner.run(tier_agent, input, hooks=hooks[-1])))
+
+    start()
+    winner = None
+    try:
+        async with asyncio.timeout(timeout):
+            hedge_after = model_router.hedge_delay(tier, agent.name) if hedge else None
+            if hedge_after is not None and (timeout is None or hedge_after < timeout):
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done and model_router.hedge_budget.try_acquire():
+                    logger.info("Hedging %s on tier %s after %.1fs", agent.name, tier.name, hedge_after)
+                    start()
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1:
+                            LLM_HEDGES.inc(agent=agent.name, tier=tier.name,
+                                           winner="primary" if task is tasks[0] else "hedge")
+                        winner = task
+                        return task.result()
+            # Every call failed: surface the first call's error
+            return tasks[0].result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Let the losing (or timed out) calls unwind, and retrieve their exceptions so none goes unreported
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for task, task_hooks in zip(tasks, hooks):
+            if task is not winner:
+                record_tokens(agent, task_hooks.usage)
+
+async def run_routed(agent, input, hedge=False, fallback=True):
+    """Runner.run on the model tier chosen by model_router, falling back to the next tier on timeout or error.
+    The whole call, fallbacks included, is bounded by LLM_CALL_DEADLINE.
+
+    Without `fallback` (agents whose tools have side effects, such as the scraper's searches), the run
+    stays on the first tier, bounded by the deadline alone (its tool calls take longer than a tier's
+    timeout allows for): retrying it would repeat the tool calls. Either way the router is given the
+    run's latency minus the time spent in tools."""
+    prompt_chars = len(input) if isinstance(input, str) else len(str(input))
+    deadline = time.perf_counter() + llm_call_deadline
+    last_error = None
+    candidates = model_router.candidates(prompt_chars)
+    for tier in candidates if fallback else candidates[:1]:
+        start = time.perf_counter()
+        remaining = deadline - start
+        if remaining <= 0:
+            break
+        spent = ToolTime()
+        token = tool_time.set(spent)  # the run's tasks copy the context, and share this ToolTime
+        try:
+            run_result = await run_on_tier(agent, input, tier, min(tier.timeout, remaining) if fallback else remaining, hedge)
+        except Exception as e:
+            model_router.record(tier, max(0.0, time.perf_counter() - start - spent.total()), ok=False)
+            outcome = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+            LLM_CALLS.inc(agent=agent.name, tier=tier.name, outcome=outcome)
+            logger.warning("Model tier %s failed for %s (%s), trying next tier", tier.name, agent.name, outcome,
+                           extra={"error": repr(e)})
+            last_error = e
+            continue
+        finally:
+            tool_time.reset(token)
+        model_router.record(tier, max(0.0, time.perf_counter() - start - spent.total()), ok=True, agent=agent.name)
+        LLM_CALLS.inc(agent=agent.name, tier=tier.name, outcome="ok")
+        return run_result
+    raise last_error or TimeoutError(f"{agent.name} exceeded its {llm_call_deadline:.0f}s deadline")
+
+async def run_agent(agent, input, stage, cacheable=False, bypass_cache=False, hedge=False, fallback=True):
+    """Runner.run with stage timing and token accounting; cacheable agents go through the disk cache.
+    bypass_cache skips the lookup but still stores the fresh result. Only hedge, or fall back to
+    another tier for, agents whose calls are side-effect free: a repeated scraper run would repeat its searches."""
+    with timed(stage):
+        if cacheable and not bypass_cache and agent_cache.enabled:
+            cached = await asyncio.to_thread(agent_cache.get, agent, input)
+            CACHE_REQUESTS.inc(cache="agent", result="hit" if cached is not None else "miss")
+            if cached is not None:
+                count_usage("agent_cache_hits")
+                logger.debug("Agent cache hit for %s", agent.name)
+                return cached
+        run_result = await run_routed(agent, input, hedge=hedge, fallback=fallback)
+    record_llm_usage(agent, run_result)
+    if cacheable:
+        output = getattr(run_result, "final_output", None)
+        if isinstance(output, (str, BaseModel)):
+            await asyncio.to_thread(agent_cache.put, agent, input, output)
+    return run_result
+
 # FastAPI Request/Response Models
 class LessonPlanRequest(BaseModel):
     topic: str = Field(description="The educational topic to create a lesson plan for")
     grade_level: Optional[str] = Field(default=None, description="Optional grade level specification")
+    bypass_cache: bool = Field(default=False, description="Skip cached agent results and regenerate (the fresh results are cached)")
+    snippet_only: bool = Field(default=False, description="Build the plan from search result snippets without fetching pages: faster, less detailed, not cached")
+
+class RequestTimings(BaseModel):
+    total_ms: float = Field(description="Server-side time spent on the request")
+    stages: Dict[str, float] = Field(default_factory=dict, description="Milliseconds per pipeline stage, summed over repeated calls")
+    sources: Dict[str, float] = Field(default_factory=dict, description="Milliseconds spent extracting each source URL")
 
 class LessonPlanResponse(BaseModel):
     success: bool
     lesson_plan: Optional[LessonPlan] = None
     error: Optional[str] = None
     message: str
+    plan_id: Optional[str] = Field(default=None, description="Id for fetching the plan later or regenerating some of its sections")
+    timings: Optional[RequestTimings] = None
+
+class RegenerateSectionsRequest(BaseModel):
+    sections: List[str] = Field(description=f"LessonPlan sections to rewrite, any of: {', '.join(REGENERABLE_SECTIONS)}")
+    notes: Optional[str] = Field(default=None, description="Optional guidance for the rewrite, e.g. 'more hands-on exercises'")
 
 # FastAPI Endpoints
 @app.get("/")
@@ -378,14 +961,59 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "POST /create-lesson-plan": "Create a lesson plan for a given topic",
-            "GET /health": "Health check endpoint"
+            "GET /health": "Health check endpoint",
+            "GET /ready": "Readiness: 200 once the warm-up and connection pre-warming are done, 503 before",
+            "GET /lesson-plans/{plan_id}": "Fetch a previously created lesson plan",
+            "POST /lesson-plans/{plan_id}/regenerate": "Rewrite some sections of a lesson plan, reusing its stored sources",
+            "GET /admin/hosts": "Per-host circuit breaker state and fetch latency histograms",
+            "GET /admin/agent-cache": "Agent result cache size per agent",
+            "GET /admin/models": "Model tiers with recent latency and error stats",
+            "GET /admin/warmer": "Off-peak cache warmer budgets and the popular topics due for warming",
+            "GET /metrics": "Prometheus metrics: per-stage latency histograms, cache, extraction, quota and token counters"
         }
     }
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "message": "Lesson Planner Bot is running"}
+    return {"status": "healthy", "message": "Lesson Planner Bot is running", "warmed_up": warmed_up.is_set()}
+
+@app.get("/ready")
+async def readiness():
+    """200 once the agents are built and connections pre-warmed, 503 until then; with per-host pre-warm results"""
+    body = {"ready": ready.is_set(), "warmed_up": warmed_up.is_set(), **prewarmer.snapshot()}
+    return FastJSONResponse(body, status_code=200 if ready.is_set() else 503)
+
+@app.get("/admin/agent-cache")
+async def admin_agent_cache():
+    """Entries and bytes held in the agent result cache, per agent"""
+    return {"enabled": agent_cache.enabled, "max_bytes": agent_cache.max_bytes, "agents": await asyncio.to_thread(agent_cache.stats)}
+
+@app.get("/admin/models")
+async def admin_models():
+    """Configured model tiers with their recent latency and error stats"""
+    return model_router.snapshot()
+
+@app.get("/admin/warmer")
+async def admin_warmer():
+    """Cache warmer schedule, budget use and the popular topics due for warming"""
+    return {"enabled": warmer_enabled, **await asyncio.to_thread(cache_warmer.snapshot)}
+
+@app.get("/admin/hosts")
+async def admin_hosts():
+    """Circuit breaker state and latency histogram for every host fetched so far"""
+    return {"hosts": host_health.snapshot(), "scheduler": fetch_scheduler.snapshot()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of this worker's metrics"""
+    CSE_QUOTA_USED.set(shared_store.counter(cse_quota_key()))
+    store_stats = content_store.stats()
+    CONTENT_STORE.set(store_stats["entries"], kind="entries")
+    CONTENT_STORE.set(store_stats["compressed_bytes"], kind="compressed_bytes")
+    CONTENT_STORE.set(store_stats["text_chars"], kind="text_chars")
+    CONTENT_STORE.set(store_stats["dedupe_hits"], kind="dedupe_hits")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/create-lesson-plan", response_model=LessonPlanResponse)
 async def create_lesson_plan(request: LessonPlanRequest):
@@ -397,26 +1025,143 @@ async def create_lesson_plan(request: LessonPlanRequest):
     3. Generate a structured lesson plan
     4. Return the complete lesson plan with all components
     """
+    ctx = ensure_request_context()
+    # Tag this request's page fetches so the scheduler can share slots fairly between requests
+    fetch_requester.set(ctx.request_id)
+    ctx.snippet_only = request.snippet_only or snippet_only_default
+    response = None if request.bypass_cache else await lesson_plan_from_cache(request)
+    cache = CACHE_HIT
+    if response is None:
+        response = await run_lesson_plan_pipeline(request)
+        cache = CACHE_PARTIAL if ctx.usage.get("agent_cache_hits") or ctx.usage.get("page_cache_hits") else CACHE_MISS
+    response.timings = RequestTimings(**ctx.timings())
+    await asyncio.to_thread(request_log.append, request.topic, request.grade_level,
+                            response.timings.total_ms, cache, response.success)
+    logger.info("Lesson plan request finished", extra={
+        "success": response.success, "cache": cache, "total_ms": response.timings.total_ms, "stages": response.timings.stages
+    })
+    return plan_json_response(response)
+
+def plan_json_response(response: LessonPlanResponse, if_none_match=None):
+    """Render a lesson-plan response with an ETag over its plan id and plan; 304 when the client's If-None-Match
+    already has it. The id is part of the body, so only GET /lesson-plans/{id} passes if_none_match: a POST
+    always creates a new id."""
+    payload = response.model_dump(mode="json")
+    if payload["lesson_plan"] is None:
+        return Response(orjson.dumps(payload), media_type="application/json")
+    etag = weak_etag(response.plan_id or "", orjson.dumps(payload["lesson_plan"]))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(orjson.dumps(payload), media_type="application/json", headers=headers)
+
+async def lesson_plan_from_cache(request: LessonPlanRequest) -> Optional[LessonPlanResponse]:
+    """A copy of the cached plan for this topic and grade as a new stored plan, or None"""
+    cached = await asyncio.to_thread(plan_store.cached_plan, request.topic, request.grade_level)
+    CACHE_REQUESTS.inc(cache="plan", result="hit" if cached is not None else "miss")
+    if cached is None:
+        return None
+    plan_id = await asyncio.to_thread(
+        plan_store.save, cached["plan"], request.topic, request.grade_level, cached["summary"],
+        [(source["url"], source["content"]) for source in cached["sources"]]
+    )
+    return LessonPlanResponse(
+        success=True,
+        lesson_plan=LessonPlan(**cached["plan"]),
+        plan_id=plan_id,
+        message=f"Successfully created lesson plan for '{request.topic}'"
+    )
+
+async def warm_lesson_plan(topic, grade_level):
+    """Regenerate a popular plan for the cache warmer, fetching its pages afresh; returns (success, usage)"""
+    ctx = RequestContext(refresh_pages=True)
+    current_request.set(ctx)
+    fetch_requester.set("cache-warmer")
+    response = await run_lesson_plan_pipeline(LessonPlanRequest(topic=topic, grade_level=grade_level, bypass_cache=True))
+    await asyncio.to_thread(request_log.append, topic, grade_level, ctx.timings()["total_ms"], CACHE_MISS,
+                            response.success, origin="warmer")
+    return response.success, dict(ctx.usage)
+
+cache_warmer.warm_plan = warm_lesson_plan
+
+@app.get("/lesson-plans/{plan_id}", response_model=LessonPlanResponse)
+async def get_lesson_plan(plan_id: str, request: Request):
+    """A lesson plan created earlier, by the plan_id returned with it; revalidate with If-None-Match for a 304"""
+    record = await asyncio.to_thread(plan_store.load, plan_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired lesson plan '{plan_id}'")
+    return plan_json_response(LessonPlanResponse(
+        success=True,
+        lesson_plan=LessonPlan(**record["plan"]),
+        plan_id=plan_id,
+        message=f"Lesson plan for '{record['topic']}'"
+    ), request.headers.get("if-none-match"))
+
+@app.post("/lesson-plans/{plan_id}/regenerate", response_model=LessonPlanResponse)
+async def regenerate_sections(plan_id: str, request: RegenerateSectionsRequest):
+    """
+    Rewrite some sections of an existing lesson plan and merge them into the stored plan.
+    Validation, search and scraping are skipped: the prompt carries the rest of the plan and
+    excerpts of the sources stored with it.
+    """
+    unknown = [name for name in request.sections if name not in REGENERABLE_SECTIONS]
+    if not request.sections or unknown:
+        raise HTTPException(status_code=400, detail=f"Sections must be some of {', '.join(REGENERABLE_SECTIONS)}; got {', '.join(unknown) or 'none'}")
+    record = await asyncio.to_thread(plan_store.load, plan_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired lesson plan '{plan_id}'")
+
+    ctx = ensure_request_context()
+    sections = tuple(sorted(set(request.sections)))
+    try:
+        await ensure_agents()
+        agent = section_editor_agent.clone(output_type=sections_model(sections))
+        run_result = await run_agent(agent, build_regeneration_prompt(record, sections, request.notes), "regenerate", hedge=True)
+        # Merged into the plan as stored now, not as loaded above: another regeneration may have finished since
+        updated = await asyncio.to_thread(plan_store.update_plan, plan_id, run_result.final_output.model_dump())
+        if updated is None:
+            raise LookupError(f"Lesson plan '{plan_id}' expired while its sections were regenerated")
+        lesson_plan = LessonPlan(**updated["plan"])
+        response = LessonPlanResponse(
+            success=True,
+            lesson_plan=lesson_plan,
+            plan_id=plan_id,
+            message=f"Regenerated {', '.join(sections)} for '{record['topic']}'"
+        )
+    except Exception as e:
+        logger.exception("Error regenerating lesson plan sections")
+        response = LessonPlanResponse(
+            success=False,
+            error=str(e),
+            plan_id=plan_id,
+            message=f"Failed to regenerate {', '.join(sections)} for '{record['topic']}'"
+        )
+    response.timings = RequestTimings(**ctx.timings())
+    logger.info("Section regeneration finished", extra={
+        "plan_id": plan_id, "sections": list(sections), "success": response.success, "total_ms": response.timings.total_ms
+    })
+    return plan_json_response(response)
+
+async def run_lesson_plan_pipeline(request: LessonPlanRequest) -> LessonPlanResponse:
+    """Validation, scraping and planning for one request; create_lesson_plan adds the timings"""
     try:
+        await ensure_agents()
         # Prepare the query
         query = request.topic
         if request.grade_level:
             query = f"{request.topic} for {request.grade_level}"
-        print(f"🎯 Processing lesson plan request: {query}")
+        logger.info("Processing lesson plan request", extra={"query": query})
 
         # 2. Validate the query using the validation agent
-        validation_result = await Runner.run(validation_agent, query)
-        print(f"🛡️ Validation agent result: {validation_result}")
-        print(f"Validation agent raw result: {validation_result} (type: {type(validation_result)})")
+        validation_result = await run_agent(validation_agent, query, "validation", cacheable=True,
+                                            bypass_cache=request.bypass_cache, hedge=True)
         # Robust extraction of string output
         if not isinstance(validation_result, str):
             # Try to extract string from known attributes
             if hasattr(validation_result, 'output') and isinstance(validation_result.output, str):
                 validation_result = validation_result.output
-                print(f"Extracted string from .output: {validation_result}")
             elif hasattr(validation_result, 'final_output') and isinstance(validation_result.final_output, str):
                 validation_result = validation_result.final_output
-                print(f"Extracted string from .final_output: {validation_result}")
             else:
                 return LessonPlanResponse(
                     success=False,
@@ -435,75 +1180,69 @@ async def create_lesson_plan(request: LessonPlanRequest):
                 error="Validation agent returned an unexpected response.",
                 message="Could not validate query."
             )
+        logger.info("Validation agent result: %s", validation_result.strip())
         # Extract the cleaned query after 'VALID:'
         query = validation_result.strip()[len("VALID:"):].strip()
 
         # 3. Run the scraper agent with the query using async runner
-        run_result = await Runner.run(scraper_agent, query)
-        
-        # Debug: print the structure of run_result
-        print(f"🔍 Scraper run_result type: {type(run_result)}")
-        print(f"🔍 Scraper run_result attributes: {dir(run_result)}")
-        
+        run_result = await run_agent(scraper_agent, query, "scraper", fallback=False)
+
         # Extract the actual result from the RunResult
         if hasattr(run_result, 'final_output') and run_result.final_output:
             result = run_result.final_output
-            print(f"✅ Using run_result.final_output: {type(result)}")
         elif hasattr(run_result, 'output') and run_result.output:
             result = run_result.output
-            print(f"✅ Using run_result.output: {type(result)}")
         else:
             # Fallback: try to get the result directly
             result = run_result
-            print(f"⚠️ Using run_result directly: {type(result)}")
+            logger.warning("Using scraper run_result directly: %s", type(result).__name__)
         
         # If we got a ScrapeOutput, we need to hand off to the lesson planner
         if isinstance(result, ScrapeOutput):
-            print(f"📚 Content scraped successfully, creating lesson plan...")
+            logger.debug("Content scraped successfully, creating lesson plan")
             
-            # Create a concise prompt for the lesson planner to avoid context overflow
-            successful_sources = [s for s in result.sources if s.content_fetched]
+            # Create a concise prompt for the lesson planner to avoid context overflow.
+            # Source text comes from the scrape tool's records in the content store; the agent's
+            # own copy of the sources is only used when the tool recorded none.
+            successful_sources = ensure_request_context().fetched_sources() or [
+                content_store.record(s.url, s.content) for s in result.sources if s.content_fetched
+            ]
             source_urls = [s.url for s in successful_sources]  # Include ALL successful source URLs
             
-            # Create a more concise prompt
+            # The extractive summary covers every source within its token budget, so it stands in for
+            # raw excerpts; without one, the first sources are quoted (truncated)
+            extractive_summary = await asyncio.to_thread(summarize_sources, successful_sources, query)
+            summary = extractive_summary or result.summary
             prompt = f"""Create a lesson plan for: {request.topic}
 
-Summary: {result.summary}
-
-Key information from sources:
+Summary: {summary}
 """
-            
-            # Add key content from first few sources (truncated)
-            for i, source in enumerate(successful_sources[:2]):  # Only first 2 sources
-                truncated_content = source.content[:1000] + "..." if len(source.content) > 1000 else source.content
-                prompt += f"\nSource {i+1}: {truncated_content}\n"
+            if not extractive_summary:
+                prompt += "\nKey information from sources:\n"
+                for i, source in enumerate(successful_sources[:2]):  # Only first 2 sources
+                    prompt += f"\nSource {i+1}: {source.excerpt(1000)}\n"
             
             prompt += f"\nIMPORTANT: You MUST include ALL of these source URLs in your lesson plan: {', '.join(source_urls)}"
             
             # Hand off to lesson planner agent using async runner
-            run_result = await Runner.run(lesson_planner_agent, prompt)
-            
-            # Debug: print the structure of lesson planner run_result
-            print(f"🔍 Lesson planner run_result type: {type(run_result)}")
-            print(f"🔍 Lesson planner run_result attributes: {dir(run_result)}")
-            
+            run_result = await run_agent(lesson_planner_agent, prompt, "planner", cacheable=True,
+                                       bypass_cache=request.bypass_cache, hedge=True)
+
             # Extract the actual lesson plan from the RunResult
             if hasattr(run_result, 'final_output') and run_result.final_output:
                 lesson_plan = run_result.final_output
-                print(f"✅ Using run_result.final_output for lesson plan: {type(lesson_plan)}")
             elif hasattr(run_result, 'output') and run_result.output:
                 lesson_plan = run_result.output
-                print(f"✅ Using run_result.output for lesson plan: {type(lesson_plan)}")
             else:
                 # Fallback: try to get the result directly
                 lesson_plan = run_result
-                print(f"⚠️ Using run_result directly for lesson plan: {type(lesson_plan)}")
+                logger.warning("Using lesson planner run_result directly: %s", type(lesson_plan).__name__)
             
             # Validate that URLs are included in the lesson plan
             if hasattr(lesson_plan, 'urls') and lesson_plan.urls:
-                print(f"✅ Lesson plan includes {len(lesson_plan.urls)} URLs: {lesson_plan.urls}")
+                logger.debug("Lesson plan includes %d URLs", len(lesson_plan.urls))
             else:
-                print(f"⚠️ No URLs found in lesson plan, adding them manually...")
+                logger.info("No URLs found in lesson plan, adding %d source URLs", len(source_urls))
                 # Manually add URLs if they're missing
                 if hasattr(lesson_plan, 'urls'):
                     lesson_plan.urls = source_urls
@@ -512,36 +1251,45 @@ Key information from sources:
                     lesson_plan = type(lesson_plan)(
                         **{**lesson_plan.__dict__, 'urls': source_urls}
                     )
-                print(f"✅ Added {len(source_urls)} URLs to lesson plan")
             
+            # Keep the plan and its sources so sections can be regenerated without scraping again
+            sources = [(s.url, s.text) for s in successful_sources]
+            plan_id = await asyncio.to_thread(
+                plan_store.save, lesson_plan.model_dump(), request.topic, request.grade_level, summary, sources
+            )
+            # A snippet-only plan is a quick draft; the cache keeps plans built from the pages
+            if not ensure_request_context().snippet_only:
+                await asyncio.to_thread(
+                    plan_store.cache_plan, request.topic, request.grade_level, lesson_plan.model_dump(), summary, sources
+                )
             return LessonPlanResponse(
                 success=True,
                 lesson_plan=lesson_plan,
+                plan_id=plan_id,
                 message=f"Successfully created lesson plan for '{request.topic}'"
             )
         else:
             # If we got a LessonPlan directly (handoff worked)
+            plan_id = None
+            if isinstance(result, LessonPlan):
+                plan_id = await asyncio.to_thread(plan_store.save, result.model_dump(), request.topic, request.grade_level)
             return LessonPlanResponse(
                 success=True,
                 lesson_plan=result,
+                plan_id=plan_id,
                 message=f"Successfully created lesson plan for '{request.topic}'"
             )
             
     except Exception as e:
-        print(f"❌ Error creating lesson plan: {str(e)}")
+        logger.exception("Error creating lesson plan")
         return LessonPlanResponse(
             success=False,
             error=str(e),
             message=f"Failed to create lesson plan for '{request.topic}'"
         )
 
-# Run the FastAPI server
+# Run the FastAPI server (see run_server.py for the production multi-worker mode)
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
+    import run_server
+    run_server.main()
     
@@ -0,0 +1,174 @@
+"""
+Minimal Prometheus-style metrics for the lesson planning pipeline.
+
+Recording is a dict lookup, a bisect and an add under a per-metric lock, so it is
+cheap enough for the hot path. `render()` produces the text exposition format
+served on /metrics. Values are per worker process.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Stage latencies range from ~100 ms page fetches to minute-long planner calls
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        """{label values tuple: value} snapshot"""
+        with self._lock:
+            return dict(self._values)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "lesson_planner_stage_seconds", "Latency of each create-lesson-plan pipeline stage", ["stage"]))
+CACHE_REQUESTS = registry.register(Counter(
+    "lesson_planner_cache_requests_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"]))
+EXTRACTION_FAILURES = registry.register(Counter(
+    "lesson_planner_extraction_failures_total", "Page extractions that produced no content, by reason", ["reason"]))
+CSE_QUERIES = registry.register(Counter(
+    "lesson_planner_cse_queries_total", "Custom Search queries sent by this worker"))
+CSE_RESPONSE_BYTES = registry.register(Counter(
+    "lesson_planner_cse_response_bytes_total", "Bytes of Custom Search response bodies received by this worker"))
+CSE_QUOTA_USED = registry.register(Gauge(
+    "lesson_planner_cse_quota_used_today", "Custom Search queries sent today by all workers"))
+LLM_TOKENS = registry.register(Counter(
+    "lesson_planner_llm_tokens_total", "LLM tokens used, by agent and kind (input/output)", ["agent", "kind"]))
+LLM_CALLS = registry.register(Counter(
+    "lesson_planner_llm_calls_total", "Agent model calls by agent, model tier and outcome (ok/timeout/error)", ["agent", "tier", "outcome"]))
+LLM_HEDGES = registry.register(Counter(
+    "lesson_planner_llm_hedges_total", "Duplicate agent calls fired after the first ran past the tier's p90, by which call won", ["agent", "tier", "winner"]))
+CONTENT_STORE = registry.register(Gauge(
+    "lesson_planner_content_store", "Scraped text in the content store: entries, compressed bytes, text chars and dedupe hits", ["kind"]))
+LINKS_DEDUPED = registry.register(Counter(
+    "lesson_planner_links_deduplicated_total", "Search result links dropped as another spelling of (canonical) or a known redirect to (redirect) a listed page", ["reason"]))
+SCRAPES = registry.register(Counter(
+    "lesson_planner_scrapes_total", "Scrapes by where their search depth came from (default/topic/all/explore) and outcome (enough/short/snippet_only)", ["plan", "outcome"]))
+SNIPPET_FALLBACKS = registry.register(Counter(
+    "lesson_planner_snippet_fallbacks_total", "Search snippets used as a source, by why: page fetch failed, ran past the round's deadline (slow) or was skipped (snippet_only)", ["reason"]))
+SEARCH_ROUNDS = registry.register(Counter(
+    "lesson_planner_search_rounds_total", "Search rounds run by scrapes, by where their search depth came from", ["plan"]))
+PAGE_CHARS = registry.register(Counter(
+    "lesson_planner_page_chars_total", "Visible text of parsed pages (input) and what the quality filter kept (kept)", ["kind"]))
+CHARS_DISCARDED = registry.register(Counter(
+    "lesson_planner_chars_discarded_total", "Page text dropped by the quality filter, by block label (boilerplate/links/short)", ["label"]))
+PLANS_WARMED = registry.register(Counter(
+    "lesson_planner_plans_warmed_total", "Lesson plans regenerated off-peak by the cache warmer", ["result"]))
@@ -0,0 +1,195 @@
+"""
+Latency-aware model routing for the agents.
+
+Models are configured as an ordered list of tiers (MODEL_TIERS, JSON). For each
+agent call the router ranks the tiers that fit the prompt size, pushing tiers whose
+recent p90 latency breaks the SLO or whose recent error rate is too high to the
+back. run_agent tries the tiers in that order, moving on when a call times out or
+fails, and reports every outcome back so the per-tier stats stay current.
+
+Slow calls can be hedged: once a tier has enough samples, a call that has not
+returned by that agent's p90 on the tier gets a duplicate, and whichever finishes first wins.
+HedgeBudget caps duplicates at a fraction of all calls, so the extra spend is
+bounded by LLM_HEDGE_RATIO.
+
+A tier may carry a `base_url` to talk to any OpenAI-compatible chat completions
+server, e.g. the stub model server in loadtest.py.
+
+    MODEL_TIERS='[{"name": "mini", "model": "gpt-4o-mini", "max_prompt_chars": 30000, "timeout": 45},
+                  {"name": "standard", "model": "gpt-4o", "timeout": 60}]'
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import defaultdict, deque
+
+logger = logging.getLogger("lesson_planner.model_router")
+
+DEFAULT_TIERS = [
+    {"name": "mini", "model": "gpt-4o-mini", "timeout": 45},
+    {"name": "standard", "model": "gpt-4o", "timeout": 60},
+]
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class ModelTier:
+    def __init__(self, name, model, base_url=None, max_prompt_chars=None, timeout=60.0):
+        self.name = name
+        self.model = model
+        self.base_url = base_url
+        self.max_prompt_chars = max_prompt_chars
+        self.timeout = timeout
+        self.latencies = deque(maxlen=50)
+        self.outcomes = deque(maxlen=50)
+        # Agents differ by orders of magnitude (a validation call vs a scraper run with tool calls),
+        # so hedge delays come from per-agent samples
+        self.agent_latencies = defaultdict(lambda: deque(maxlen=50))
+
+    def fits(self, prompt_chars):
+        return self.max_prompt_chars is None or prompt_chars <= self.max_prompt_chars
+
+
+class HedgeBudget:
+    """Every call earns `ratio` of a hedge token, up to `burst`; a hedge spends a whole token"""
+
+    def __init__(self, ratio=0.1, burst=3):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = float(burst) if ratio > 0 else 0.0
+        self._lock = threading.Lock()
+
+    def on_call(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_acquire(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self):
+        with self._lock:
+            return self._tokens
+
+
+class ModelRouter:
+    def __init__(self, tiers, latency_slo=20.0, max_error_rate=0.5, min_samples=5, hedge_budget=None):
+        if not tiers:
+            raise ValueError("At least one model tier is required")
+        self.tiers = tiers
+        self.latency_slo = latency_slo
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.hedge_budget = hedge_budget or HedgeBudget(ratio=0)
+        self._models = {}
+        self._clients = {}  # base_url -> AsyncOpenAI, shared by the tiers on one server
+        self._lock = threading.Lock()
+
+    def _p90(self, tier):
+        return _percentile(sorted(tier.latencies), 90)
+
+    def _error_rate(self, tier):
+        return (tier.outcomes.count(False) / len(tier.outcomes)) if tier.outcomes else 0.0
+
+    def _degraded(self, tier):
+        if len(tier.outcomes) < self.min_samples:
+            return False
+        p90 = self._p90(tier)
+        return self._error_rate(tier) > self.max_error_rate or (p90 is not None and p90 > self.latency_slo)
+
+    def candidates(self, prompt_chars):
+        """Tiers to try in order for a prompt of this size: healthy fitting tiers first, in configured order"""
+        with self._lock:
+            fitting = [tier for tier in self.tiers if tier.fits(prompt_chars)] or [self.tiers[-1]]
+            return sorted(fitting, key=self._degraded)
+
+    def record(self, tier, latency, ok, agent=None):
+        with self._lock:
+            tier.outcomes.append(ok)
+            if ok:
+                tier.latencies.append(latency)
+                if agent is not None:
+                    tier.agent_latencies[agent].append(latency)
+
+    def p90(self, tier):
+        with self._lock:
+            return self._p90(tier)
+
+    def hedge_delay(self, tier, agent):
+        """Seconds to wait before hedging this agent's call on the tier, or None while hedging is off
+        or there are too few samples"""
+        if self.hedge_budget.ratio <= 0:
+            return None
+        with self._lock:
+            latencies = tier.agent_latencies.get(agent)
+            if not latencies or len(latencies) < self.min_samples:
+                return None
+            return _percentile(sorted(latencies), 90)
+
+    def model_for(self, tier):
+        """Model argument for Agent.clone: the model name, or a chat completions model bound to the tier's server"""
+        if tier.base_url is None:
+            return tier.model
+        with self._lock:
+            model = self._models.get(tier.name)
+            if model is None:
+                from openai import AsyncOpenAI
+                from agents import OpenAIChatCompletionsModel
+                client = self._clients.get(tier.base_url)
+                if client is None:
+                    client = self._clients[tier.base_url] = AsyncOpenAI(
+                        base_url=tier.base_url, api_key=os.getenv("OPENAI_API_KEY") or "unused")
+                model = self._models[tier.name] = OpenAIChatCompletionsModel(model=tier.model, openai_client=client)
+            return model
+
+    def clients(self):
+        """{base_url: AsyncOpenAI} for the tiers served by their own base_url (created if needed)"""
+        for tier in self.tiers:
+            if tier.base_url is not None:
+                self.model_for(tier)
+        with self._lock:
+            return dict(self._clients)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "latency_slo_s": self.latency_slo,
+                "hedge_ratio": self.hedge_budget.ratio,
+                "hedge_tokens": round(self.hedge_budget.tokens, 2),
+                "tiers": [{
+                    "name": tier.name,
+                    "model": tier.model,
+                    "base_url": tier.base_url,
+                    "max_prompt_chars": tier.max_prompt_chars,
+                    "timeout_s": tier.timeout,
+                    "calls": len(tier.outcomes),
+                    "p50_s": _percentile(sorted(tier.latencies), 50),
+                    "p90_s": self._p90(tier),
+                    "error_rate": round(self._error_rate(tier), 3),
+                    "degraded": self._degraded(tier),
+                } for tier in self.tiers],
+            }
+
+
+def load_tiers(raw=None):
+    specs = json.loads(raw) if raw else DEFAULT_TIERS
+    return [ModelTier(**spec) for spec in specs]
+
+
+model_router = ModelRouter(
+    load_tiers(os.getenv("MODEL_TIERS")),
+    latency_slo=float(os.getenv("MODEL_LATENCY_SLO", "20")),
+    max_error_rate=float(os.getenv("MODEL_MAX_ERROR_RATE", "0.5")),
+    hedge_budget=HedgeBudget(ratio=float(os.getenv("LLM_HEDGE_RATIO", "0.1"))),
+)
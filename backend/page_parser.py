@@ -0,0 +1,197 @@
+"""
+Text extraction from downloaded pages, optionally in a process pool.
+
+newspaper's Article.parse(), the content_quality filter and the BeautifulSoup
+fallback are pure-Python and hold the GIL, so on one worker concurrent requests
+take turns parsing. With
+PARSE_WORKERS > 0 the parsing runs in that many separate processes instead,
+while downloads stay on the scrape threads. The raw page bytes are handed over
+through shared memory: the scrape thread copies them into a segment once, and
+the parser process decodes them straight from there, so only the segment name
+and the extracted text cross the process pipe.
+
+PARSE_WORKERS=0 parses on the calling thread, as before. The pool is started on
+first use, after gunicorn has forked the workers, and a pool that breaks is
+replaced while the page at hand is parsed inline.
+"""
+
+import codecs
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+
+logger = logging.getLogger("lesson_planner.page_parser")
+
+# Extracted text shorter than this is treated as a failed extraction
+MIN_TEXT_CHARS = 100
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="text/html; charset=...">, in the page's head
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.I)
+META_SNIFF_BYTES = 4096
+
+
+def known_encoding(name):
+    """Python's name for the encoding, or None when it has no codec by that name (e.g. a declared "none")"""
+    try:
+        return codecs.lookup(name).name
+    except (LookupError, TypeError):
+        return None
+
+
+def meta_charset(content):
+    """The encoding a page declares in its own <meta> tags, if Python knows it"""
+    match = META_CHARSET_RE.search(bytes(content[:META_SNIFF_BYTES]))
+    if match is None:
+        return None
+    try:
+        return known_encoding(match.group(1).decode("ascii"))
+    except UnicodeDecodeError:
+        return None
+
+
+def decode(content, encoding=None):
+    """Page bytes (any bytes-like object) as text: the given encoding, else the page's <meta> charset,
+    else a detected one. An encoding Python doesn't know counts as none given."""
+    if encoding is not None:
+        encoding = known_encoding(encoding)
+    if encoding is None:
+        encoding = meta_charset(content)
+    if encoding is None:
+        from charset_normalizer import from_bytes
+        best = from_bytes(bytes(content)).best()
+        encoding = best.encoding if best is not None else "utf-8"
+    return str(content, encoding, "replace")
+
+
+def parse_html(url, content, encoding=None):
+    """(text, failure reason or None, quality report or None) for a downloaded page.
+
+    newspaper extracts the article and content_quality trims it to its substantive paragraphs; when
+    newspaper raises or finds nothing (it does on many non-English pages), the page's own good blocks
+    are used, and BeautifulSoup's full text as a last resort."""
+    import content_quality
+    html = decode(content, encoding)
+    try:
+        from newspaper import Article
+        article = Article(url)
+        article.config.fetch_images = False
+        article.config.memoize_articles = False
+        # Parse the already downloaded page
+        article.download(input_html=html)
+        article.parse()
+        text, report = content_quality.assess(html, article.text.strip())
+    except Exception:
+        text, report = content_quality.assess(html)
+    if not text and not report["input_chars"]:
+        # Fallback: basic BeautifulSoup extraction of the same response
+        try:
+            from bs4 import BeautifulSoup
+            soup = BeautifulSoup(html, "html.parser")
+            # Remove script and style elements
+            for script in soup(["script", "style"]):
+                script.decompose()
+            # Clean up text
+            lines = (line.strip() for line in soup.get_text().splitlines())
+            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+            text = " ".join(chunk for chunk in chunks if chunk).strip()
+        except Exception:
+            return "", "parse_error", None
+        return (text, None, None) if len(text) >= MIN_TEXT_CHARS else ("", "too_short", None)
+    if not content_quality.language_allowed(report["language"]):
+        return "", "wrong_language", report
+    if len(text) < MIN_TEXT_CHARS:
+        return "", "low_quality", report
+    return text, None, report
+
+
+def _init_worker():
+    # Pay for the imports once per process, not on the first page
+    import newspaper  # noqa: F401
+    import bs4  # noqa: F401
+
+
+def _parse_shared(url, name, size, encoding):
+    """parse_html on a page held in the shared memory segment `name` (runs in a pool process)"""
+    segment = SharedMemory(name=name)
+    try:
+        view = segment.buf[:size]
+        try:
+            return parse_html(url, view, encoding)
+        finally:
+            view.release()
+    finally:
+        segment.close()
+
+
+class ParsePool:
+    def __init__(self, workers=0):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self.parsed = {"pool": 0, "inline": 0}
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                # forkserver: forking a process that runs threads (ours does) is unsafe
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(method), initializer=_init_worker
+                )
+            return self._executor
+
+    def start(self):
+        """Start the pool's processes now rather than on the first pages"""
+        if self.workers > 0:
+            executor = self.executor()
+            for future in [executor.submit(_init_worker) for _ in range(self.workers)]:
+                future.result()
+
+    def parse(self, url, content, encoding=None):
+        """(text, failure reason or None, quality report or None) for the page; in a pool process when PARSE_WORKERS > 0"""
+        if self.workers <= 0 or not content:
+            self._count("inline")
+            return parse_html(url, content, encoding)
+        # The pool first: if starting it fails, no segment has been allocated yet to leak
+        executor = self.executor()
+        segment = SharedMemory(create=True, size=len(content))
+        try:
+            segment.buf[:len(content)] = content
+            result = executor.submit(_parse_shared, url, segment.name, len(content), encoding).result()
+            self._count("pool")
+            return result
+        except BrokenProcessPool:
+            logger.warning("Parse pool broke, starting a new one; parsing %s inline", url)
+            self.reset(executor)
+        finally:
+            segment.close()
+            segment.unlink()
+        self._count("inline")
+        return parse_html(url, content, encoding)
+
+    def _count(self, where):
+        with self._lock:
+            self.parsed[where] += 1
+
+    def reset(self, broken):
+        """Drop a broken executor; the next parse starts a new one (unless another thread already did)"""
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def snapshot(self):
+        return {"workers": self.workers, "started": self._executor is not None, "parsed": dict(self.parsed)}
+
+
+parse_pool = ParsePool(workers=int(os.getenv("PARSE_WORKERS", "0")))
@@ -0,0 +1,92 @@
+"""
+Generated lesson plans, kept with the source content they were built from.
+
+Each plan gets an id returned to the client. Regenerating a few sections of a
+plan reuses the stored sources instead of searching and scraping again, and the
+merged plan is written back under the same id. Records live in the shared store
+with a TTL, so any worker can serve them.
+
+The plan cache maps a normalized (topic, grade) to the latest plan generated for
+it. A hit is copied into a new plan record, so regenerating sections of one
+user's plan never changes what the next user gets.
+"""
+
+import os
+import time
+import uuid
+
+from request_log import normalize_topic
+from shared_state import shared_store
+
+# Source text kept per source; regeneration prompts only use excerpts of it
+MAX_SOURCE_CHARS = 8000
+
+
+class PlanStore:
+    def __init__(self, store, ttl=7 * 24 * 3600, cache_ttl=24 * 3600):
+        self.store = store
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+
+    def _key(self, plan_id):
+        return f"plan:{plan_id}"
+
+    def _cache_key(self, topic, grade_level):
+        return f"plan_cache:{normalize_topic(topic)}|{normalize_topic(grade_level)}"
+
+    def _sources(self, sources):
+        return [{"url": url, "content": content[:MAX_SOURCE_CHARS]} for url, content in sources]
+
+    def save(self, plan, topic, grade_level=None, summary="", sources=()):
+        """Store a new plan (a dict) with its sources ((url, content) pairs) and return its id"""
+        plan_id = uuid.uuid4().hex
+        now = time.time()
+        self.store.set(self._key(plan_id), {
+            "plan_id": plan_id,
+            "topic": topic,
+            "grade_level": grade_level,
+            "plan": plan,
+            "summary": summary,
+            "sources": self._sources(sources),
+            "created": now,
+            "updated": now,
+        }, ttl=self.ttl)
+        return plan_id
+
+    def load(self, plan_id):
+        """The stored record, or None if the id is unknown or expired"""
+        return self.store.get(self._key(plan_id))
+
+    def update_plan(self, plan_id, sections):
+        """Merge regenerated sections ({name: value}) into the stored plan, keeping its sources; returns the
+        record or None. The merge reads and writes in one transaction, so concurrent regenerations of
+        different sections all keep their changes."""
+        def merge(record):
+            record["plan"] = {**record["plan"], **sections}
+            record["updated"] = time.time()
+            return record
+        return self.store.update(self._key(plan_id), merge, ttl=self.ttl)
+
+    def cache_plan(self, topic, grade_level, plan, summary="", sources=()):
+        """Remember a freshly generated plan as the answer for this topic and grade"""
+        if self.cache_ttl <= 0:
+            return
+        self.store.set(self._cache_key(topic, grade_level), {
+            "plan": plan,
+            "summary": summary,
+            "sources": self._sources(sources),
+            "cached_at": time.time(),
+        }, ttl=self.cache_ttl)
+
+    def cached_plan(self, topic, grade_level):
+        """The cached {plan, summary, sources, cached_at} for this topic and grade, or None"""
+        if self.cache_ttl <= 0:
+            return None
+        return self.store.get(self._cache_key(topic, grade_level))
+
+
+plan_store = PlanStore(
+    shared_store,
+    ttl=int(os.getenv("PLAN_STORE_TTL", str(7 * 24 * 3600))),
+    cache_ttl=int(os.getenv("PLAN_CACHE_TTL", str(24 * 3600))),
+)
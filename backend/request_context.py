@@ -0,0 +1,146 @@
+"""
+Per-request context, stage timing and structured logging.
+
+Every request gets a RequestContext (request id plus stage and per-source timings)
+held in a ContextVar, so it follows the request into the agents runtime and into
+the scrape/fetch threads (which run under a copied context). Log records carry
+the request id and any `extra` fields, and are written as one JSON object per
+line (or plain text with LOG_FORMAT=text).
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger("lesson_planner")
+
+current_request = ContextVar("current_request", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is logged as a field
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+class RequestContext:
+    """Identity, timing breakdown and resource usage of one lesson-plan request"""
+
+    def __init__(self, request_id=None, refresh_pages=False, snippet_only=False):
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.sources = {}
+        # Counts such as cse_queries, llm_tokens and cache hits, for the request log and the cache warmer's budget
+        self.usage = {}
+        # Set by the cache warmer: fetch pages again instead of serving them from the page cache
+        self.refresh_pages = refresh_pages
+        # Build the plan from search snippets alone, without fetching pages
+        self.snippet_only = snippet_only
+        # SourceRecords of the pages scraped for this request; their text lives in the content store
+        self.source_records = []
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, source=None):
+        ms = seconds * 1000
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + ms
+            if source is not None:
+                self.sources[source] = self.sources.get(source, 0.0) + ms
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.usage[name] = self.usage.get(name, 0) + amount
+
+    def add_sources(self, records):
+        with self._lock:
+            self.source_records.extend(records)
+
+    def fetched_sources(self):
+        """Scraped SourceRecords, first occurrence of each URL"""
+        first = {}
+        with self._lock:
+            for record in self.source_records:
+                first.setdefault(record.url, record)
+        return list(first.values())
+
+    def timings(self):
+        """Milliseconds per stage (summed over repeated calls) and per fetched source"""
+        with self._lock:
+            return {
+                "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+                "stages": {stage: round(ms, 1) for stage, ms in self.stages.items()},
+                "sources": {source: round(ms, 1) for source, ms in self.sources.items()},
+            }
+
+
+def ensure_request_context(request_id=None):
+    """Return the current RequestContext, creating one if this code runs outside a request"""
+    ctx = current_request.get()
+    if ctx is None:
+        ctx = RequestContext(request_id)
+        current_request.set(ctx)
+    return ctx
+
+
+def count_usage(name, amount=1):
+    """Add to a usage count of the current request, if there is one"""
+    ctx = current_request.get()
+    if ctx is not None:
+        ctx.count(name, amount)
+
+
+@contextmanager
+def timed(stage, source=None):
+    """Time a pipeline stage into the metrics histogram and the current request's timings"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        ctx = current_request.get()
+        if ctx is not None:
+            ctx.record(stage, elapsed, source)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        ctx = current_request.get()
+        record.request_id = ctx.request_id if ctx is not None else "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RESERVED_ATTRS})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, fmt=None):
+    """Install the request-id filter and a JSON (or text) handler on the app logger"""
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    fmt = fmt or os.getenv("LOG_FORMAT", "json")
+    handler = logging.StreamHandler(sys.stdout)
+    handler.addFilter(RequestIdFilter())
+    if fmt == "text":
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(message)s"))
+    else:
+        handler.setFormatter(JsonFormatter())
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
@@ -0,0 +1,103 @@
+"""
+Append-only log of served lesson-plan requests.
+
+One compact JSON line per request: time, normalized topic and grade, latency,
+cache outcome, success and origin (a user or the cache warmer). Each line is a
+single write() on an O_APPEND file, so all worker processes can share the log.
+Past its size limit the file rotates to `<path>.1`. The cache warmer reads it
+to find the most requested topics.
+
+    python request_log.py top [path]     # most requested topics over the last 14 days
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "requests.jsonl")
+
+# Cache outcomes: the whole plan came from the plan cache, some agent or page results did, or nothing did
+HIT, PARTIAL, MISS = "hit", "partial", "miss"
+
+
+def normalize_topic(text):
+    """Lowercase, collapse whitespace and drop surrounding punctuation: 'Photosynthesis!  ' -> 'photosynthesis'"""
+    return re.sub(r"\s+", " ", (text or "").lower()).strip(" \t.,;:!?\"'")
+
+
+class RequestLog:
+    def __init__(self, path=DEFAULT_PATH, max_bytes=16 * 1024 * 1024, enabled=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+    def append(self, topic, grade_level, latency_ms, cache, success, origin="user"):
+        if not self.enabled:
+            return
+        line = json.dumps({
+            "ts": round(time.time(), 3),
+            "topic": normalize_topic(topic),
+            "grade": normalize_topic(grade_level),
+            "latency_ms": round(latency_ms, 1),
+            "cache": cache,
+            "ok": success,
+            "origin": origin,
+        }, separators=(",", ":")) + "\n"
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._rotate_if_full()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+
+    def _rotate_if_full(self):
+        try:
+            if os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+        except OSError:
+            # Missing file, or another worker rotated it first
+            pass
+
+    def entries(self, since=None):
+        """Logged requests, oldest first (the rotated file, then the current one)"""
+        for path in (self.path + ".1", self.path):
+            try:
+                f = open(path)
+            except OSError:
+                continue
+            with f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a torn line from a crash mid-write
+                    if since is None or entry.get("ts", 0) >= since:
+                        yield entry
+
+    def top_topics(self, n, since=None, min_count=1):
+        """[(topic, grade, count)] of the most requested topics, counting successful user requests only"""
+        counts = Counter(
+            (entry["topic"], entry.get("grade", ""))
+            for entry in self.entries(since)
+            if entry.get("ok") and entry.get("origin") == "user" and entry.get("topic")
+        )
+        return [(topic, grade, count) for (topic, grade), count in counts.most_common(n) if count >= min_count]
+
+
+request_log = RequestLog(
+    os.getenv("REQUEST_LOG_PATH", DEFAULT_PATH),
+    max_bytes=int(float(os.getenv("REQUEST_LOG_MAX_MB", "16")) * 1024 * 1024),
+    enabled=os.getenv("REQUEST_LOG_ENABLED", "1") == "1",
+)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "top":
+        sys.exit("usage: python request_log.py top [path]")
+    log = RequestLog(sys.argv[2]) if len(sys.argv) > 2 else request_log
+    for topic, grade, count in log.top_topics(50, since=time.time() - 14 * 24 * 3600):
+        print(f"{count:6d}  {topic}" + (f"  ({grade})" if grade else ""))
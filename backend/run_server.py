@@ -1,22 +1,81 @@
 #!/usr/bin/env python3
 """
 Simple script to run the Lesson Planner Bot FastAPI server
+
+    python run_server.py                  # development: single process with auto-reload
+    python run_server.py --prod           # production: multiple workers, no reload
+    python run_server.py --prod --workers 4
+
+Production mode prefers gunicorn (see gunicorn.conf.py), which imports the app once
+in the master process and forks the workers, so the app modules are imported a single time.
+Where gunicorn is unavailable (e.g. Windows) it falls back to uvicorn's own workers.
 """
 
+import argparse
+import importlib.util
+import os
+import sys
+
 import uvicorn
-from main import app
 
-if __name__ == "__main__":
-    print("🚀 Starting Lesson Planner Bot API Server...")
-    print("📖 API Documentation will be available at: http://localhost:8000/docs")
-    print("🔍 Interactive API docs at: http://localhost:8000/redoc")
-    print("🏥 Health check at: http://localhost:8000/health")
-    print("\n" + "="*50)
-    
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Lesson Planner Bot API server")
+    parser.add_argument("--prod", action="store_true", default=os.getenv("APP_ENV") == "production",
+                        help="production mode: several workers, no auto-reload (default when APP_ENV=production)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+                        help="number of worker processes in production mode (default: WEB_CONCURRENCY or CPU count)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+                        help="seconds in-flight requests get to finish on shutdown")
+    return parser.parse_args(argv)
+
+
+def run_production(args):
+    if sys.platform != "win32" and importlib.util.find_spec("gunicorn") is not None:
+        os.environ.update({
+            "WEB_CONCURRENCY": str(args.workers),
+            "HOST": args.host,
+            "PORT": str(args.port),
+            "GRACEFUL_TIMEOUT": str(args.graceful_timeout),
+        })
+        config = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py")
+        os.execvp(sys.executable, [sys.executable, "-m", "gunicorn", "-c", config, "main:app"])
+
+    # uvicorn's workers inherit it, so the app knows it shares its per-host fetch rate limits
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+
     uvicorn.run(
-        app,
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
         log_level="info"
-    ) 
\ No newline at end of file
+    )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("🚀 Starting Lesson Planner Bot API Server...")
+    print(f"📖 API Documentation will be available at: http://localhost:{args.port}/docs")
+    print(f"🔍 Interactive API docs at: http://localhost:{args.port}/redoc")
+    print(f"🏥 Health check at: http://localhost:{args.port}/health")
+    print("\n" + "="*50)
+
+    if args.prod:
+        print(f"🏭 Production mode with {args.workers} workers")
+        run_production(args)
+    else:
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level="info"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Search depth chosen from how past searches for the same kind of query went.
+
+Every scrape records its outcome in the shared store: links fetched, sources
+that yielded content and their characters, how many rounds it ran, whether
+round 1 alone was enough and, per later round, whether it added any source.
+The counters are kept per week and read over the current and previous
+week, at two levels: the query's topic (its content words, without generic
+words such as "lesson" or "grade") and all queries together.
+
+From the first level with enough samples, plan() derives:
+
+- fetch: links fetched per round, enough for round 1 to bring the sources
+  wanted nine times out of ten at the observed yield, and num_results
+  (Custom Search results per query) to match
+- broaden: whether to send the broadened queries in round 1 already (and
+  fetch up to twice as many links), when one query's results cannot bring
+  enough sources at that yield or round 1 alone usually fell short, and the
+  later rounds have been helping
+- max_rounds: stops before the first round that has almost never added a
+  source
+
+A round after a short one either asks for the next result page of the same
+queries (the default: same quota cost, no repeated results) or sends reworded
+queries, whichever has brought more sources per query sent; with the daily
+quota nearly used up it sends a single query.
+
+Without history the plan is the old fixed one. A small share of scrapes
+explores with the full number of rounds, so a round that was skipped can
+prove useful again.
+"""
+
+import math
+import os
+import random
+import time
+from dataclasses import dataclass
+
+from content_quality import STOPWORDS, WORD_RE
+from search_results import CSE_MAX_NUM
+from shared_state import shared_store
+
+# Words of rewritten queries that say nothing about the topic
+GENERIC_WORDS = frozenset(
+    "lesson lessons plan plans grade grades activities activity students student teachers teacher explained "
+    "explanation middle elementary high school kids worksheet worksheets educational resources introduction "
+    "for about what how why class classroom".split()
+)
+# Links fetched per round, per query sent in it
+MAX_FETCH = 10
+# Links per round are chosen so that round 1 alone brings enough sources with this probability
+ROUND1_TARGET = 0.9
+# A later round that added a source in fewer of its runs than this is skipped
+MIN_ROUND_GAIN = 0.1
+WEEK = 7 * 24 * 3600
+
+# How a round after a short one searches: the next result page of the same queries, or reworded queries
+PAGE, REQUERY = "page", "requery"
+# Below this share of the daily Custom Search quota left, such a round sends a single query
+LOW_QUOTA_SHARE = 0.1
+
+
+def broaden(queries):
+    """The reworded queries tried when a round brought too little content"""
+    return [q + " educational resources" for q in queries]
+
+
+def links_needed(sources, yield_rate, cap, target=ROUND1_TARGET):
+    """Fewest links to fetch for at least `sources` usable ones with probability `target`, each link
+    being usable with probability yield_rate (binomial); None if more than `cap` would be needed"""
+    for n in range(sources, cap + 1):
+        short = sum(math.comb(n, i) * yield_rate ** i * (1 - yield_rate) ** (n - i) for i in range(sources))
+        if 1 - short >= target:
+            return n
+    return None
+
+
+def topic_of(query):
+    """The kind of a query: its first three topic words, sorted"""
+    words = [w.lower() for w in WORD_RE.findall(query)]
+    topic = [w for w in words if w not in STOPWORDS["en"] and w not in GENERIC_WORDS and len(w) > 2]
+    return "+".join(sorted(dict.fromkeys(topic[:3]))) or "-"
+
+
+@dataclass
+class DepthPlan:
+    kind: str
+    num_results: int
+    fetch: int
+    broaden: bool
+    max_rounds: int
+    source: str  # default (no history), topic, all, or explore
+
+    def as_log(self):
+        return {"kind": self.kind, "num_results": self.num_results, "fetch": self.fetch,
+                "broaden": self.broaden, "max_rounds": self.max_rounds, "from": self.source}
+
+
+class DepthPlanner:
+    def __init__(self, store, min_samples=5, explore_rate=0.1, enabled=True):
+        self.store = store
+        self.min_samples = min_samples
+        self.explore_rate = explore_rate
+        self.enabled = enabled
+        self.random = random.Random()
+
+    @staticmethod
+    def _weeks(now=None):
+        week = int((now or time.time()) // WEEK)
+        return week, week - 1
+
+    def _stats(self, level):
+        """Counters of one level summed over this and last week, read in one query"""
+        names = ("scrapes", "fetched", "successes", "chars", "rounds", "round1_short",
+                 "round2_runs", "round2_helped", "round3_runs", "round3_helped",
+                 "page_queries", "page_links", "page_successes", "requery_queries", "requery_links", "requery_successes")
+        weeks = self._weeks()
+        values = self.store.counters(f"depth:{week}:{level}:{name}" for week in weeks for name in names)
+        return {name: sum(values[f"depth:{week}:{level}:{name}"] for week in weeks) for name in names}
+
+    def plan(self, queries, max_rounds=3, min_successful_sources=2, min_total_content=1000, max_sources=5):
+        kind = topic_of(queries[0]) if queries else "-"
+        default = DepthPlan(kind, num_results=5, fetch=max_sources, broaden=False, max_rounds=max_rounds, source="default")
+        if not self.enabled:
+            return default
+        for level, source in ((f"topic:{kind}", "topic"), ("all", "all")):
+            stats = self._stats(level)
+            if stats["scrapes"] >= self.min_samples and stats["fetched"]:
+                break
+        else:
+            return default
+
+        # Sources needed: the minimum count, or more when sources have been short
+        yield_rate = max(stats["successes"] / stats["fetched"], 0.1)
+        chars_per_source = stats["chars"] / stats["successes"] if stats["successes"] else 0
+        needed = min_successful_sources
+        if chars_per_source:
+            needed = max(needed, math.ceil(min_total_content / chars_per_source))
+        fetch = links_needed(needed, yield_rate, MAX_FETCH)
+
+        rounds = max_rounds
+        for r in range(2, max_rounds + 1):
+            runs, helped = stats.get(f"round{r}_runs", 0), stats.get(f"round{r}_helped", 0)
+            if runs >= self.min_samples and helped / runs < MIN_ROUND_GAIN:
+                rounds = r - 1
+                break
+        round2_useful = stats["round2_runs"] < self.min_samples or stats["round2_helped"] / stats["round2_runs"] >= MIN_ROUND_GAIN
+        # Low yield predicted (one query's results will not do) or seen (round 1 usually fell short)
+        low_yield = fetch is None or stats["round1_short"] / stats["scrapes"] >= 0.5
+        broaden_first = low_yield and round2_useful
+        if broaden_first:
+            fetch = links_needed(needed, yield_rate, 2 * MAX_FETCH) or 2 * MAX_FETCH
+        fetch = fetch or MAX_FETCH
+        # Some results are filtered out or turn out to be duplicates
+        num_results = min(CSE_MAX_NUM, max(3, fetch + 2))
+
+        if self.random.random() < self.explore_rate:
+            rounds, source = max_rounds, "explore"
+        return DepthPlan(kind, num_results, fetch, broaden_first, rounds, source)
+
+    def followup(self, plan, can_page, quota_left=None, daily_quota=None):
+        """(PAGE or REQUERY, most queries to send or None) for a round after a short one.
+
+        Paging costs the same quota unit as a reworded query but never repeats a result, so it is the
+        default; a reworded query wins once its history shows more sources per query sent. With little
+        quota left the round sends one query and does not explore."""
+        low_quota = quota_left is not None and daily_quota and quota_left < daily_quota * LOW_QUOTA_SHARE
+        limit = 1 if low_quota else None
+        if not can_page:
+            return REQUERY, limit
+        strategy = PAGE
+        if self.enabled:
+            for level in (f"topic:{plan.kind}", "all"):
+                stats = self._stats(level)
+                if min(stats["page_queries"], stats["requery_queries"]) >= self.min_samples:
+                    page_rate = stats["page_successes"] / stats["page_queries"]
+                    requery_rate = stats["requery_successes"] / stats["requery_queries"]
+                    strategy = REQUERY if requery_rate > page_rate else PAGE
+                    break
+            if not low_quota and self.random.random() < self.explore_rate:
+                strategy = REQUERY if strategy == PAGE else PAGE
+        return strategy, limit
+
+    def record(self, plan, fetched, round_successes, chars, satisfied, followups=()):
+        """Add one scrape's outcome to its topic's and the overall counters; followups holds
+        (strategy, queries sent, new links, sources gained) of each round after the first"""
+        if not self.enabled:
+            return
+        week, _ = self._weeks()
+        counts = {
+            "scrapes": 1,
+            "fetched": fetched,
+            "successes": sum(round_successes),
+            "chars": chars,
+            "rounds": len(round_successes),
+            "round1_short": int(len(round_successes) > 1 or not satisfied),
+        }
+        for r, successes in enumerate(round_successes[1:], start=2):
+            counts[f"round{r}_runs"] = 1
+            counts[f"round{r}_helped"] = int(successes > 0)
+        for strategy, queries, links, successes in followups:
+            counts[f"{strategy}_queries"] = counts.get(f"{strategy}_queries", 0) + queries
+            counts[f"{strategy}_links"] = counts.get(f"{strategy}_links", 0) + links
+            counts[f"{strategy}_successes"] = counts.get(f"{strategy}_successes", 0) + successes
+        for level in (f"topic:{plan.kind}", "all"):
+            for name, amount in counts.items():
+                if amount:
+                    self.store.incr(f"depth:{week}:{level}:{name}", amount, ttl=3 * WEEK)
+
+
+depth_planner = DepthPlanner(
+    shared_store,
+    min_samples=int(os.getenv("DEPTH_MIN_SAMPLES", "5")),
+    explore_rate=float(os.getenv("DEPTH_EXPLORE_RATE", "0.1")),
+    enabled=os.getenv("ADAPTIVE_SEARCH_DEPTH", "1") == "1",
+)
@@ -0,0 +1,62 @@
+"""
+Custom Search results kept whole: link, title, snippet and the page's own description.
+
+Google's result already carries a short account of each page: its title, the
+snippet shown under it and, in pagemap metatags, the description the site
+gives itself (og:description and the like). SearchResult.text() turns these
+into a few sentences of content, which the scraper uses when a page cannot be
+fetched in time, and instead of fetching at all in snippet-only mode.
+"""
+
+import re
+from typing import NamedTuple
+
+# Partial response: the result fields below, nothing else
+CSE_FIELDS = "items(link,title,snippet,pagemap/metatags)"
+# Custom Search returns at most 10 results per call and none past the 100th
+CSE_MAX_NUM = 10
+CSE_MAX_START = 91
+DESCRIPTION_TAGS = ("og:description", "description", "twitter:description")
+
+# "Mar 3, 2021 ... " in front of a snippet, and the ellipses Google cuts it with
+SNIPPET_DATE_RE = re.compile(r"^[A-Z][a-z]{2} \d{1,2}, \d{4}\s*\.\.\.\s*")
+ELLIPSIS_RE = re.compile(r"\s*(\.\.\.|…)\s*$")
+
+
+def _clean(text):
+    text = " ".join((text or "").split())
+    text = SNIPPET_DATE_RE.sub("", text)
+    return ELLIPSIS_RE.sub("", text).strip()
+
+
+def _sentence(text):
+    return text if not text or text[-1] in ".!?" else text + "."
+
+
+class SearchResult(NamedTuple):
+    link: str
+    title: str = ""
+    snippet: str = ""
+    description: str = ""
+
+    @classmethod
+    def from_item(cls, item):
+        """A SearchResult from one entry of a Custom Search response's items"""
+        descriptions = [
+            _clean(tags.get(name, ""))
+            for tags in (item.get("pagemap") or {}).get("metatags") or [] if isinstance(tags, dict)
+            for name in DESCRIPTION_TAGS
+        ]
+        return cls(
+            link=item["link"],
+            title=_clean(item.get("title", "")),
+            snippet=_clean(item.get("snippet", "")),
+            description=max(descriptions, key=len, default=""),
+        )
+
+    def text(self):
+        """Title, description and snippet as prose; the snippet is left out when the description has it"""
+        parts = [_sentence(self.title), _sentence(self.description)]
+        if self.snippet and self.snippet[:40].lower() not in self.description.lower():
+            parts.append(_sentence(self.snippet))
+        return " ".join(part for part in parts if part)
@@ -0,0 +1,197 @@
+"""
+SQLite-backed state shared by every worker process on the host.
+
+Caches, quota counters and rate-limit buckets live here instead of in process
+memory, so they stay coherent when the server runs with several workers.
+Each thread of each process opens its own connection; WAL mode lets readers
+proceed while a writer holds the lock.
+
+Expired rows are deleted by purge_forever, which runs in every worker; each
+interval the first worker to claim it does the purge.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger("lesson_planner.shared_state")
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "lesson_planner_state.sqlite3")
+# Token buckets untouched for this long have long refilled, so their rows can go
+BUCKET_IDLE_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL);
+CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);
+"""
+
+
+class SharedStore:
+    """Key/value cache with TTL, expiring counters and token buckets on one SQLite file"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def connection(self):
+        """This thread's connection to the store (autocommit mode); other modules may add their own tables"""
+        # Connections must not cross a fork, so they are keyed by pid as well as thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, default=None):
+        row = self.connection().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        self.connection().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), expires_at)
+        )
+
+    def update(self, key, change, ttl=None):
+        """Atomically replace a value with change(value) and return the new value. change is not called, and
+        None is returned, when the key is missing or expired; it runs inside the write transaction, so keep it quick."""
+        conn = self.connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+            ).fetchone()
+            value = None
+            if row is not None:
+                value = change(json.loads(row[0]))
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now + ttl if ttl else None)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def keys(self, prefix, limit=None):
+        """Unexpired keys starting with prefix"""
+        rows = self.connection().execute(
+            "SELECT key FROM kv WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?) LIMIT ?",
+            (prefix, prefix + "\uffff", time.time(), -1 if limit is None else limit)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, key):
+        self.connection().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def incr(self, name, amount=1, ttl=None):
+        """Atomically add `amount` to a counter and return the new value; expired counters restart at zero"""
+        conn = self.connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value, expires_at FROM counters WHERE name = ?", (name,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                value, expires_at = amount, (now + ttl if ttl else None)
+            else:
+                value, expires_at = row[0] + amount, row[1]
+            conn.execute(
+                "INSERT OR REPLACE INTO counters (name, value, expires_at) VALUES (?, ?, ?)",
+                (name, value, expires_at)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def counter(self, name):
+        row = self.connection().execute(
+            "SELECT value FROM counters WHERE name = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (name, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def counters(self, names):
+        """{name: value} of the given counters, in one query; expired or missing counters are 0"""
+        names = list(names)
+        rows = self.connection().execute(
+            f"SELECT name, value FROM counters WHERE name IN ({', '.join('?' * len(names))}) "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (*names, time.time())
+        ).fetchall()
+        values = dict.fromkeys(names, 0)
+        values.update(rows)
+        return values
+
+    def take_token(self, name, rate, capacity):
+        """Token bucket shared across processes: consume a token, or return the seconds until one is available"""
+        conn = self.connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            delay = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                delay = (1 - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (name, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return delay
+
+    def purge_expired(self, bucket_idle=BUCKET_IDLE_SECONDS):
+        """Delete expired entries and counters and idle token buckets; returns the rows deleted per table"""
+        now = time.time()
+        conn = self.connection()
+        return {
+            "kv": conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)).rowcount,
+            "counters": conn.execute("DELETE FROM counters WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)).rowcount,
+            "buckets": conn.execute("DELETE FROM buckets WHERE updated <= ?", (now - bucket_idle,)).rowcount,
+        }
+
+    async def purge_forever(self, interval):
+        """Purge once per interval across all workers: the worker that claims the interval's counter first does it"""
+        while True:
+            try:
+                slot = int(time.time() // interval)
+                if await asyncio.to_thread(self.incr, f"purge:{slot}", 1, 2 * interval) == 1:
+                    deleted = await asyncio.to_thread(self.purge_expired)
+                    logger.info("Purged expired shared state", extra={"deleted": deleted})
+            except sqlite3.Error:
+                logger.exception("Purging shared state failed")
+            await asyncio.sleep(interval)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+
+shared_store = SharedStore(os.getenv("SHARED_STATE_PATH", DEFAULT_PATH))
+# Seconds between purges of expired rows (0 disables)
+purge_interval = int(os.getenv("STATE_PURGE_INTERVAL", "3600"))
@@ -0,0 +1,154 @@
+"""
+Extractive multi-source summary of the scraped pages, built locally.
+
+The sentences of all sources are ranked TextRank-style: a graph links every
+pair of sentences by the cosine similarity of their TF-IDF vectors, and a
+PageRank walk over it scores the sentences that many others (from any source)
+agree with. The walk's restarts lean towards sentences that mention the topic's
+words. Sentences are then picked by maximal marginal relevance: each pick
+trades its score against its similarity to the sentences already picked, and
+near-duplicates are skipped outright, until the token budget is spent. The
+picks are printed in source order, so the summary reads like the pages.
+
+The summary replaces raw source excerpts in the lesson planner's prompt, which
+keeps the prompt smaller while covering every source.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+
+from content_quality import STOPWORDS, WORD_RE
+
+# Sentence ends: terminal punctuation followed by a capitalised or numeric start
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])[\"')\]]?\s+(?=[\"'(\[]?[A-Z0-9])")
+TRUNCATION_MARK = "... [content truncated]"
+MIN_SENTENCE_WORDS = 6
+MAX_SENTENCE_WORDS = 60
+# Sentences ranked per source (its first ones) and overall; TextRank is quadratic in their number
+MAX_SENTENCES_PER_SOURCE = 60
+MAX_SENTENCES = 240
+DAMPING = 0.85
+ITERATIONS = 30
+# MMR weight of a sentence's own score against its similarity to those already picked
+MMR_LAMBDA = 0.7
+# Sentences at least this similar to one already picked are not picked
+MAX_REDUNDANCY = 0.6
+
+# Tokens the summary handed to the lesson planner may take
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "350"))
+
+
+def estimate_tokens(text):
+    """Rough LLM token count: about four characters per token for English text"""
+    return math.ceil(len(text) / 4)
+
+
+def split_sentences(text):
+    """The sentences of text worth ranking: prose of MIN_SENTENCE_WORDS to MAX_SENTENCE_WORDS words"""
+    text = text.removesuffix(TRUNCATION_MARK)
+    sentences = []
+    for paragraph in text.split("\n"):
+        for sentence in SENTENCE_END_RE.split(paragraph.strip()):
+            sentence = " ".join(sentence.split())
+            words = len(WORD_RE.findall(sentence))
+            # Headings and list fragments lack terminal punctuation
+            if MIN_SENTENCE_WORDS <= words <= MAX_SENTENCE_WORDS and sentence[-1:] in ".!?\"')":
+                sentences.append(sentence)
+    return sentences
+
+
+def _terms(sentence):
+    return [word for word in (w.lower() for w in WORD_RE.findall(sentence)) if word not in STOPWORDS["en"] and len(word) > 2]
+
+
+def _vectors(term_lists):
+    """Unit-length TF-IDF vectors (term -> weight) for each sentence's terms"""
+    document_frequency = Counter(term for terms in term_lists for term in set(terms))
+    n = len(term_lists)
+    vectors = []
+    for terms in term_lists:
+        vector = {term: count * math.log(1 + n / document_frequency[term]) for term, count in Counter(terms).items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        vectors.append({term: weight / norm for term, weight in vector.items()})
+    return vectors
+
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b[term] for term, weight in a.items() if term in b)
+
+
+def textrank(vectors, restart=None):
+    """PageRank scores over the sentence similarity graph; `restart` weights where the walk restarts"""
+    n = len(vectors)
+    if n == 0:
+        return []
+    # Sparse graph: for each sentence, its neighbours j with the share of j's edge weight that flows to it
+    neighbours = [[] for _ in range(n)]
+    out_weight = [0.0] * n
+    for i in range(n):
+        for j in range(i + 1, n):
+            weight = _cosine(vectors[i], vectors[j])
+            if weight > 0:
+                neighbours[i].append((j, weight))
+                neighbours[j].append((i, weight))
+                out_weight[i] += weight
+                out_weight[j] += weight
+    neighbours = [[(j, weight / out_weight[j]) for j, weight in edges] for edges in neighbours]
+    if restart is None or not any(restart):
+        restart = [1.0] * n
+    total = sum(restart)
+    restart = [r / total for r in restart]
+    scores = [1.0 / n] * n
+    for _ in range(ITERATIONS):
+        new = [(1 - DAMPING) * restart[i] + DAMPING * sum(scores[j] * share for j, share in neighbours[i]) for i in range(n)]
+        converged = sum(abs(a - b) for a, b in zip(new, scores)) < 1e-6
+        scores = new
+        if converged:
+            break
+    return scores
+
+
+def summarize(texts, budget_tokens=SUMMARY_TOKEN_BUDGET, query=""):
+    """(summary, stats) of the texts within about budget_tokens tokens; summary is "" without usable prose.
+
+    stats holds the sentences ranked and picked, the sources the picks came from and the summary's tokens."""
+    candidates = []  # (source index, position, sentence)
+    for source, text in enumerate(texts):
+        for position, sentence in enumerate(split_sentences(text)[:MAX_SENTENCES_PER_SOURCE]):
+            candidates.append((source, position, sentence))
+    # Over the cap, keep every source's leading sentences rather than the first sources whole
+    candidates.sort(key=lambda candidate: candidate[1])
+    candidates = candidates[:MAX_SENTENCES]
+    stats = {"sentences": len(candidates), "picked": 0, "sources": 0, "tokens": 0}
+    if not candidates:
+        return "", stats
+
+    vectors = _vectors([_terms(sentence) for _, _, sentence in candidates])
+    query_terms = set(_terms(query))
+    restart = [1.0 + sum(1 for term in vector if term in query_terms) for vector in vectors]
+    scores = textrank(vectors, restart)
+    top = max(scores) or 1.0
+    relevance = [score / top for score in scores]
+
+    picked, used = [], 0
+    redundancy = [0.0] * len(candidates)  # similarity to the closest sentence picked so far
+    remaining = set(range(len(candidates)))
+    while remaining:
+        best = max(remaining, key=lambda i: MMR_LAMBDA * relevance[i] - (1 - MMR_LAMBDA) * redundancy[i])
+        remaining.discard(best)
+        cost = estimate_tokens(candidates[best][2]) + 1
+        if redundancy[best] >= MAX_REDUNDANCY or used + cost > budget_tokens:
+            continue  # a shorter, or different, sentence may still fit
+        picked.append(best)
+        used += cost
+        for i in remaining:
+            redundancy[i] = max(redundancy[i], _cosine(vectors[i], vectors[best]))
+
+    picked.sort(key=lambda i: candidates[i][:2])
+    summary = " ".join(candidates[i][2] for i in picked)
+    stats.update(picked=len(picked), sources=len({candidates[i][0] for i in picked}), tokens=estimate_tokens(summary))
+    return summary, stats
@@ -0,0 +1,118 @@
+"""
+Concurrency check for the scraping path: N parallel lesson-plan requests should
+finish in about the time of one, and /health should stay responsive meanwhile.
+
+Runs offline: the agents are replaced by a stub Runner, which calls the real
+scrape tool (function_tool wrapper, scrape executor, scrape_topic_content); only
+the network is stubbed, by blocking sleeps in place of the search and the page
+downloads, which is exactly the kind of work that used to stall the event loop.
+Shared state and the request log go to a temporary directory.
+
+    python test_concurrency.py      (or: pytest test_concurrency.py)
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import httpx
+
+# Removed when the process exits
+STATE_DIR = tempfile.TemporaryDirectory(prefix="lesson_planner_test_")
+os.environ.update({
+    "SHARED_STATE_PATH": os.path.join(STATE_DIR.name, "state.sqlite3"),
+    "REQUEST_LOG_PATH": os.path.join(STATE_DIR.name, "requests.jsonl"),
+})
+
+import main  # noqa: E402  (reads the paths above at import)
+
+SEARCH_SECONDS = 0.2
+FETCH_SECONDS = 0.8
+SCRAPE_SECONDS = SEARCH_SECONDS + FETCH_SECONDS
+PARALLEL_REQUESTS = 4
+PAGE_TEXT = "Plants turn light, water and carbon dioxide into sugar and oxygen in their leaves. " * 8
+
+
+def blocking_search(query, api_key, cse_id, num_results=10, start=1):
+    time.sleep(SEARCH_SECONDS)
+    slug = "-".join(query.lower().split())
+    return [main.SearchResult(f"https://site{i}.example.edu/{slug}") for i in range(start, start + min(num_results, 10))]
+
+
+def blocking_fetch(url, timeout=None):
+    time.sleep(FETCH_SECONDS)
+    return PAGE_TEXT
+
+
+async def call_scrape_tool(queries):
+    """Invoke the scraper agent's scrape tool the way the agents SDK does for a model's tool call"""
+    from agents.tool_context import ToolContext
+    tool = main.scraper_agent.tools[0]
+    arguments = json.dumps({"queries": queries})
+    context = ToolContext(context=None, tool_name=tool.name, tool_call_id="test", tool_arguments=arguments)
+    return await tool.on_invoke_tool(context, arguments)
+
+
+class StubRunner:
+    @staticmethod
+    async def run(agent, input, **kwargs):
+        if agent.name == main.validation_agent.name:
+            return SimpleNamespace(final_output=f"VALID: {input}")
+        if agent.name == main.scraper_agent.name:
+            return SimpleNamespace(final_output=await call_scrape_tool([input]))
+        return SimpleNamespace(final_output=main.LessonPlan(
+            topic=input.splitlines()[0], grade_level="5th Grade", duration_minutes=45,
+            learning_objectives=["Objective"], materials_needed=["Paper"],
+            lesson_overview=[main.LessonTopic(title="Intro", duration_minutes=10, description="Intro")],
+            exercises=["Exercise"], assessment=["Question"], urls=[],
+        ))
+
+
+async def _timed_requests(client, count):
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(
+        # bypass_cache: a plan cached by an earlier run would make the single request instant
+        client.post("/create-lesson-plan", json={"topic": f"Photosynthesis {i}", "bypass_cache": True}) for i in range(count)
+    ))
+    return time.perf_counter() - start, responses
+
+
+async def _run_concurrency_check():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        single_elapsed, _ = await _timed_requests(client, 1)
+
+        load = asyncio.create_task(_timed_requests(client, PARALLEL_REQUESTS))
+        await asyncio.sleep(SCRAPE_SECONDS / 4)
+        health_start = time.perf_counter()
+        health = await client.get("/health")
+        health_elapsed = time.perf_counter() - health_start
+        parallel_elapsed, responses = await load
+
+    return single_elapsed, parallel_elapsed, health_elapsed, health, responses
+
+
+def test_parallel_requests_take_about_as_long_as_one():
+    main.build_agents()
+    originals = main.Runner, main.search_google_cse, main.extract_text_from_url
+    main.Runner, main.search_google_cse, main.extract_text_from_url = StubRunner, blocking_search, blocking_fetch
+    try:
+        single, parallel, health_elapsed, health, responses = asyncio.run(_run_concurrency_check())
+    finally:
+        main.Runner, main.search_google_cse, main.extract_text_from_url = originals
+
+    print(f"1 request: {single:.2f}s, {PARALLEL_REQUESTS} parallel requests: {parallel:.2f}s, /health under load: {health_elapsed * 1000:.0f}ms")
+    assert all(r.json()["success"] for r in responses)
+    # The plans' sources came through the real tool and scrape, from the stubbed search results
+    assert all(url.startswith("https://site") for r in responses for url in r.json()["lesson_plan"]["urls"])
+    assert health.status_code == 200
+    assert health_elapsed < SCRAPE_SECONDS / 2
+    assert parallel < single * 1.5
+
+
+if __name__ == "__main__":
+    test_parallel_requests_take_about_as_long_as_one()
+    print("✅ Concurrency check passed")
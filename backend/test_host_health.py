@@ -0,0 +1,92 @@
+"""
+Circuit breaker check for host_health: closed -> open after consecutive failures,
+half-open after the cooldown with a single trial fetch let through, then closed
+by a successful trial or open again by a failed one. The breaker runs on a fake
+clock, so no time passes.
+
+    python test_host_health.py      (or: pytest test_host_health.py)
+"""
+
+from host_health import HostHealth, CLOSED, OPEN, HALF_OPEN
+
+HOST = "example.com"
+COOLDOWN = 60.0
+TRIAL_TIMEOUT = 30.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def open_breaker():
+    clock = FakeClock()
+    health = HostHealth(failure_threshold=3, cooldown=COOLDOWN, trial_timeout=TRIAL_TIMEOUT, clock=clock)
+    for _ in range(2):
+        assert health.allow(HOST)
+        health.record_failure(HOST, 1.0)
+    assert health.snapshot()[HOST]["state"] == CLOSED
+    assert health.allow(HOST)
+    health.record_failure(HOST, 1.0)
+    assert health.snapshot()[HOST]["state"] == OPEN
+    return health, clock
+
+
+def test_open_breaker_lets_one_trial_through_after_the_cooldown():
+    health, clock = open_breaker()
+    clock.now += COOLDOWN - 1
+    assert not health.allow(HOST)
+    clock.now += 1
+    assert health.allow(HOST)
+    assert health.snapshot()[HOST]["state"] == HALF_OPEN
+    # The trial is in flight: everything else waits for its outcome
+    assert not health.allow(HOST)
+    assert not health.allow(HOST)
+
+
+def test_successful_trial_closes_the_breaker():
+    health, clock = open_breaker()
+    clock.now += COOLDOWN
+    assert health.allow(HOST)
+    health.record_success(HOST, 0.5)
+    assert health.snapshot()[HOST]["state"] == CLOSED
+    assert health.allow(HOST)
+    assert health.allow(HOST)
+
+
+def test_failed_trial_reopens_the_breaker_for_another_cooldown():
+    health, clock = open_breaker()
+    clock.now += COOLDOWN
+    assert health.allow(HOST)
+    health.record_failure(HOST, 1.0)
+    snapshot = health.snapshot()[HOST]
+    assert snapshot["state"] == OPEN
+    assert snapshot["cooldown_remaining_s"] == COOLDOWN
+    assert not health.allow(HOST)
+    clock.now += COOLDOWN
+    assert health.allow(HOST)
+
+
+def test_released_or_lost_trial_lets_another_through():
+    health, clock = open_breaker()
+    clock.now += COOLDOWN
+    assert health.allow(HOST)
+    # A trial that says nothing about the host (e.g. an archive miss) hands the trial on
+    health.release(HOST)
+    assert health.allow(HOST)
+    # A trial that never reports is given up after trial_timeout
+    assert not health.allow(HOST)
+    clock.now += TRIAL_TIMEOUT
+    assert health.allow(HOST)
+    assert health.snapshot()[HOST]["state"] == HALF_OPEN
+
+
+if __name__ == "__main__":
+    test_open_breaker_lets_one_trial_through_after_the_cooldown()
+    test_successful_trial_closes_the_breaker()
+    test_failed_trial_reopens_the_breaker_for_another_cooldown()
+    test_released_or_lost_trial_lets_another_through()
+    print("✅ Circuit breaker check passed")
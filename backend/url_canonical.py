@@ -0,0 +1,124 @@
+"""
+URL canonicalization for search results, page-cache keys and dedupe.
+
+Search results often name the same page in several spellings: http and https,
+with and without `www.`, with a trailing slash, a `#fragment` or `utm_*`
+tracking parameters. canonicalize_url maps all of them to one key. Links are
+still fetched in their cleaned form (clean_url: fragment and tracking
+parameters dropped, otherwise as found), because not every site answers on
+the bare host or over https.
+
+Redirects seen while fetching are remembered in the shared store, so the next
+link that leads to a known page is resolved to it before it is fetched, and is
+recognised as a duplicate of that page.
+"""
+
+import logging
+import os
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from shared_state import shared_store
+
+logger = logging.getLogger("lesson_planner.url_canonical")
+
+TRACKING_PARAMS = frozenset({
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_ga", "_gl", "igshid", "ref_src",
+})
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _is_tracking(name):
+    name = name.lower()
+    return name.startswith("utm_") or name in TRACKING_PARAMS
+
+
+def clean_url(url):
+    """The URL without its fragment and tracking parameters; everything else as given"""
+    parts = urlsplit(url.strip())
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    query = parts.query
+    if any(_is_tracking(k) for k, _ in params):
+        query = urlencode([(k, v) for k, v in params if not _is_tracking(k)])
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+
+def canonicalize_url(url):
+    """One key for every spelling of a page: https, lower-case host without www. or default port,
+    no trailing slash, no fragment, tracking parameters dropped and the rest sorted"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if not scheme or not host:
+        return url.strip()
+    host = host.removeprefix("www.")
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or port == DEFAULT_PORTS.get(scheme) else f"{host}:{port}"
+    if scheme == "http":
+        scheme = "https"
+    path = parts.path or "/"
+    while "//" in path:
+        path = path.replace("//", "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking(k))
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+class RedirectMap:
+    """Final URLs of pages that redirected when fetched, shared by every worker"""
+
+    def __init__(self, store, ttl=7 * 24 * 3600, max_hops=5):
+        self.store = store
+        self.ttl = ttl
+        self.max_hops = max_hops
+
+    def record(self, url, final_url):
+        """Remember that url ended up at final_url; same-page hops (e.g. adding a slash) are not stored"""
+        source, target = canonicalize_url(url), canonicalize_url(final_url)
+        if source == target or self.ttl <= 0:
+            return
+        self.store.set(f"redirect:{source}", clean_url(final_url), ttl=self.ttl)
+        logger.debug("Recorded redirect %s -> %s", url, final_url)
+
+    def resolve(self, url):
+        """The cleaned URL to fetch for url, following known redirects"""
+        url = clean_url(url)
+        if self.ttl <= 0:
+            return url
+        seen = {canonicalize_url(url)}
+        for _ in range(self.max_hops):
+            target = self.store.get(f"redirect:{canonicalize_url(url)}")
+            if target is None or canonicalize_url(target) in seen:
+                break
+            url = target
+            seen.add(canonicalize_url(url))
+        return url
+
+
+def dedupe_links(links, seen, redirects=None):
+    """Cleaned links whose canonical URL is not in `seen` yet, in order; `seen` (canonical -> link) is updated.
+
+    Returns (new links, {"canonical": n, "redirect": n}) where the counts are links dropped as
+    another spelling of a seen page, and as a known redirect to one."""
+    new_links = []
+    dropped = {"canonical": 0, "redirect": 0}
+    for link in links:
+        key = canonicalize_url(link)
+        if key in seen:
+            dropped["canonical"] += 1
+            continue
+        resolved = redirects.resolve(link) if redirects is not None else clean_url(link)
+        resolved_key = canonicalize_url(resolved)
+        if resolved_key in seen:
+            seen[key] = seen[resolved_key]
+            dropped["redirect"] += 1
+            continue
+        seen[key] = seen[resolved_key] = resolved
+        new_links.append(resolved)
+    return new_links, dropped
+
+
+redirect_map = RedirectMap(shared_store, ttl=int(os.getenv("REDIRECT_CACHE_TTL", str(7 * 24 * 3600))))
@@ -1,8 +1,9 @@
-import React, { useState } from 'react';
-import { ThemeProvider, createTheme, CssBaseline, Container, Alert, Snackbar, Box, Link, Typography } from '@mui/material';
+import React, { useRef, useState } from 'react';
+import { ThemeProvider, createTheme, CssBaseline, Container, Alert, Snackbar, Box, Link, Typography, Button } from '@mui/material';
 import { LessonPlanForm } from './components/LessonPlanForm';
 import { LessonPlanDisplay } from './components/LessonPlanDisplay';
 import { lessonPlanApi } from './services/api';
+import { planCacheKey } from './services/planCache';
 import { LessonPlan, LessonPlanRequest } from './types/lessonPlan';
 
 const theme = createTheme({
@@ -28,16 +29,36 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [lessonPlan, setLessonPlan] = useState<LessonPlan | null>(null);
   const [error, setError] = useState<string | null>(null);
+  const [cachedRequest, setCachedRequest] = useState<LessonPlanRequest | null>(null);
+  const [notice, setNotice] = useState<string | null>(null);
+  // Key of the plan on screen, so a background refresh never replaces a different plan
+  const shownKey = useRef<string | null>(null);
 
   const handleCreateLessonPlan = async (request: LessonPlanRequest) => {
     setLoading(true);
     setError(null);
+    setNotice(null);
+    setCachedRequest(null);
+    const key = planCacheKey(request);
 
     try {
-      const response = await lessonPlanApi.createLessonPlan(request);
+      const response = await lessonPlanApi.createLessonPlan(request, {
+        onRefresh: (fresh) => {
+          if (shownKey.current === key && fresh.lesson_plan) {
+            setLessonPlan(fresh.lesson_plan);
+            setCachedRequest(null);
+            setNotice('Updated to the latest version of this plan');
+          }
+        },
+      });
       
       if (response.success && response.lesson_plan) {
+        shownKey.current = key;
         setLessonPlan(response.lesson_plan);
+        if (response.from_cache) {
+          setCachedRequest(request);
+          setNotice(`Showing your saved plan from ${new Date(response.saved_at || Date.now()).toLocaleDateString()}`);
+        }
       } else {
         setError(response.error || 'Failed to create lesson plan');
       }
@@ -49,8 +70,19 @@ function App() {
   };
 
   const handleBack = () => {
+    shownKey.current = null;
     setLessonPlan(null);
     setError(null);
+    setNotice(null);
+    setCachedRequest(null);
+  };
+
+  const handleRegenerate = () => {
+    if (cachedRequest) {
+      shownKey.current = null;
+      setLessonPlan(null);
+      handleCreateLessonPlan({ ...cachedRequest, bypass_cache: true });
+    }
   };
 
   const handleCloseError = () => {
@@ -77,6 +109,27 @@ function App() {
             {error}
           </Alert>
         </Snackbar>
+        <Snackbar
+          open={!!notice}
+          autoHideDuration={8000}
+          onClose={() => setNotice(null)}
+          anchorOrigin={{ vertical: 'bottom', horizontal: 'center' }}
+        >
+          <Alert
+            onClose={() => setNotice(null)}
+            severity="info"
+            sx={{ width: '100%' }}
+            action={
+              cachedRequest ? (
+                <Button color="inherit" size="small" onClick={handleRegenerate}>
+                  Generate new
+                </Button>
+              ) : undefined
+            }
+          >
+            {notice}
+          </Alert>
+        </Snackbar>
         <Box component="footer" sx={{ mt: 6, py: 2, textAlign: 'center', borderTop: '1px solid #eee' }}>
           <Typography variant="body2" color="text.secondary">
             Created by{' '}
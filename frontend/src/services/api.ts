@@ -1,8 +1,17 @@
-import axios from 'axios';
-import { LessonPlanRequest, LessonPlanResponse } from '../types/lessonPlan';
+import axios, { AxiosResponse } from 'axios';
+import {
+  CreateLessonPlanOptions,
+  LessonPlanRequest,
+  LessonPlanResponse,
+  RegenerateSectionsRequest,
+} from '../types/lessonPlan';
+import { CachedPlan, planCache, planCacheKey } from './planCache';
 
 const API_BASE_URL = 'https://lesson-planner-backend.onrender.com/';
 
+// Cached plans older than this are still shown instantly, then revalidated in the background
+const REFRESH_AFTER_MS = 24 * 60 * 60 * 1000;
+
 const api = axios.create({
   baseURL: API_BASE_URL,
   headers: {
@@ -10,16 +19,112 @@ const api = axios.create({
   },
 });
 
-export const lessonPlanApi = {
-  createLessonPlan: async (request: LessonPlanRequest): Promise<LessonPlanResponse> => {
+const etagOf = (response: AxiosResponse): string | undefined => {
+  const etag = response.headers['etag'];
+  return typeof etag === 'string' ? etag : undefined;
+};
+
+// One request per normalized topic/grade at a time; repeat submissions share it
+const inFlight = new Map<string, Promise<LessonPlanResponse>>();
+
+const postLessonPlan = (request: LessonPlanRequest): Promise<LessonPlanResponse> => {
+  const key = `${planCacheKey(request)}|${request.bypass_cache ? 'fresh' : ''}`;
+  const pending = inFlight.get(key);
+  if (pending) {
+    return pending;
+  }
+  const promise = (async () => {
     try {
       const response = await api.post<LessonPlanResponse>('/create-lesson-plan', request);
+      if (response.data.success && response.data.lesson_plan) {
+        await planCache.put(request, response.data, etagOf(response));
+      }
       return response.data;
     } catch (error) {
       if (axios.isAxiosError(error)) {
         throw new Error(error.response?.data?.message || 'Failed to create lesson plan');
       }
       throw error;
+    } finally {
+      inFlight.delete(key);
+    }
+  })();
+  inFlight.set(key, promise);
+  return promise;
+};
+
+// Revalidate a cached plan: a conditional GET of the stored plan costs the server no work while it is
+// unchanged (304). Resolves to the changed plan, or null when the cached one is still current.
+// Without an id and ETag, or once the server no longer has the plan, a fresh plan is requested.
+const refreshCachedPlan = async (
+  request: LessonPlanRequest,
+  cached: CachedPlan
+): Promise<LessonPlanResponse | null> => {
+  if (cached.planId && cached.etag) {
+    const response = await api.get<LessonPlanResponse>(`/lesson-plans/${cached.planId}`, {
+      headers: { 'If-None-Match': cached.etag },
+      validateStatus: (status) => status === 200 || status === 304 || status === 404,
+    });
+    if (response.status === 304) {
+      await planCache.touch(request);
+      return null;
+    }
+    if (response.status === 200 && response.data.success && response.data.lesson_plan) {
+      await planCache.put(request, response.data, etagOf(response));
+      return response.data;
+    }
+  }
+  return postLessonPlan(request);
+};
+
+export const lessonPlanApi = {
+  createLessonPlan: async (
+    request: LessonPlanRequest,
+    options: CreateLessonPlanOptions = {}
+  ): Promise<LessonPlanResponse> => {
+    if (!request.bypass_cache) {
+      const cached = await planCache.get(request);
+      if (cached) {
+        if (options.onRefresh && Date.now() - cached.savedAt > REFRESH_AFTER_MS) {
+          const onRefresh = options.onRefresh;
+          refreshCachedPlan(request, cached)
+            .then((fresh) => {
+              if (fresh && fresh.success && fresh.lesson_plan) {
+                onRefresh(fresh);
+              }
+            })
+            .catch(() => undefined); // the cached plan is already on screen
+        }
+        return { ...cached.response, from_cache: true, saved_at: cached.savedAt };
+      }
+    }
+    return postLessonPlan(request);
+  },
+
+  getLessonPlan: async (planId: string): Promise<LessonPlanResponse> => {
+    try {
+      const response = await api.get<LessonPlanResponse>(`/lesson-plans/${planId}`);
+      return response.data;
+    } catch (error) {
+      if (axios.isAxiosError(error)) {
+        throw new Error(error.response?.data?.detail || 'Failed to load lesson plan');
+      }
+      throw error;
+    }
+  },
+
+  regenerateSections: async (planId: string, request: RegenerateSectionsRequest): Promise<LessonPlanResponse> => {
+    try {
+      const response = await api.post<LessonPlanResponse>(`/lesson-plans/${planId}/regenerate`, request);
+      if (response.data.success && response.data.lesson_plan) {
+        await planCache.updateByPlanId(planId, response.data, etagOf(response));
+      }
+      return response.data;
+    } catch (error) {
+      if (axios.isAxiosError(error)) {
+        throw new Error(error.response?.data?.detail || error.response?.data?.message || 'Failed to regenerate sections');
+      }
+      throw error;
     }
   },
 
@@ -31,4 +136,4 @@ export const lessonPlanApi = {
       throw new Error('Backend server is not responding');
     }
   },
-}; 
\ No newline at end of file
+};
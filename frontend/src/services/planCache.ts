@@ -0,0 +1,147 @@
+import { LessonPlanRequest, LessonPlanResponse } from '../types/lessonPlan';
+
+// Past lesson plans kept in IndexedDB, keyed on the normalized topic and grade level,
+// so a topic this browser already generated is shown instantly without a backend call.
+// Each entry keeps the plan's id and ETag, so it can be revalidated with a conditional GET.
+
+const DB_NAME = 'lesson-planner';
+const DB_VERSION = 1;
+const STORE = 'plans';
+const MAX_ENTRIES = 100;
+
+export interface CachedPlan {
+  key: string;
+  planId?: string;
+  etag?: string;
+  savedAt: number;
+  response: LessonPlanResponse;
+}
+
+// Same normalization as the backend's request log and plan cache
+export const normalizeTopic = (text?: string): string =>
+  (text || '')
+    .toLowerCase()
+    .replace(/\s+/g, ' ')
+    .replace(/^[\s.,;:!?"']+|[\s.,;:!?"']+$/g, '');
+
+export const planCacheKey = (request: LessonPlanRequest): string =>
+  `${normalizeTopic(request.topic)}|${normalizeTopic(request.grade_level)}`;
+
+let dbPromise: Promise<IDBDatabase | null> | null = null;
+
+// Resolves to null where IndexedDB is unavailable (old browsers, some private modes, tests);
+// the cache then simply misses.
+const openDb = (): Promise<IDBDatabase | null> => {
+  if (!dbPromise) {
+    dbPromise = new Promise((resolve) => {
+      if (typeof indexedDB === 'undefined') {
+        resolve(null);
+        return;
+      }
+      const open = indexedDB.open(DB_NAME, DB_VERSION);
+      open.onupgradeneeded = () => {
+        const store = open.result.createObjectStore(STORE, { keyPath: 'key' });
+        store.createIndex('savedAt', 'savedAt');
+        store.createIndex('planId', 'planId');
+      };
+      open.onsuccess = () => resolve(open.result);
+      open.onerror = () => resolve(null);
+      open.onblocked = () => resolve(null);
+    });
+  }
+  return dbPromise;
+};
+
+const withStore = async <T>(
+  mode: IDBTransactionMode,
+  run: (store: IDBObjectStore) => IDBRequest<T> | void
+): Promise<T | undefined> => {
+  const db = await openDb();
+  if (!db) {
+    return undefined;
+  }
+  return new Promise((resolve) => {
+    try {
+      const tx = db.transaction(STORE, mode);
+      const request = run(tx.objectStore(STORE));
+      tx.oncomplete = () => resolve(request ? request.result : undefined);
+      tx.onerror = () => resolve(undefined);
+      tx.onabort = () => resolve(undefined);
+    } catch {
+      resolve(undefined);
+    }
+  });
+};
+
+export const planCache = {
+  get: async (request: LessonPlanRequest): Promise<CachedPlan | null> => {
+    const entry = await withStore<CachedPlan>('readonly', (store) => store.get(planCacheKey(request)));
+    return entry || null;
+  },
+
+  put: async (request: LessonPlanRequest, response: LessonPlanResponse, etag?: string): Promise<void> => {
+    const entry: CachedPlan = {
+      key: planCacheKey(request),
+      planId: response.plan_id,
+      etag,
+      savedAt: Date.now(),
+      // Timings and the cache flag describe one particular fetch, not the plan
+      response: { ...response, timings: undefined, from_cache: undefined },
+    };
+    await withStore('readwrite', (store) => {
+      store.put(entry);
+    });
+    await planCache.evict();
+  },
+
+  // Mark an entry as just revalidated (the server answered 304 Not Modified)
+  touch: async (request: LessonPlanRequest): Promise<void> => {
+    const entry = await planCache.get(request);
+    if (entry) {
+      await withStore('readwrite', (store) => {
+        store.put({ ...entry, savedAt: Date.now() });
+      });
+    }
+  },
+
+  // Replace the stored response of a plan whose sections were regenerated
+  updateByPlanId: async (planId: string, response: LessonPlanResponse, etag?: string): Promise<void> => {
+    const entries = await withStore<CachedPlan[]>('readonly', (store) => store.index('planId').getAll(planId));
+    for (const entry of entries || []) {
+      await withStore('readwrite', (store) => {
+        store.put({ ...entry, etag, savedAt: Date.now(), response: { ...response, timings: undefined, from_cache: undefined } });
+      });
+    }
+  },
+
+  delete: async (request: LessonPlanRequest): Promise<void> => {
+    await withStore('readwrite', (store) => {
+      store.delete(planCacheKey(request));
+    });
+  },
+
+  clear: async (): Promise<void> => {
+    await withStore('readwrite', (store) => {
+      store.clear();
+    });
+  },
+
+  // Drop the oldest entries beyond MAX_ENTRIES
+  evict: async (): Promise<void> => {
+    const count = await withStore<number>('readonly', (store) => store.count());
+    if (!count || count <= MAX_ENTRIES) {
+      return;
+    }
+    let excess = count - MAX_ENTRIES;
+    await withStore('readwrite', (store) => {
+      const cursor = store.index('savedAt').openCursor();
+      cursor.onsuccess = () => {
+        if (cursor.result && excess > 0) {
+          cursor.result.delete();
+          excess -= 1;
+          cursor.result.continue();
+        }
+      };
+    });
+  },
+};
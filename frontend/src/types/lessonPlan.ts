@@ -19,6 +19,13 @@ export interface LessonPlan {
 export interface LessonPlanRequest {
   topic: string;
   grade_level?: string;
+  bypass_cache?: boolean;
+}
+
+export interface RequestTimings {
+  total_ms: number;
+  stages: Record<string, number>;
+  sources: Record<string, number>;
 }
 
 export interface LessonPlanResponse {
@@ -26,4 +33,27 @@ export interface LessonPlanResponse {
   lesson_plan?: LessonPlan;
   error?: string;
   message: string;
+  plan_id?: string;
+  timings?: RequestTimings;
+  // Set by the client plan cache when the response was served from IndexedDB, never by the server
+  from_cache?: boolean;
+  saved_at?: number;
+}
+
+export interface CreateLessonPlanOptions {
+  // Called with a fresh response when a cached plan older than the refresh age was shown
+  onRefresh?: (response: LessonPlanResponse) => void;
+}
+
+export type RegenerableSection =
+  | 'duration_minutes'
+  | 'learning_objectives'
+  | 'materials_needed'
+  | 'lesson_overview'
+  | 'exercises'
+  | 'assessment';
+
+export interface RegenerateSectionsRequest {
+  sections: RegenerableSection[];
+  notes?: string;
 } 
\ No newline at end of file